@@ -0,0 +1,58 @@
+"""geohash cell stats
+
+Revision ID: 3f9c2a7d1e64
+Revises: cd1e240a1aff
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1e64'
+down_revision = 'cd1e240a1aff'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('geohash_cell_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('geohash', sa.String(), nullable=False),
+    sa.Column('precision', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('lat_sum', sa.Float(), nullable=False),
+    sa.Column('lng_sum', sa.Float(), nullable=False),
+    sa.Column('min_lat', sa.Float(), nullable=True),
+    sa.Column('max_lat', sa.Float(), nullable=True),
+    sa.Column('min_lng', sa.Float(), nullable=True),
+    sa.Column('max_lng', sa.Float(), nullable=True),
+    sa.Column('awaiting_review', sa.Integer(), nullable=False),
+    sa.Column('awaiting_approval', sa.Integer(), nullable=False),
+    sa.Column('approved', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_geohash_cell_stats_geohash'), 'geohash_cell_stats', ['geohash'], unique=True)
+    op.create_index(op.f('ix_geohash_cell_stats_precision'), 'geohash_cell_stats', ['precision'], unique=False)
+
+    # backfill the stats of the already existing markers for precision 1 - 7
+    op.execute("""
+        INSERT INTO geohash_cell_stats (
+            geohash, precision, count, lat_sum, lng_sum, min_lat, max_lat, min_lng, max_lng,
+            awaiting_review, awaiting_approval, approved
+        )
+        SELECT substr(geohash, 1, p), p, count(*), sum(lat), sum(lng), min(lat), max(lat), min(lng), max(lng),
+               count(*) FILTER (WHERE status = 1),
+               count(*) FILTER (WHERE status = 2),
+               count(*) FILTER (WHERE status = 3)
+        FROM geospatialindex CROSS JOIN generate_series(1, 7) AS p
+        WHERE geohash IS NOT NULL
+        GROUP BY substr(geohash, 1, p), p
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_geohash_cell_stats_precision'), table_name='geohash_cell_stats')
+    op.drop_index(op.f('ix_geohash_cell_stats_geohash'), table_name='geohash_cell_stats')
+    op.drop_table('geohash_cell_stats')
@@ -0,0 +1,75 @@
+"""zone wkb geometry
+
+Revision ID: 9b41e6c0d2a8
+Revises: 3f9c2a7d1e64
+Create Date: 2026-10-18 14:40:07.902318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from shapely import wkb, wkt
+
+
+# revision identifiers, used by Alembic.
+revision = '9b41e6c0d2a8'
+down_revision = '3f9c2a7d1e64'
+branch_labels = None
+depends_on = None
+
+# keep in sync with app.utils.zone_cache.SIMPLIFY_TOLERANCE
+SIMPLIFY_TOLERANCE = 0.001
+
+
+def upgrade() -> None:
+    op.add_column('zone', sa.Column('geometry', sa.LargeBinary(), nullable=True))
+    op.add_column('zone', sa.Column('simplified_geometry', sa.LargeBinary(), nullable=True))
+    op.add_column('zone', sa.Column('min_lat', sa.Float(), nullable=True))
+    op.add_column('zone', sa.Column('max_lat', sa.Float(), nullable=True))
+    op.add_column('zone', sa.Column('min_lng', sa.Float(), nullable=True))
+    op.add_column('zone', sa.Column('max_lng', sa.Float(), nullable=True))
+
+    connection = op.get_bind()
+    zones = connection.execute(sa.text("SELECT id, bounding_box FROM zone WHERE bounding_box IS NOT NULL")).fetchall()
+    for zone_id, bounding_box in zones:
+        try:
+            geom = wkt.loads(bounding_box)
+        except Exception:
+            continue
+
+        min_lng, min_lat, max_lng, max_lat = geom.bounds
+        connection.execute(
+            sa.text(
+                "UPDATE zone SET geometry = :geometry, simplified_geometry = :simplified_geometry, "
+                "min_lat = :min_lat, max_lat = :max_lat, min_lng = :min_lng, max_lng = :max_lng WHERE id = :id"
+            ),
+            {
+                "id": zone_id,
+                "geometry": geom.wkb,
+                "simplified_geometry": geom.simplify(SIMPLIFY_TOLERANCE, preserve_topology=True).wkb,
+                "min_lat": min_lat,
+                "max_lat": max_lat,
+                "min_lng": min_lng,
+                "max_lng": max_lng
+            }
+        )
+
+    op.drop_column('zone', 'bounding_box')
+
+
+def downgrade() -> None:
+    op.add_column('zone', sa.Column('bounding_box', sa.String(), nullable=True))
+
+    connection = op.get_bind()
+    zones = connection.execute(sa.text("SELECT id, geometry FROM zone WHERE geometry IS NOT NULL")).fetchall()
+    for zone_id, geometry in zones:
+        connection.execute(
+            sa.text("UPDATE zone SET bounding_box = :bounding_box WHERE id = :id"),
+            {"id": zone_id, "bounding_box": wkb.loads(bytes(geometry)).wkt}
+        )
+
+    op.drop_column('zone', 'max_lng')
+    op.drop_column('zone', 'min_lng')
+    op.drop_column('zone', 'max_lat')
+    op.drop_column('zone', 'min_lat')
+    op.drop_column('zone', 'simplified_geometry')
+    op.drop_column('zone', 'geometry')
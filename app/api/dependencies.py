@@ -1,4 +1,4 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
 from datetime import datetime
 
 from fastapi import Depends, HTTPException, status, Security
@@ -6,12 +6,14 @@ from fastapi.security.oauth2 import OAuth2PasswordBearer
 from fastapi.security import SecurityScopes
 from jose import jwt
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import models, crud, schemas
 from app.core import security
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, AsyncSessionLocal
+from app.utils.pagination import Cursor, decode_cursor
 
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login/token",
                                        scopes={"me": "Read current user information",
@@ -27,50 +29,102 @@ def get_db() -> Generator:
         db.close()
 
 
-def get_current_user(security_scopes: SecurityScopes,
-                     db: Session = Depends(get_db),
-                     token: str = Depends(reusable_oauth2)) -> models.User:
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    if AsyncSessionLocal is None:
+        raise RuntimeError("The async database engine is disabled, set ASYNC_DATABASE_ENABLED to use it")
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_cursor(cursor: Optional[str] = None) -> Optional[Cursor]:
+    if cursor is None:
+        return None
+
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _authenticate_value(security_scopes: SecurityScopes) -> str:
     if security_scopes.scopes:
-        authenticate_value = f'Bearer scope="{security_scopes.scope_str}"'
-    else:
-        authenticate_value = f"Bearer"
+        return f'Bearer scope="{security_scopes.scope_str}"'
+
+    return f"Bearer"
+
 
-    credentials_exception = HTTPException(
+def _credentials_exception(security_scopes: SecurityScopes) -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
-        headers={"WWW-Authenticate": authenticate_value}
+        headers={"WWW-Authenticate": _authenticate_value(security_scopes)}
     )
 
+
+def _decode_token(security_scopes: SecurityScopes, token: str) -> schemas.TokenBase:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
-        token_data = schemas.TokenBase(**payload)
+        return schemas.TokenBase(**payload)
 
     except (jwt.JWTError, ValidationError) as e:
         print(e)
-        raise credentials_exception
+        raise _credentials_exception(security_scopes)
 
-    user = crud.crud_user.get(db, user_id=token_data.sub)
-    if not user:
-        raise credentials_exception
 
-    # TODO
-    # session = crud.crud_sessions.get_by_access_token(db, user_id=user.id, access_token=token)
-    # if not session.is_active or not session:
-    #     raise credentials_exception
+def _authorize(
+        security_scopes: SecurityScopes,
+        token_data: schemas.TokenBase,
+        user: Optional[models.User]
+) -> models.User:
+
+    if not user:
+        raise _credentials_exception(security_scopes)
 
     for scope in security_scopes.scopes:
         if scope not in token_data.scopes:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Not enough permissions",
-                headers={"WWW-Authenticate": authenticate_value}
+                headers={"WWW-Authenticate": _authenticate_value(security_scopes)}
             )
 
     return user
 
 
+def get_current_user(security_scopes: SecurityScopes,
+                     db: Session = Depends(get_db),
+                     token: str = Depends(reusable_oauth2)) -> models.User:
+
+    token_data = _decode_token(security_scopes, token)
+    user = crud.crud_user.get(db, user_id=token_data.sub)
+
+    # TODO
+    # session = crud.crud_sessions.get_by_access_token(db, user_id=user.id, access_token=token)
+    # if not session.is_active or not session:
+    #     raise credentials_exception
+
+    return _authorize(security_scopes, token_data, user)
+
+
+async def get_current_user_async(security_scopes: SecurityScopes,
+                                 db: AsyncSession = Depends(get_async_db),
+                                 token: str = Depends(reusable_oauth2)) -> models.User:
+
+    token_data = _decode_token(security_scopes, token)
+    # asyncpg doesn't cast the string subject to the integer primary key
+    try:
+        user_id = int(token_data.sub)
+    except (TypeError, ValueError):
+        raise _credentials_exception(security_scopes)
+
+    user = await crud.crud_user.get_async(db, user_id=user_id)
+
+    return _authorize(security_scopes, token_data, user)
+
+
 def get_current_active_user(
         current_user: models.User = Security(get_current_user, scopes=["users:me"])
 ) -> models.User:
@@ -79,3 +133,13 @@ def get_current_active_user(
         raise HTTPException(status_code=400, detail="User is not active")
 
     return current_user
+
+
+async def get_current_active_user_async(
+        current_user: models.User = Security(get_current_user_async, scopes=["users:me"])
+) -> models.User:
+
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="User is not active")
+
+    return current_user
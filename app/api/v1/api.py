@@ -1,6 +1,9 @@
 from fastapi import APIRouter
 
+from app.core.config import settings
+
 from app.api.v1.endpoints import locations
+from app.api.v1.endpoints import locations_async
 from app.api.v1.endpoints import users
 from app.api.v1.endpoints import auth
 from app.api.v1.endpoints import sessions
@@ -12,6 +15,9 @@ from app.api.v1.endpoints import guest_user
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
+if settings.ASYNC_DATABASE_ENABLED:
+    # registered before the sync locations router, so its handlers take over the matching routes
+    api_router.include_router(locations_async.router, prefix="/locations", tags=["locations"])
 api_router.include_router(locations.router, prefix="/locations", tags=["locations"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(organizations.router, prefix='/organizations', tags=["organizations"])
@@ -19,7 +19,7 @@ router = APIRouter()
 
 
 @router.post('/login/token', response_model=Token)
-async def login_user(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()) -> Any:
+def login_user(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()) -> Any:
     # Base Oauth2 Form only has 2 fields, username and password, so we are using email here,
     # but passing it as a username.
 
@@ -24,7 +24,7 @@ limiter = Limiter(key_func=get_remote_address)
 
 @router.post('/request-otp')
 @limiter.limit('{}/hour'.format(settings.OTP_HOUR_RATE_LIMIT))
-async def request_otp_code(
+def request_otp_code(
         request: Request,
         phone_number: str,
         db: Session = Depends(get_db)
@@ -65,7 +65,7 @@ async def request_otp_code(
 
 
 @router.post('/request-location')
-async def request_location_info_with_otp(
+def request_location_info_with_otp(
         request: Request,
         location_request: schemas.LocationRequestOtp,
         db: Session = Depends(get_db)
@@ -104,7 +104,8 @@ async def request_location_info_with_otp(
             detail="Review request for this location was already sent."
         )
 
-    address = geocoding.reverse(
+    address = geocoding.reverse_cached(
+        db,
         location_request.lat,
         location_request.lng
     )
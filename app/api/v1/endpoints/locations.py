@@ -1,28 +1,38 @@
-from typing import Any, List
-import os
+from typing import Any, List, Optional, Union
 
 from fastapi import APIRouter, Depends, HTTPException, Security, status, Response, UploadFile, File
 
-import aiofiles
-
 from sqlalchemy.orm import Session
 
-from app.api.dependencies import get_db, get_current_active_user
+from app.api.dependencies import get_db, get_current_active_user, get_cursor
 from app import schemas, models
 from app.crud import crud_location as crud
 from app.crud import crud_changelogs as logs_crud
 from app.crud import crud_geospatial as geo_crud
 from app.crud import crud_zones as zone_crud
-from app.utils import geocoding
+from app.crud import crud_import_jobs as import_crud
+from app.utils import geocoding, geohash_utils, vector_tiles, import_jobs
+from app.utils.pagination import Cursor, NEXT_CURSOR_HEADER, next_cursor
 from app.core.config import settings
-from app.utils.bulk_locations import upload_locations
+from app.core.responses import UTCJSONResponse
 
 router = APIRouter()
 
+MAX_NEARBY_RADIUS_KM = 100
+MAX_NEARBY_RESULTS = 100
+
+# content type of the bulk upload -> upload_locations doctype
+IMPORT_CONTENT_TYPES = {
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "excel",
+    "text/csv": "csv",
+    "application/geo+json": "geojson",
+    "application/geo+json-seq": "geojson",
+}
+
 
 # TODO REMOVE ROUTE
 @router.post('/create')
-async def create_location(location: schemas.LocationCreate, db: Session = Depends(get_db)) -> Any:
+def create_location(location: schemas.LocationCreate, db: Session = Depends(get_db)) -> Any:
 
     new_location = crud.create_location(db, obj_in=location)
 
@@ -33,7 +43,7 @@ async def create_location(location: schemas.LocationCreate, db: Session = Depend
 
 
 @router.get('/search')
-async def get_location(lat: float, lng: float, db: Session = Depends(get_db)) -> Any:
+def get_location(lat: float, lng: float, db: Session = Depends(get_db)) -> Any:
 
     location = crud.get_location_by_coordinates(db, lat, lng)
 
@@ -43,45 +53,120 @@ async def get_location(lat: float, lng: float, db: Session = Depends(get_db)) ->
     return location.to_json()
 
 
-@router.post('/cord_search', response_model=List[schemas.GeospatialRecord])
-async def get_locations_by_coordinates(
+@router.post('/cord_search', response_model=List[Union[schemas.GeospatialRecord, schemas.MarkerCluster]])
+def get_locations_by_coordinates(
         coordinates: schemas.LocationSearch,
         db: Session = Depends(get_db)
 ) -> Any:
 
+    # On low zoom levels the clients can ask for the clusters instead of every single marker on the screen
+    if coordinates.cluster and geohash_utils.is_clustered(coordinates.zoom):
+        return UTCJSONResponse(geo_crud.cluster_indexes_in_range(
+            db,
+            coordinates.lat,
+            coordinates.lng,
+            coordinates.zoom,
+            coordinates.bounds
+        ))
+
     markers = geo_crud.search_indexes_in_range(
         db,
         coordinates.lat,
         coordinates.lng,
-        coordinates.zoom
+        coordinates.zoom,
+        coordinates.bounds
     )
 
-    print(f"Markers : {len(markers)}")
+    # the markers are serialized straight into the GeospatialRecord format, skipping the per marker validation
+    return UTCJSONResponse([marker.to_json() for marker in markers])
+
+
+@router.get('/nearby', response_model=List[schemas.NearbyMarker])
+def get_nearby_locations(
+        lat: float,
+        lng: float,
+        radius_km: float = 5,
+        k: int = 20,
+        location_status: Optional[int] = None,
+        db: Session = Depends(get_db)
+) -> Any:
+
+    if not 0 < radius_km <= MAX_NEARBY_RADIUS_KM:
+        raise HTTPException(
+            status_code=400,
+            detail="Radius should be between 0 and {} km".format(MAX_NEARBY_RADIUS_KM)
+        )
+
+    if not 0 < k <= MAX_NEARBY_RESULTS:
+        raise HTTPException(status_code=400, detail="k should be between 1 and {}".format(MAX_NEARBY_RESULTS))
+
+    markers = geo_crud.search_nearby_indexes(db, lat, lng, radius_km, k, status=location_status)
+
+    return UTCJSONResponse([marker.to_json() for marker in markers])
+
+
+@router.get('/tiles/{z}/{x}/{y}.mvt')
+def get_locations_tile(z: int, x: int, y: int, db: Session = Depends(get_db)) -> Any:
+
+    if not vector_tiles.is_valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail="No such tile")
 
-    return markers
+    tile = vector_tiles.tile_cache.get(z, x, y)
+    if tile is None:
+        markers = geo_crud.search_indexes_in_tile(db, z, x, y)
+        tile = vector_tiles.encode_points_tile(
+            "locations",
+            [
+                (
+                    marker.location_id,
+                    marker.lat,
+                    marker.lng,
+                    {"location_id": marker.location_id, "status": marker.status}
+                )
+                for marker in markers
+            ],
+            z, x, y
+        )
+        vector_tiles.tile_cache.set(z, x, y, tile)
+
+    return Response(
+        content=tile,
+        media_type=vector_tiles.MEDIA_TYPE,
+        headers={"Cache-Control": "public, max-age={}".format(settings.TILE_CACHE_TTL)}
+    )
 
 
 @router.get('/location-info', response_model=schemas.LocationOut)
-async def get_location_info(location_id: int, db: Session = Depends(get_db)) -> Any:
+def get_location_info(location_id: int, db: Session = Depends(get_db)) -> Any:
 
-    location = crud.get_location_by_id(db, location_id)
+    location = crud.get_location_row(db, location_id)
 
     if not location:
         raise HTTPException(status_code=400, detail="Not found")
 
-    return location.to_json()
+    return UTCJSONResponse(models.Location.row_to_json(location))
 
 
 @router.get('/changelogs', response_model=List[schemas.ChangelogOut])
-async def get_location_changelogs(location_id: int, db: Session = Depends(get_db)) -> Any:
+def get_location_changelogs(
+        location_id: int,
+        response: Response,
+        limit: Optional[int] = None,
+        cursor: Optional[Cursor] = Depends(get_cursor),
+        db: Session = Depends(get_db)
+) -> Any:
+
+    logs = logs_crud.get_changelogs(db, location_id, limit, cursor)
 
-    logs = logs_crud.get_changelogs(db, location_id)
+    next_page = next_cursor(logs, limit)
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
 
     return logs
 
 
 @router.post('/request-info')
-async def request_location_review(
+def request_location_review(
         location: schemas.LocationCreate,
         db: Session = Depends(get_db)
 ) -> Any:
@@ -93,7 +178,7 @@ async def request_location_review(
             detail="Review request for this location was already sent"
         )
 
-    address = geocoding.reverse(location.lat, location.lng)
+    address = geocoding.reverse_cached(db, location.lat, location.lng)
     if not address:
         raise HTTPException(status_code=400, detail="Cannot get the address of this location, please check you query")
 
@@ -130,9 +215,9 @@ async def request_location_review(
 
 
 @router.get('/pending-count')
-async def get_pending_locations_count(db: Session = Depends(get_db),
-                                      current_user=Security(get_current_active_user,
-                                                            scopes=['locations:view'])) -> Any:
+def get_pending_locations_count(db: Session = Depends(get_db),
+                                current_user=Security(get_current_active_user,
+                                                      scopes=['locations:view'])) -> Any:
 
     return {
         "count": crud.get_locations_awaiting_reports_count(db)
@@ -140,24 +225,52 @@ async def get_pending_locations_count(db: Session = Depends(get_db),
 
 
 @router.get('/location-requests', response_model=List[schemas.LocationOut])
-async def get_requested_locations(page: int = 1,
-                                  limit: int = 20,
-                                  user_lat: float = None,
-                                  user_lng: float = None,
-                                  db: Session = Depends(get_db),
-                                  current_user: models.User = Security(get_current_active_user,
-                                                                       scopes=['locations:view'])) -> Any:
+def get_requested_locations(page: int = 1,
+                            limit: int = 20,
+                            user_lat: float = None,
+                            user_lng: float = None,
+                            sort: str = "created_at",
+                            cursor: Optional[Cursor] = Depends(get_cursor),
+                            db: Session = Depends(get_db),
+                            current_user: models.User = Security(get_current_active_user,
+                                                                 scopes=['locations:view'])) -> Any:
+
+    if sort not in ("created_at", "distance"):
+        raise HTTPException(status_code=400, detail="Locations can only be sorted by created_at or distance")
+
+    if sort == "distance":
+        if user_lat is None or user_lng is None:
+            raise HTTPException(status_code=400, detail="User coordinates are required to sort by distance")
 
-    locations = crud.get_locations_awaiting_reports(db, limit, page - 1)
+        # the distance changes with the user coordinates, so there is no stable position to continue from
+        if cursor:
+            raise HTTPException(status_code=400, detail="Cursors can only be used with the created_at sort")
 
-    return [location.to_json(user_lat, user_lng) for location in locations]
+        locations = crud.get_nearest_locations_awaiting_reports(db, user_lat, user_lng, limit, page - 1)
+        next_page = None
+    else:
+        locations = crud.get_locations_awaiting_reports(db, limit, page - 1, cursor)
+        next_page = next_cursor(locations, limit)
+
+    response = UTCJSONResponse([models.Location.row_to_json(location, user_lat, user_lng) for location in locations])
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
+
+    return response
+
+
+@router.get('/geocoding-cache')
+def get_geocoding_cache_stats(current_user: models.User = Security(get_current_active_user,
+                                                                   scopes=['locations:view'])) -> Any:
+
+    return geocoding.cache_stats
 
 
 @router.put('/assign-location')
-async def assign_location_report(location_id: int,
-                                 db: Session = Depends(get_db),
-                                 current_user: models.User = Security(get_current_active_user,
-                                                                      scopes=['locations:edit'])) -> Any:
+def assign_location_report(location_id: int,
+                           db: Session = Depends(get_db),
+                           current_user: models.User = Security(get_current_active_user,
+                                                                scopes=['locations:edit'])) -> Any:
 
     location = crud.assign_report(db, current_user.id, location_id)
     if not location:
@@ -167,10 +280,10 @@ async def assign_location_report(location_id: int,
 
 
 @router.put('/remove-assignment')
-async def remove_report_assignment(location_id: int,
-                                   db: Session = Depends(get_db),
-                                   current_user: models.User = Security(get_current_active_user,
-                                                                        scopes=['locations:edit'])) -> Any:
+def remove_report_assignment(location_id: int,
+                             db: Session = Depends(get_db),
+                             current_user: models.User = Security(get_current_active_user,
+                                                                  scopes=['locations:edit'])) -> Any:
     location = crud.remove_assignment(db, location_id, current_user.id)
     if not location:
         raise HTTPException(status_code=400, detail="This location was already dismissed or does not belong to you")
@@ -179,19 +292,19 @@ async def remove_report_assignment(location_id: int,
 
 
 @router.get('/assigned-locations', response_model=List[schemas.LocationOut])
-async def get_user_assigned_locations(db: Session = Depends(get_db),
-                                      current_user: models.User = Security(get_current_active_user,
-                                                                           scopes=['locations:view'])) -> Any:
+def get_user_assigned_locations(db: Session = Depends(get_db),
+                                current_user: models.User = Security(get_current_active_user,
+                                                                     scopes=['locations:view'])) -> Any:
 
     locations = crud.get_user_assigned_locations(db, current_user.id)
     return [location.to_json() for location in locations]
 
 
 @router.put('/submit-report')
-async def submit_location_report(reports: schemas.LocationReports,
-                                 db: Session = Depends(get_db),
-                                 current_user: models.User = Security(get_current_active_user,
-                                                                      scopes=['locations:edit'])) -> Any:
+def submit_location_report(reports: schemas.LocationReports,
+                           db: Session = Depends(get_db),
+                           current_user: models.User = Security(get_current_active_user,
+                                                                scopes=['locations:edit'])) -> Any:
 
     location = crud.submit_location_reports(db, obj_in=reports, user_id=current_user.id)
 
@@ -202,10 +315,10 @@ async def submit_location_report(reports: schemas.LocationReports,
 
 
 @router.delete('/remove-location')
-async def remove_location(location_id: int,
-                          db: Session = Depends(get_db),
-                          current_user: models.User = Security(get_current_active_user,
-                                                               scopes=['locations:delete'])) -> Any:
+def remove_location(location_id: int,
+                    db: Session = Depends(get_db),
+                    current_user: models.User = Security(get_current_active_user,
+                                                         scopes=['locations:delete'])) -> Any:
 
     # TODO place to archive?
     location = crud.delete_location(db, location_id=location_id)
@@ -217,61 +330,58 @@ async def remove_location(location_id: int,
 
 
 @router.get('/recent-reports', response_model=List[schemas.LocationOut])
-async def get_activity_feed(
+def get_activity_feed(
         records: int = 10,
         db: Session = Depends(get_db)
 ) -> Any:
 
     locations = crud.get_activity_feed(db, records)
 
-    return [location.to_json() for location in locations]
+    return UTCJSONResponse([models.Location.row_to_json(location) for location in locations])
 
 
-@router.post('/bulk-add')
-async def bulk_add_locations(
+@router.post('/bulk-add', response_model=schemas.ImportJobOut, status_code=status.HTTP_202_ACCEPTED)
+def bulk_add_locations(
     sheet_type: int,
     file: UploadFile = File(...),
+    deduplicate: bool = False,
+    db: Session = Depends(get_db),
     # current_user: models.User = Security(get_current_active_user,
     #                                      scopes=['locations:delete'])
 ) -> Any:
 
-    if file.content_type != "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet":
+    doctype = IMPORT_CONTENT_TYPES.get(file.content_type)
+    if not doctype:
         raise HTTPException(status_code=400, detail="Unsupported file format. Please verify what you are sending.")
 
-    filepath = "app/datasets/{}".format(file.filename)
+    # parsing, geocoding and inserting a sheet takes minutes, so it runs in the background and the client polls the job
+    filepath = import_jobs.store_upload(file.filename, file.file)
+    job = import_crud.create_import_job(
+        db,
+        filename=file.filename,
+        filepath=filepath,
+        doctype=doctype,
+        deduplicate=deduplicate
+    )
+    import_jobs.submit_import_job(job.id)
+
+    return job
 
-    if not os.path.exists('app/datasets'):
-        os.makedirs('app/datasets')
 
-    async with aiofiles.open(filepath, 'wb') as file_object:
-        content = await file.read()
-        await file_object.write(content)
+@router.get('/bulk-add/{job_id}', response_model=schemas.ImportJobOut)
+def get_bulk_add_job(job_id: int, db: Session = Depends(get_db)) -> Any:
 
-    locations = await upload_locations(filepath, "excel")
-    os.remove(filepath)
+    job = import_crud.get_import_job(db, job_id)
 
-    return locations
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
 
-    # filepath = f"app/datasets/{file.filename}"
-    #
-    # if not os.path.exists('app/datasets'):
-    #     os.makedirs('app/datasets')
-    #
-    # async with aiofiles.open(filepath, "wb") as file_object:
-    #     content = await file.read()
-    #     await file_object.write(content)
-    #
-    # op_status = bulk_create(spreadsheet_path=filepath, sheet_type=sheet_type)
-    #
-    # if not op_status:
-    #     raise HTTPException(status_code=400, detail=op_status)
-    #
-    # return Response(status_code=status.HTTP_201_CREATED)
+    return job
 
 
 # TODO REMOVE ENDPOINT ( TESTING ONLY )
 @router.delete('/bulk-delete')
-async def delete_all_locations(
+def delete_all_locations(
         db: Session = Depends(get_db),
         current_user: models.User = Security(get_current_active_user,
                                              scopes=['locations:delete'])
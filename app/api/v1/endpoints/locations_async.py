@@ -0,0 +1,71 @@
+from typing import Any, List, Union
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies import get_async_db
+from app import schemas, models
+from app.crud import crud_location as crud
+from app.crud import crud_geospatial as geo_crud
+from app.utils import geohash_utils
+from app.core.responses import UTCJSONResponse
+
+router = APIRouter()
+
+
+"""
+Async versions of the read-heavy map endpoints of app/api/v1/endpoints/locations.py. They are only registered
+when ASYNC_DATABASE_ENABLED is set, in front of the sync router, so they take over the matching routes and serve
+them on the event loop instead of the threadpool.
+"""
+
+
+@router.post('/cord_search', response_model=List[Union[schemas.GeospatialRecord, schemas.MarkerCluster]])
+async def get_locations_by_coordinates(
+        coordinates: schemas.LocationSearch,
+        db: AsyncSession = Depends(get_async_db)
+) -> Any:
+
+    if coordinates.cluster and geohash_utils.is_clustered(coordinates.zoom):
+        # the clusters are a single indexed query on the stats table, so it runs through the sync session adapter
+        clusters = await db.run_sync(
+            geo_crud.cluster_indexes_in_range,
+            coordinates.lat,
+            coordinates.lng,
+            coordinates.zoom,
+            coordinates.bounds
+        )
+        return UTCJSONResponse(clusters)
+
+    markers = await geo_crud.search_indexes_in_range_async(
+        db,
+        coordinates.lat,
+        coordinates.lng,
+        coordinates.zoom,
+        coordinates.bounds
+    )
+
+    return UTCJSONResponse([marker.to_json() for marker in markers])
+
+
+@router.get('/location-info', response_model=schemas.LocationOut)
+async def get_location_info(location_id: int, db: AsyncSession = Depends(get_async_db)) -> Any:
+
+    location = await crud.get_location_row_async(db, location_id)
+
+    if not location:
+        raise HTTPException(status_code=400, detail="Not found")
+
+    return UTCJSONResponse(models.Location.row_to_json(location))
+
+
+@router.get('/recent-reports', response_model=List[schemas.LocationOut])
+async def get_activity_feed(
+        records: int = 10,
+        db: AsyncSession = Depends(get_async_db)
+) -> Any:
+
+    locations = await crud.get_activity_feed_async(db, records)
+
+    return UTCJSONResponse([models.Location.row_to_json(location) for location in locations])
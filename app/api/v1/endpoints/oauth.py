@@ -13,7 +13,7 @@ router = APIRouter()
 
 
 @router.post('/roles/create', response_model=schemas.OauthRoleOut)
-async def create_oauth_role(
+def create_oauth_role(
         oauth_role: schemas.OauthRoleCreate,
         current_active_user: models.User = Security(
             get_current_active_user,
@@ -25,7 +25,7 @@ async def create_oauth_role(
 
 
 @router.get('/roles/all', response_model=List[schemas.OauthRoleOut])
-async def get_all_oauth_roles(
+def get_all_oauth_roles(
         current_active_user: models.User = Security(
             get_current_active_user,
             scopes=['oauth:read']
@@ -38,7 +38,7 @@ async def get_all_oauth_roles(
 
 
 @router.put('/roles/patch', response_model=schemas.OauthRoleOut)
-async def patch_oauth_role(
+def patch_oauth_role(
         current_active_user: models.User = Security(
             get_current_active_user,
             scopes=['oauth:edit']
@@ -50,7 +50,7 @@ async def patch_oauth_role(
 
 
 @router.get('/scopes/all', response_model=List[schemas.OauthScopeOut])
-async def get_all_oauth_scopes(
+def get_all_oauth_scopes(
         current_active_user: models.User = Security(
             get_current_active_user,
             scopes=['oauth:read']
@@ -1,21 +1,22 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Security, status, Response
 
 from sqlalchemy.orm import Session
 
-from app.api.dependencies import get_db, get_current_active_user
+from app.api.dependencies import get_db, get_current_active_user, get_cursor
 from app import schemas, models
 from app.crud import crud_organizations as crud
+from app.utils.pagination import Cursor, NEXT_CURSOR_HEADER, next_cursor
 
 router = APIRouter()
 
 
 @router.post('/create', response_model=schemas.OrganizationOut)
-async def create_organization(organization: schemas.OrganizationBase,
-                              db: Session = Depends(get_db),
-                              current_active_user: models.User = Security(get_current_active_user,
-                                                                          scopes=["organizations:create"])) -> Any:
+def create_organization(organization: schemas.OrganizationBase,
+                        db: Session = Depends(get_db),
+                        current_active_user: models.User = Security(get_current_active_user,
+                                                                    scopes=["organizations:create"])) -> Any:
     existing_organization = crud.get_by_name(db, organization.name)
 
     if existing_organization:
@@ -30,15 +31,24 @@ async def create_organization(organization: schemas.OrganizationBase,
 
 
 @router.get('/all', response_model=List[schemas.OrganizationOut])
-async def get_organization_list(page: int = 1, limit: int = 20,
-                                db: Session = Depends(get_db),
-                                current_active_user: models.User = Security(get_current_active_user,
-                                                                            scopes=["organizations:view"])) -> Any:
-    return crud.get_organizations_list(db, limit=limit, skip=page - 1)
+def get_organization_list(response: Response,
+                          page: int = 1, limit: int = 20,
+                          cursor: Optional[Cursor] = Depends(get_cursor),
+                          db: Session = Depends(get_db),
+                          current_active_user: models.User = Security(get_current_active_user,
+                                                                      scopes=["organizations:view"])) -> Any:
+
+    organizations = crud.get_organizations_list(db, limit=limit, skip=page - 1, cursor=cursor)
+
+    next_page = next_cursor(organizations, limit)
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
+
+    return organizations
 
 
 @router.get('/search', response_model=List[schemas.OrganizationOut])
-async def search_organizations_by_name(
+def search_organizations_by_name(
         query: str,
         db: Session = Depends(get_db),
         current_active_user: models.User = Security(get_current_active_user,
@@ -52,9 +62,9 @@ async def search_organizations_by_name(
 
 
 @router.get('/{organization_id}', response_model=schemas.OrganizationOut)
-async def get_organization_by_id(organization_id: int, db: Session = Depends(get_db),
-                                 current_active_user: models.User = Security(get_current_active_user,
-                                                                             scopes=['organizations:view'])) -> Any:
+def get_organization_by_id(organization_id: int, db: Session = Depends(get_db),
+                           current_active_user: models.User = Security(get_current_active_user,
+                                                                       scopes=['organizations:view'])) -> Any:
     organization = crud.get_by_id(db, organization_id=organization_id)
     if not organization:
         raise HTTPException(status_code=404, detail="Not found")
@@ -63,7 +73,7 @@ async def get_organization_by_id(organization_id: int, db: Session = Depends(get
 
 
 @router.put('/{organization_id}/edit', response_model=schemas.OrganizationOut)
-async def edit_organization_data(
+def edit_organization_data(
         organization_id: int,
         data: schemas.OrganizationBase,
         db: Session = Depends(get_db),
@@ -80,7 +90,7 @@ async def edit_organization_data(
 
 
 @router.put('/{organization_id}/invite', response_model=schemas.OrganizationOut)
-async def invite_organization_members(
+def invite_organization_members(
         organization_id: int,
         users: schemas.OrganizationUserInvite,
         db: Session = Depends(get_db),
@@ -96,7 +106,7 @@ async def invite_organization_members(
 
 
 @router.put('/{organization_id}/remove', response_model=schemas.OrganizationOut)
-async def remove_organization_member(
+def remove_organization_member(
         organization_id: int,
         user_id: int,
         db: Session = Depends(get_db),
@@ -114,7 +124,7 @@ async def remove_organization_member(
 
 
 @router.delete('/{organization_id}')
-async def delete_organization(
+def delete_organization(
         organization_id: int,
         db: Session = Depends(get_db),
         current_active_user: models.User = Security(get_current_active_user, scopes=['organizations:delete'])
@@ -12,5 +12,5 @@ router = APIRouter()
 
 
 @router.post('/create')
-async def create_report():
+def create_report():
     pass
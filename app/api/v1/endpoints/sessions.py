@@ -13,8 +13,8 @@ router = APIRouter()
 
 
 @router.get('/active', response_model=List[schemas.UserSession])
-async def get_active_sessions(current_user: models.User = Depends(get_current_active_user),
-                              db: Session = Depends(get_db)):
+def get_active_sessions(current_user: models.User = Depends(get_current_active_user),
+                        db: Session = Depends(get_db)):
 
     sessions = crud.get_user_active_sessions(db, user_id=current_user.id)
 
@@ -22,8 +22,8 @@ async def get_active_sessions(current_user: models.User = Depends(get_current_ac
 
 
 @router.post('/revoke', response_model=schemas.UserSession)
-async def revoke_user_session(session_id: int, current_user: models.User = Depends(get_current_active_user),
-                              db: Session = Depends(get_db)):
+def revoke_user_session(session_id: int, current_user: models.User = Depends(get_current_active_user),
+                        db: Session = Depends(get_db)):
 
     revoked_session = crud.revoke_by_id(db, user_id=current_user.id, session_id=session_id)
     if not revoked_session:
@@ -14,7 +14,7 @@ router = APIRouter()
 
 
 @router.post('/register', response_model=schemas.UserOut)
-async def register_user(
+def register_user(
         user: schemas.UserCreate,
         db: Session = Depends(get_db),
         current_active_user: models.User = Security(get_current_active_user, scopes=['users:create'])
@@ -34,7 +34,7 @@ async def register_user(
 
 
 @router.post('/invite', response_model=schemas.UserOut)
-async def generate_invite_link(
+def generate_invite_link(
         user: schemas.UserInvite,
         db: Session = Depends(get_db),
         current_active_user: models.User = Security(get_current_active_user, scopes=['users:create'])
@@ -65,7 +65,7 @@ async def generate_invite_link(
 
 
 @router.get('/verify', response_model=schemas.UserOut)
-async def verify_access_token(
+def verify_access_token(
         access_token: str,
         db: Session = Depends(get_db)
 ) -> Any:
@@ -78,7 +78,7 @@ async def verify_access_token(
 
 
 @router.post('/confirm-registration', response_model=schemas.UserOut)
-async def confirm_user_registration(
+def confirm_user_registration(
         access_token: str,
         user: schemas.UserCreate,
         db: Session = Depends(get_db)
@@ -92,14 +92,14 @@ async def confirm_user_registration(
 
 
 @router.get('/me', response_model=schemas.UserOut)
-async def get_me(
+def get_me(
         current_user: models.User = Security(get_current_active_user, scopes=['users:me'])
 ) -> Any:
     return current_user
 
 
 @router.put('/info', response_model=schemas.UserOut)
-async def patch_user_info(
+def patch_user_info(
         updated_info: schemas.UserBase,
         current_user: models.User = Security(get_current_active_user, scopes=['users:edit']),
         db: Session = Depends(get_db)
@@ -110,7 +110,7 @@ async def patch_user_info(
 
 
 @router.put('/password', response_model=schemas.UserOut)
-async def change_user_password(
+def change_user_password(
         updated_info: schemas.UserPasswordUpdate,
         current_user: models.User = Security(get_current_active_user, scopes=['users:edit']),
         db: Session = Depends(get_db)
@@ -126,7 +126,7 @@ async def change_user_password(
 
 
 @router.put('/password-reset')
-async def reset_user_password(
+def reset_user_password(
         user_email: str,
         db: Session = Depends(get_db)
 ) -> Any:
@@ -148,7 +148,7 @@ async def reset_user_password(
 
 
 @router.put('/confirm-reset')
-async def confirm_user_password_reset(
+def confirm_user_password_reset(
         renewal_data: schemas.UserPasswordRenewal,
         db: Session = Depends(get_db)
 ) -> Any:
@@ -161,7 +161,7 @@ async def confirm_user_password_reset(
 
 
 @router.put('/change-role', response_model=schemas.UserOut)
-async def change_user_role(
+def change_user_role(
         user_id: int,
         role: str,
         current_user: models.User = Security(get_current_active_user, scopes=['users:roles']),
@@ -177,7 +177,7 @@ async def change_user_role(
 
 # TODO do we need this? Is the edit permission right for such operation (reserved route for tests)
 @router.delete('/delete-me')
-async def delete_me(
+def delete_me(
         current_user: models.User = Security(get_current_active_user, scopes=['users:edit']),
         db: Session = Depends(get_db)
 ) -> Any:
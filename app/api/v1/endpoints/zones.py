@@ -13,8 +13,8 @@ from app.crud import crud_zones as crud
 router = APIRouter()
 
 
-@router.post('/restrict')
-async def restrict_zone(
+@router.post('/restrict', response_model=schemas.ZoneGeometryOut)
+def restrict_zone(
         zone: schemas.ZoneBase,
         db: Session = Depends(get_db),
         current_user: models.User = Security(get_current_active_user,
@@ -29,13 +29,18 @@ async def restrict_zone(
         )
 
     geom = geocoding.get_bounding_box_by_region_name(zone.value)
-    restricted_zone = crud.add_restricted_zone(db, zone.zone_type, zone.value, str(geom))
+    if geom is None:
+        raise HTTPException(status_code=400, detail="Cannot find such region")
+
+    restricted_zone = crud.add_restricted_zone(db, zone.zone_type, zone.value, geom)
+    if not restricted_zone:
+        raise HTTPException(status_code=500, detail="Cannot connect to the database, please try again")
 
     return restricted_zone
 
 
 @router.delete('/allow')
-async def allow_zone(
+def allow_zone(
         zone_id: int,
         db: Session = Depends(get_db),
         current_user: models.User = Security(get_current_active_user,
@@ -49,8 +54,8 @@ async def allow_zone(
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-@router.get('/zones')
-async def get_restricted_zones(
+@router.get('/zones', response_model=List[schemas.ZoneOut])
+def get_restricted_zones(
         db: Session = Depends(get_db),
         current_user: models.User = Security(get_current_active_user,
                                              scopes=['zones:get'])
@@ -40,6 +40,16 @@ class Settings(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or ''}"
         )
 
+    # asyncpg engine for the read-heavy map endpoints, see app/api/v1/endpoints/locations_async.py
+    ASYNC_DATABASE_ENABLED: bool = os.getenv("ASYNC_DATABASE_ENABLED", False)
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[str] = None
+
+    @validator("SQLALCHEMY_ASYNC_DATABASE_URI", pre=True)
+    def assemble_async_db_connection(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
+        if isinstance(v, str):
+            return v
+        return str(values.get("SQLALCHEMY_DATABASE_URI")).replace("postgresql://", "postgresql+asyncpg://", 1)
+
     FIRST_SUPERUSER: EmailStr = os.getenv("SUPERUSER_EMAIL", "admin@admin.com")
     FIRST_SUPERUSER_PASSWORD = os.getenv("SUPERUSER_PASSWORD", "asd112233")
 
@@ -55,6 +65,29 @@ class Settings(BaseSettings):
 
     GMAPS_APIKEY: str = os.getenv('GMAPS_APIKEY', None)
 
+    TILE_CACHE_SIZE: int = os.getenv("TILE_CACHE_SIZE", 2048)
+    TILE_CACHE_TTL: int = os.getenv("TILE_CACHE_TTL", 60)
+
+    SPATIAL_INDEX_ENABLED: bool = os.getenv("SPATIAL_INDEX_ENABLED", False)
+    SPATIAL_INDEX_REFRESH_SECONDS: int = os.getenv("SPATIAL_INDEX_REFRESH_SECONDS", 60)
+
+    REVERSE_GEOCODE_CACHE_TTL_DAYS: int = os.getenv("REVERSE_GEOCODE_CACHE_TTL_DAYS", 90)
+
+    GEOCODING_WORKERS: int = os.getenv("GEOCODING_WORKERS", 8)
+    GEOCODING_RETRIES: int = os.getenv("GEOCODING_RETRIES", 3)
+    GMAPS_QPS: float = os.getenv("GMAPS_QPS", 25)
+    NOMINATIM_QPS: float = os.getenv("NOMINATIM_QPS", 1)
+    # longest wait of a request for the Nominatim rate limit, the request gets no address instead of holding a thread
+    REVERSE_GEOCODING_WAIT_SECONDS: float = os.getenv("REVERSE_GEOCODING_WAIT_SECONDS", 3)
+
+    # distance within which a location is considered to be at the requested coordinates, 0 for the exact match
+    LOCATION_MATCH_TOLERANCE_METERS: float = os.getenv("LOCATION_MATCH_TOLERANCE_METERS", 0)
+
+    IMPORT_WORKERS: int = os.getenv("IMPORT_WORKERS", 2)
+    IMPORT_CHUNK_SIZE: int = os.getenv("IMPORT_CHUNK_SIZE", 500)
+    # a running import job without any progress for this long was interrupted, e.g. by a restart
+    IMPORT_JOB_STALE_MINUTES: int = os.getenv("IMPORT_JOB_STALE_MINUTES", 30)
+
     class Config:
         case_sensitive = True
 
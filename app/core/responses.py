@@ -0,0 +1,37 @@
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+"""
+Default response class of the app.
+
+The content is dumped with orjson, which handles the datetimes natively. They are written the same way as
+time_utils.utc_convert writes them, e.g. 2022-10-18T10:15:00Z: the naive datetimes of the database are UTC and the
+JS frontend expects the Z suffix.
+
+FastAPI still runs the jsonable_encoder and the response model validation on whatever an endpoint returns, so the
+hot endpoints return a UTCJSONResponse themselves with content that is already in the response model format.
+"""
+
+JSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_OMIT_MICROSECONDS | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    # the types orjson doesn't know, e.g. the pydantic models, are left to the FastAPI encoder
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    return jsonable_encoder(obj)
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=JSON_OPTIONS)
+
+
+class UTCJSONResponse(ORJSONResponse):
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,6 +1,8 @@
+from typing import List, Optional
+
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 from app.models.changelog import ChangeLog
+from app.utils.pagination import Cursor, keyset_page
 
 
 def create_changelog(db: Session, location_id: int, old_object: dict, new_object: dict):
@@ -18,8 +20,15 @@ def create_changelog(db: Session, location_id: int, old_object: dict, new_object
     return changelog
 
 
-def get_changelogs(db: Session, location_id: int) -> ChangeLog:
-    return db.query(ChangeLog).filter(ChangeLog.location_id == location_id)\
-        .order_by(desc(ChangeLog.created_at)).all()
+def get_changelogs(
+        db: Session,
+        location_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[Cursor] = None
+) -> List[ChangeLog]:
+
+    query = db.query(ChangeLog).filter(ChangeLog.location_id == location_id)
+
+    return keyset_page(query, ChangeLog.created_at, ChangeLog.id, limit, cursor)
 
 
@@ -0,0 +1,61 @@
+from typing import Optional, Dict, List, Tuple
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.geocoding_cache import ReverseGeocode, ForwardGeocode
+from app.db.utc_convertation import utcnow
+
+
+def get_reverse_geocode(db: Session, key: str, ttl: timedelta) -> Optional[ReverseGeocode]:
+    return db.query(ReverseGeocode).filter(
+        ReverseGeocode.key == key,
+        ReverseGeocode.created_at > datetime.utcnow() - ttl
+    ).first()
+
+
+def save_reverse_geocode(db: Session, key: str, lat: float, lng: float, address: Dict) -> None:
+
+    statement = insert(ReverseGeocode).values(
+        key=key,
+        lat=lat,
+        lng=lng,
+        address=address,
+        created_at=utcnow()
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ReverseGeocode.key],
+        set_={
+            "lat": statement.excluded.lat,
+            "lng": statement.excluded.lng,
+            "address": statement.excluded.address,
+            "created_at": statement.excluded.created_at
+        }
+    )
+
+    db.execute(statement)
+    db.commit()
+
+
+def get_forward_geocodes(db: Session, keys: List[str]) -> Dict[str, Tuple[float, float]]:
+    if not keys:
+        return {}
+
+    records = db.query(ForwardGeocode.key, ForwardGeocode.lat, ForwardGeocode.lng)\
+        .filter(ForwardGeocode.key.in_(keys)).all()
+
+    return {record.key: (record.lat, record.lng) for record in records}
+
+
+def save_forward_geocodes(db: Session, coordinates: Dict[str, Tuple[float, float]]) -> None:
+    if not coordinates:
+        return
+
+    statement = insert(ForwardGeocode).values([
+        {"key": key, "lat": lat, "lng": lng, "created_at": utcnow()}
+        for key, (lat, lng) in coordinates.items()
+    ]).on_conflict_do_nothing(index_elements=[ForwardGeocode.key])
+
+    db.execute(statement)
+    db.commit()
@@ -1,10 +1,23 @@
-from typing import List, Any, Optional
+from typing import List, Any, Optional, Dict, Tuple
+from collections import defaultdict
 
+from sqlalchemy import or_, func, select, update, Integer, String
+from sqlalchemy.sql.expression import values as values_clause, column as column_clause
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import pygeohash as pgh
+import numpy as np
 
-from app.models import GeospatialIndex
+from app.models import GeospatialIndex, GeohashCellStats
+from app.models.geohash_cell_stats import status_columns
+from app.schemas.location import MapBounds
+from app.utils import geohash_utils
+from app.utils.vector_tiles import tile_cache, tile_bounds, TILE_BUFFER
+from app.utils.spatial_index import spatial_index, SpatialIndex, Marker
+from app.utils.distance import haversine_km
+from app.core.config import settings
 
 
 def create_index(db: Session, location_id: int, lat: float, lng: float, status: int) -> GeospatialIndex:
@@ -20,29 +33,589 @@ def create_index(db: Session, location_id: int, lat: float, lng: float, status:
     )
 
     db.add(db_obj)
+    add_to_cell_stats(db, geohash=db_obj.geohash, lat=lat, lng=lng, status=status)
     db.commit()
     db.refresh(db_obj)
 
+    tile_cache.invalidate_point(lat, lng)
+    spatial_index.add(db_obj)
+
     return db_obj
 
 
-def search_indexes_in_range(db: Session, lat: float, lng: float, zoom: int = 6) -> List[GeospatialIndex]:
+def bulk_create_indexes(db: Session, locations: List[Tuple[int, float, float, int]]) -> List[GeospatialIndex]:
+
+    """
+    Inserts the markers of many locations with a single statement and adds them to the cell stats. Does not commit,
+    the caller has to pass the result to sync_index_caches after the commit.
+
+    :param locations: A list of (location id, lat, lng, status) tuples
+    :return: A list of the inserted (detached) index records
+    """
+
+    if not locations:
+        return []
+
+    values = [
+        {
+            "location_id": location_id,
+            "geohash": pgh.encode(lat, lng, 12),
+            "lat": lat,
+            "lng": lng,
+            "status": status
+        }
+        for location_id, lat, lng, status in locations
+    ]
+
+    # postgres returns the rows of a multi-row insert in the order of the values
+    ids = db.execute(insert(GeospatialIndex).values(values).returning(GeospatialIndex.id)).scalars().all()
+    add_many_to_cell_stats(db, [(value["geohash"], value["lat"], value["lng"], value["status"]) for value in values])
+
+    return [GeospatialIndex(id=index_id, **value) for index_id, value in zip(ids, values)]
+
+
+def sync_index_caches(
+        index_records: List[GeospatialIndex],
+        updated_index_records: Optional[List[GeospatialIndex]] = None,
+        removed_index_records: Optional[List[GeospatialIndex]] = None
+) -> None:
+
+    """
+    Drops the cached tiles of the newly committed, updated and removed markers, then adds the new ones to the
+    in-process spatial index, updates the status of the updated ones and removes the others.
+    """
+
+    updated_index_records = updated_index_records or []
+    removed_index_records = removed_index_records or []
+
+    for index_record in index_records + updated_index_records + removed_index_records:
+        tile_cache.invalidate_point(index_record.lat, index_record.lng)
+
+    spatial_index.add_many(index_records)
+    for index_record in updated_index_records:
+        spatial_index.update_status(index_record.location_id, index_record.status)
+    for index_record in removed_index_records:
+        spatial_index.remove(index_record.location_id)
+
+
+def _detached_index_record(index_record: Any, status: Optional[int] = None) -> GeospatialIndex:
+    # a copy for sync_index_caches, it keeps the values after the commit expires or deletes the record
+    return GeospatialIndex(
+        id=index_record.id,
+        location_id=index_record.location_id,
+        geohash=index_record.geohash,
+        lat=index_record.lat,
+        lng=index_record.lng,
+        status=index_record.status if status is None else status
+    )
+
+
+def update_index_status(db: Session, index_record: GeospatialIndex, status: int) -> GeospatialIndex:
+
+    """
+    Changes the status of a marker together with its cell stats. Does not commit, the caller has to pass the result
+    to sync_index_caches after the commit. The marker has to be loaded with a row lock (with_for_update), otherwise
+    a concurrent status change of the same marker moves its cell stats twice.
+
+    :return: A detached copy of the marker with the new status
+    """
+
+    update_cell_stats_status(db, geohash=index_record.geohash, old_status=index_record.status, new_status=status)
+    index_record.status = status
+
+    return _detached_index_record(index_record)
+
+
+def bulk_update_index_status(db: Session, location_ids: List[int], status: int) -> List[GeospatialIndex]:
+
+    """
+    Same as update_index_status for the markers of many locations. The status changes are aggregated per cell first,
+    so the cell stats are moved with a single UPDATE ... FROM (VALUES ...). Does not commit, the caller has to pass
+    the result to sync_index_caches after the commit. The markers are locked in the id order while their old status is
+    read, for the same reason as in update_index_status.
+
+    :param location_ids: Ids of the locations whose markers change the status
+    :param status: New status of the markers
+    :return: A list of the markers that changed the status
+    """
+
+    if not location_ids:
+        return []
+
+    index_records = db.query(
+        GeospatialIndex.id,
+        GeospatialIndex.location_id,
+        GeospatialIndex.geohash,
+        GeospatialIndex.lat,
+        GeospatialIndex.lng,
+        GeospatialIndex.status
+    ).filter(GeospatialIndex.location_id.in_(location_ids), GeospatialIndex.status != status)\
+        .order_by(GeospatialIndex.id)\
+        .with_for_update()\
+        .all()
+
+    if not index_records:
+        return []
+
+    deltas = defaultdict(lambda: {column: 0 for column in status_columns.values()})
+    for index_record in index_records:
+        for prefix in geohash_utils.cell_prefixes(index_record.geohash):
+            if index_record.status in status_columns:
+                deltas[prefix][status_columns[index_record.status]] -= 1
+            if status in status_columns:
+                deltas[prefix][status_columns[status]] += 1
+
+    rows = [
+        (prefix, *(delta[name] for name in status_columns.values()))
+        for prefix, delta in deltas.items() if any(delta.values())
+    ]
+    if rows:
+        cell_deltas = values_clause(
+            column_clause("geohash", String),
+            *[column_clause(name, Integer) for name in status_columns.values()],
+            name="cell_deltas"
+        ).data(rows)
+
+        db.execute(
+            update(GeohashCellStats)
+            .where(GeohashCellStats.geohash == cell_deltas.c.geohash)
+            .values({
+                getattr(GeohashCellStats, name): getattr(GeohashCellStats, name) + cell_deltas.c[name]
+                for name in status_columns.values()
+            })
+            .execution_options(synchronize_session=False)
+        )
+
+    db.query(GeospatialIndex)\
+        .filter(GeospatialIndex.id.in_([index_record.id for index_record in index_records]))\
+        .update({GeospatialIndex.status: status}, synchronize_session=False)
 
-    # Use zoom as precision points?
-    # TODO check google api
+    return [_detached_index_record(index_record, status=status) for index_record in index_records]
+
+
+def discard_index(db: Session, index_record: GeospatialIndex) -> GeospatialIndex:
+
+    """
+    Removes a marker from the cell stats. The record itself is removed by the location cascade. Does not commit, the
+    caller has to pass the result to sync_index_caches as a removed record after the commit.
+
+    :return: A detached copy of the marker
+    """
+
+    remove_from_cell_stats(
+        db,
+        geohash=index_record.geohash,
+        lat=index_record.lat,
+        lng=index_record.lng,
+        status=index_record.status
+    )
+
+    return _detached_index_record(index_record)
+
+
+def get_memory_index() -> Optional[SpatialIndex]:
+
+    """
+    Returns the in-process spatial index if it is enabled and loaded. It is reloaded in the background, see
+    SpatialIndex.start_refresh, until then the queries go to the database.
+    """
+
+    if not settings.SPATIAL_INDEX_ENABLED or not spatial_index.is_loaded:
+        return None
+
+    return spatial_index
+
+
+def _viewport_cells(
+        lat: float,
+        lng: float,
+        zoom: Optional[int] = None,
+        bounds: Optional[MapBounds] = None
+) -> List[str]:
+
+    if bounds:
+        return geohash_utils.viewport_cells(bounds.south, bounds.west, bounds.north, bounds.east)
+
+    return geohash_utils.neighbour_cells(lat, lng, geohash_utils.zoom_to_precision(zoom))
+
+
+def search_indexes_in_range(
+        db: Session,
+        lat: float,
+        lng: float,
+        zoom: Optional[int] = None,
+        bounds: Optional[MapBounds] = None
+) -> List[Marker]:
+
+    """
+    Returns the markers visible on the map. If the viewport bounds are known, we cover them with the geohash cells
+    and trim the result to the bounds, otherwise the precision is taken from the zoom level and we search in the
+    center cell and its neighbours.
+
+    :param lat: Latitude of the map center
+    :param lng: Longitude of the map center
+    :param zoom: Map zoom level
+    :param bounds: Optional viewport bounding box
+    :return: A list of markers
+    """
+
+    cells = _viewport_cells(lat, lng, zoom, bounds)
+
+    memory_index = get_memory_index()
+    if memory_index is not None:
+        if bounds:
+            return memory_index.search(cells, bounds.south, bounds.west, bounds.north, bounds.east)
+        return memory_index.search(cells)
+
+    return [Marker(*record) for record in db.execute(_range_query(cells, bounds))]
+
+
+async def search_indexes_in_range_async(
+        db: AsyncSession,
+        lat: float,
+        lng: float,
+        zoom: Optional[int] = None,
+        bounds: Optional[MapBounds] = None
+) -> List[Marker]:
+
+    """
+    Same as search_indexes_in_range, for the async database session.
+    """
+
+    cells = _viewport_cells(lat, lng, zoom, bounds)
+
+    memory_index = get_memory_index()
+    if memory_index is not None:
+        if bounds:
+            return memory_index.search(cells, bounds.south, bounds.west, bounds.north, bounds.east)
+        return memory_index.search(cells)
+
+    result = await db.execute(_range_query(cells, bounds))
+    return [Marker(*record) for record in result]
+
+
+def _range_query(cells: List[str], bounds: Optional[MapBounds] = None) -> Any:
+    # only the Marker columns, the map can ask for tens of thousands of markers at once
+    query = select(
+        GeospatialIndex.id,
+        GeospatialIndex.location_id,
+        GeospatialIndex.lat,
+        GeospatialIndex.lng,
+        GeospatialIndex.status
+    ).filter(
+        or_(*[GeospatialIndex.geohash.like("{}%".format(cell)) for cell in cells])
+    )
 
-    # You can check the link below to understand the precision levels, for instance 2 is ≤ 1,250km X 625km
-    # https://docs.quadrant.io/quadrant-geohash-algorithm
-    geohash = pgh.encode(lat, lng, 2)
+    if bounds:
+        query = query.filter(
+            GeospatialIndex.lat.between(bounds.south, bounds.north),
+            GeospatialIndex.lng.between(bounds.west, bounds.east)
+        )
 
-    # print(f"Geohash : {geohash}")
-    query = "{}%".format(geohash)
-    # print(f"Query : {query}")
+    return query
 
-    return db.query(GeospatialIndex).filter(GeospatialIndex.geohash.like(query)).all()
+
+def search_nearby_indexes(
+        db: Session,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        limit: int,
+        status: Optional[int] = None
+) -> List[Marker]:
+
+    """
+    Returns the markers closest to the point within the radius. The candidates are the markers of the geohash cell of
+    the point and its neighbours, their distances are calculated in a single numpy pass.
+
+    :param lat: Latitude of the point
+    :param lng: Longitude of the point
+    :param radius_km: Search radius in kilometers
+    :param limit: Maximum amount of markers to return
+    :param status: Optional status the markers should have
+    :return: A list of markers with their distance (km) to the point, the closest ones first
+    """
+
+    cells = geohash_utils.neighbour_cells(lat, lng, geohash_utils.radius_precision(lat, radius_km))
+
+    memory_index = get_memory_index()
+    if memory_index is not None:
+        return memory_index.search_radius(cells, lat, lng, radius_km, status)[:limit]
+
+    query = db.query(
+        GeospatialIndex.id,
+        GeospatialIndex.location_id,
+        GeospatialIndex.lat,
+        GeospatialIndex.lng,
+        GeospatialIndex.status
+    ).filter(or_(*[GeospatialIndex.geohash.like("{}%".format(cell)) for cell in cells]))
+
+    if status is not None:
+        query = query.filter(GeospatialIndex.status == status)
+
+    candidates = query.all()
+    if not candidates:
+        return []
+
+    distances = haversine_km(
+        lat,
+        lng,
+        np.fromiter((candidate.lat for candidate in candidates), dtype=np.float64, count=len(candidates)),
+        np.fromiter((candidate.lng for candidate in candidates), dtype=np.float64, count=len(candidates))
+    )
+
+    order = np.argsort(distances, kind="stable")
+    order = order[distances[order] <= radius_km][:limit]
+
+    return [Marker(*candidates[position], distance=distances[position].item()) for position in order.tolist()]
+
+
+def search_indexes_in_tile(db: Session, z: int, x: int, y: int) -> List[Marker]:
+
+    """
+    Returns the markers of a vector tile, including the ones in the tile buffer.
+
+    :param z: Zoom level
+    :param x: Tile x
+    :param y: Tile y
+    :return: A list of markers
+    """
+
+    south, west, north, east = tile_bounds(z, x, y, buffer=TILE_BUFFER)
+
+    return search_indexes_in_range(
+        db,
+        lat=(south + north) / 2,
+        lng=(west + east) / 2,
+        zoom=z,
+        bounds=MapBounds(north=north, east=east, south=south, west=west)
+    )
+
+
+def cluster_indexes_in_range(
+        db: Session,
+        lat: float,
+        lng: float,
+        zoom: Optional[int] = None,
+        bounds: Optional[MapBounds] = None
+) -> List[Dict]:
+
+    """
+    Returns the marker clusters visible on the map, one per geohash cell of the clustering precision. The clusters
+    are read from the precomputed cell stats, so the amount of work depends on the cells on the screen and not on
+    the amount of markers inside them.
+
+    :param lat: Latitude of the map center
+    :param lng: Longitude of the map center
+    :param zoom: Map zoom level
+    :param bounds: Optional viewport bounding box
+    :return: A list of clusters with their marker count, centroid and per status marker count
+    """
+
+    precision = geohash_utils.cluster_precision(zoom)
+    cells = _viewport_cells(lat, lng, zoom, bounds)
+
+    query = db.query(GeohashCellStats).filter(
+        GeohashCellStats.precision == precision,
+        GeohashCellStats.count > 0,
+        or_(*[
+            GeohashCellStats.geohash == cell[:precision] if len(cell) >= precision
+            else GeohashCellStats.geohash.like("{}%".format(cell))
+            for cell in cells
+        ])
+    )
+
+    if bounds:
+        query = query.filter(
+            GeohashCellStats.min_lat <= bounds.north,
+            GeohashCellStats.max_lat >= bounds.south,
+            GeohashCellStats.min_lng <= bounds.east,
+            GeohashCellStats.max_lng >= bounds.west
+        )
+
+    return [
+        {
+            "geohash": cell_stats.geohash,
+            "count": cell_stats.count,
+            "position": {
+                "lat": cell_stats.lat_sum / cell_stats.count,
+                "lng": cell_stats.lng_sum / cell_stats.count
+            },
+            "statuses": {
+                location_status: getattr(cell_stats, column) for location_status, column in status_columns.items()
+            }
+        }
+        for cell_stats in query.all()
+    ]
 
 
 def search_index_by_location_id(db: Session, location_id: int) -> GeospatialIndex:
     return db.query(GeospatialIndex).filter(GeospatialIndex.location_id == location_id).first()
 
 
+def get_cell_stats(db: Session, geohash: str) -> Optional[GeohashCellStats]:
+    return db.query(GeohashCellStats).filter(GeohashCellStats.geohash == geohash).first()
+
+
+def _cell_stats_merge(statement: Any) -> Dict:
+    # adds the counters of the inserted row to the existing one and widens its bounding box
+    return {
+        "count": GeohashCellStats.count + statement.excluded.count,
+        "lat_sum": GeohashCellStats.lat_sum + statement.excluded.lat_sum,
+        "lng_sum": GeohashCellStats.lng_sum + statement.excluded.lng_sum,
+        "min_lat": func.least(GeohashCellStats.min_lat, statement.excluded.min_lat),
+        "max_lat": func.greatest(GeohashCellStats.max_lat, statement.excluded.max_lat),
+        "min_lng": func.least(GeohashCellStats.min_lng, statement.excluded.min_lng),
+        "max_lng": func.greatest(GeohashCellStats.max_lng, statement.excluded.max_lng),
+        **{
+            column: getattr(GeohashCellStats, column) + getattr(statement.excluded, column)
+            for column in status_columns.values()
+        }
+    }
+
+
+def add_to_cell_stats(db: Session, geohash: str, lat: float, lng: float, status: int) -> None:
+
+    """
+    Adds a marker to the stats of every cell containing it. The stats are updated with a single upsert, so the
+    concurrent requests cannot overwrite each other's counters. The caller is responsible for the commit, so the
+    stats are saved in the same transaction as the marker itself.
+
+    :param geohash: Full precision geohash of the marker
+    :param lat: Latitude of the marker
+    :param lng: Longitude of the marker
+    :param status: Status of the marker
+    """
+
+    statement = insert(GeohashCellStats).values([
+        {
+            "geohash": prefix,
+            "precision": len(prefix),
+            "count": 1,
+            "lat_sum": lat,
+            "lng_sum": lng,
+            "min_lat": lat,
+            "max_lat": lat,
+            "min_lng": lng,
+            "max_lng": lng,
+            **{column: int(location_status == status) for location_status, column in status_columns.items()}
+        }
+        for prefix in geohash_utils.cell_prefixes(geohash)
+    ])
+
+    statement = statement.on_conflict_do_update(
+        index_elements=[GeohashCellStats.geohash],
+        set_=_cell_stats_merge(statement)
+    )
+
+    db.execute(statement)
+
+
+def add_many_to_cell_stats(db: Session, markers: List[Tuple[str, float, float, int]]) -> None:
+
+    """
+    Same as add_to_cell_stats for many markers. The markers are aggregated per cell first, as a single upsert can't
+    update the same row twice. Does not commit.
+
+    :param markers: A list of (full precision geohash, lat, lng, status) tuples
+    """
+
+    cells = defaultdict(lambda: {
+        "count": 0,
+        "lat_sum": 0.0,
+        "lng_sum": 0.0,
+        "min_lat": None,
+        "max_lat": None,
+        "min_lng": None,
+        "max_lng": None,
+        **{column: 0 for column in status_columns.values()}
+    })
+
+    for geohash, lat, lng, status in markers:
+        for prefix in geohash_utils.cell_prefixes(geohash):
+            cell = cells[prefix]
+            cell["count"] += 1
+            cell["lat_sum"] += lat
+            cell["lng_sum"] += lng
+            cell["min_lat"] = lat if cell["min_lat"] is None else min(cell["min_lat"], lat)
+            cell["max_lat"] = lat if cell["max_lat"] is None else max(cell["max_lat"], lat)
+            cell["min_lng"] = lng if cell["min_lng"] is None else min(cell["min_lng"], lng)
+            cell["max_lng"] = lng if cell["max_lng"] is None else max(cell["max_lng"], lng)
+            if status in status_columns:
+                cell[status_columns[status]] += 1
+
+    if not cells:
+        return
+
+    statement = insert(GeohashCellStats).values([
+        {"geohash": prefix, "precision": len(prefix), **cell} for prefix, cell in cells.items()
+    ])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[GeohashCellStats.geohash],
+        set_=_cell_stats_merge(statement)
+    ))
+
+
+def update_cell_stats_status(db: Session, geohash: str, old_status: int, new_status: int) -> None:
+
+    """
+    Moves a marker from one status counter to another in every cell containing it. Does not commit.
+
+    :param geohash: Full precision geohash of the marker
+    :param old_status: Previous status of the marker
+    :param new_status: New status of the marker
+    """
+
+    if old_status == new_status:
+        return
+
+    values = {}
+    if old_status in status_columns:
+        values[status_columns[old_status]] = getattr(GeohashCellStats, status_columns[old_status]) - 1
+    if new_status in status_columns:
+        values[status_columns[new_status]] = getattr(GeohashCellStats, status_columns[new_status]) + 1
+
+    if not values:
+        return
+
+    db.query(GeohashCellStats)\
+        .filter(GeohashCellStats.geohash.in_(geohash_utils.cell_prefixes(geohash)))\
+        .update(values, synchronize_session=False)
+
+
+def remove_from_cell_stats(db: Session, geohash: str, lat: float, lng: float, status: int) -> None:
+
+    """
+    Removes a marker from the stats of every cell containing it and drops the cells that became empty.
+    Does not commit.
+
+    :param geohash: Full precision geohash of the marker
+    :param lat: Latitude of the marker
+    :param lng: Longitude of the marker
+    :param status: Status of the marker
+    """
+
+    prefixes = geohash_utils.cell_prefixes(geohash)
+
+    values = {
+        GeohashCellStats.count: GeohashCellStats.count - 1,
+        GeohashCellStats.lat_sum: GeohashCellStats.lat_sum - lat,
+        GeohashCellStats.lng_sum: GeohashCellStats.lng_sum - lng,
+    }
+    if status in status_columns:
+        column = getattr(GeohashCellStats, status_columns[status])
+        values[column] = column - 1
+
+    db.query(GeohashCellStats)\
+        .filter(GeohashCellStats.geohash.in_(prefixes))\
+        .update(values, synchronize_session=False)
+
+    db.query(GeohashCellStats)\
+        .filter(GeohashCellStats.geohash.in_(prefixes), GeohashCellStats.count <= 0)\
+        .delete(synchronize_session=False)
+
+
+def clear_cell_stats(db: Session) -> None:
+    db.query(GeohashCellStats).delete(synchronize_session=False)
+    tile_cache.clear()
+    spatial_index.clear()
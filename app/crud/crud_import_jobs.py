@@ -0,0 +1,103 @@
+from typing import Any, Optional, Dict, List
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models.import_job import ImportJob, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED
+
+
+def create_import_job(
+        db: Session,
+        *,
+        filename: str,
+        filepath: str,
+        doctype: str,
+        deduplicate: bool = False
+) -> ImportJob:
+
+    db_obj = ImportJob(
+        filename=filename,
+        filepath=filepath,
+        doctype=doctype,
+        deduplicate=deduplicate,
+        status=JOB_QUEUED,
+        counts={},
+        unprocessed=[]
+    )
+
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+
+    return db_obj
+
+
+def get_import_job(db: Session, job_id: int) -> Optional[ImportJob]:
+    return db.query(ImportJob).get(job_id)
+
+
+def get_queued_import_jobs(db: Session) -> List[ImportJob]:
+    return db.query(ImportJob).filter(ImportJob.status == JOB_QUEUED).order_by(ImportJob.id).all()
+
+
+def fail_stale_import_jobs(db: Session, stale_after: timedelta, error: str) -> List[Any]:
+
+    """
+    Fails the running jobs that didn't report any progress for stale_after: the process that ran them is gone, e.g.
+    restarted, and nothing else would ever finish them. They aren't queued again, as a part of their rows may be
+    inserted already. A single conditional update, so a job is failed only once when several processes start.
+
+    :return: The (id, filepath) rows of the failed jobs
+    """
+
+    stale_jobs = db.execute(
+        update(ImportJob)
+        .where(ImportJob.status == JOB_RUNNING, ImportJob.updated_at < datetime.utcnow() - stale_after)
+        .values(status=JOB_FAILED, error=error)
+        .returning(ImportJob.id, ImportJob.filepath)
+    ).all()
+    db.commit()
+
+    return stale_jobs
+
+
+def claim_import_job(db: Session, job_id: int) -> bool:
+
+    """
+    Moves the job from queued to running in a single statement, so only one worker can ever run it.
+
+    :return: True if the job was claimed by the caller
+    """
+
+    claimed = db.query(ImportJob)\
+        .filter(ImportJob.id == job_id, ImportJob.status == JOB_QUEUED)\
+        .update({ImportJob.status: JOB_RUNNING}, synchronize_session=False)
+    db.commit()
+
+    return claimed == 1
+
+
+def update_import_job_progress(db: Session, job_id: int, stage: str, counts: Dict[str, int]) -> None:
+
+    db.query(ImportJob)\
+        .filter(ImportJob.id == job_id)\
+        .update({ImportJob.stage: stage, ImportJob.counts: counts}, synchronize_session=False)
+    db.commit()
+
+
+def finish_import_job(db: Session, job_id: int, unprocessed: List[Dict]) -> None:
+
+    db.query(ImportJob)\
+        .filter(ImportJob.id == job_id)\
+        .update({ImportJob.status: JOB_DONE, ImportJob.unprocessed: unprocessed}, synchronize_session=False)
+    db.commit()
+
+
+def fail_import_job(db: Session, job_id: int, error: str) -> None:
+
+    db.rollback()
+    db.query(ImportJob)\
+        .filter(ImportJob.id == job_id)\
+        .update({ImportJob.status: JOB_FAILED, ImportJob.error: error}, synchronize_session=False)
+    db.commit()
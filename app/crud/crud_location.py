@@ -1,18 +1,69 @@
-from typing import List, Any, Optional, Dict
+from typing import List, Any, Optional, Dict, Tuple, NamedTuple
 from datetime import datetime, timedelta
+import csv
+import io
+import json
+import math
 
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import desc, func, select, text, or_
+from sqlalchemy.dialects.postgresql import insert
+
+import pygeohash as pgh
 
 from app.crud.crud_changelogs import create_changelog
-from app.crud.crud_geospatial import create_index
+from app.crud.crud_geospatial import create_index, update_index_status, discard_index, clear_cell_stats, \
+    bulk_create_indexes, bulk_update_index_status, sync_index_caches, add_many_to_cell_stats
 from app.models.location import Location
 from app.models.user import User
+from app.models.organization import Organization
 from app.models.geospatial_index import GeospatialIndex
+from app.models.changelog import ChangeLog
 from app.schemas.location import LocationCreate, LocationReports
+from app.db.utc_convertation import utcnow
 from app.utils.populate_db import populate_reports
+from app.utils.distance import EARTH_RADIUS_KM
+from app.utils.geohash_utils import neighbour_cells, radius_precision
+from app.utils.pagination import Cursor, keyset_page
+from app.utils.geocoding import normalize_address
 from app.core.config import settings
 
+# the precision of Location.geohash, a cell is a few centimeters wide
+COORDINATES_GEOHASH_PRECISION = 12
+
+# ~5x5 meters, two imported rows within the same cell and with the same address are the same location
+DEDUP_GEOHASH_PRECISION = 9
+
+
+def location_geohash(lat: Optional[float], lng: Optional[float]) -> Optional[str]:
+    if lat is None or lng is None:
+        return None
+
+    return pgh.encode(lat, lng, COORDINATES_GEOHASH_PRECISION)
+
+
+def location_dedup_key(
+        lat: Optional[float],
+        lng: Optional[float],
+        address: Optional[str],
+        street_number: Optional[str],
+        city: Optional[str]
+) -> Optional[str]:
+
+    """
+    Builds the key the duplicate locations are detected by: the geohash cell of the location and its normalized
+    address.
+    """
+
+    if lat is None or lng is None:
+        return None
+
+    return "{}:{}".format(
+        pgh.encode(lat, lng, DEDUP_GEOHASH_PRECISION),
+        normalize_address("{}, {}".format(address or '', street_number or ''), city)
+    )
+
 
 def create_location(db: Session, *, obj_in: LocationCreate) -> Location:
 
@@ -25,7 +76,9 @@ def create_location(db: Session, *, obj_in: LocationCreate) -> Location:
             country=obj_in.country,
             city=obj_in.city,
             status=3,
-            reports=populate_reports()
+            reports=populate_reports(),
+            geohash=location_geohash(obj_in.lat, obj_in.lng),
+            dedup_key=location_dedup_key(obj_in.lat, obj_in.lng, obj_in.address, None, obj_in.city)
         )
 
         db.add(db_obj)
@@ -62,9 +115,11 @@ def create_location_review_request(
             index=address.get('postcode', None),
             lat=lat,
             lng=lng,
+            geohash=location_geohash(lat, lng),
             status=1,
             requested_by=requested_by
         )
+        db_obj.dedup_key = location_dedup_key(lat, lng, db_obj.address, db_obj.street_number, db_obj.city)
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
@@ -104,21 +159,145 @@ def create_location_review_request(
 #         return None
 
 
+# Location.to_json needs the reporting user's organization. Lazy loading it costs two queries per location of a list,
+# so the lists serialized with to_json load it with a join.
+_reported_by_organization = joinedload(Location.reported_by_model).joinedload(User.organization_model)
+
+
 def get_location_by_id(db: Session, location_id: int) -> Location:
     return db.query(Location).get(location_id)
 
 
-def get_location_by_coordinates(db: Session, lat: float, lng: float) -> Location:
-    return db.query(Location).filter(Location.lat == lat, Location.lng == lng).first()
+def get_location_by_coordinates(
+        db: Session,
+        lat: float,
+        lng: float,
+        tolerance_meters: Optional[float] = None
+) -> Optional[Location]:
+
+    """
+    Finds the location at the coordinates through the indexed geohash of the locations.
+
+    :param tolerance_meters: Distance within which a location matches the coordinates, LOCATION_MATCH_TOLERANCE_METERS
+        if not provided. With 0 only the exact coordinates match
+    :return: The matching location, the nearest one if there are several
+    """
+
+    if tolerance_meters is None:
+        tolerance_meters = float(settings.LOCATION_MATCH_TOLERANCE_METERS)
+
+    if not tolerance_meters:
+        return db.query(Location).filter(
+            Location.geohash == location_geohash(lat, lng),
+            Location.lat == lat,
+            Location.lng == lng
+        ).order_by(Location.id).first()
+
+    # the cell of the point and its neighbours cover the whole circle, the distance filter is done within them
+    tolerance_km = tolerance_meters / 1000
+    cells = neighbour_cells(lat, lng, radius_precision(lat, tolerance_km))
+    distance = distance_km(lat, lng)
+
+    return db.query(Location)\
+        .filter(or_(*[Location.geohash.like("{}%".format(cell)) for cell in cells]))\
+        .filter(distance <= tolerance_km)\
+        .order_by(distance, Location.id)\
+        .first()
 
 
 def get_locations_awaiting_reports_count(db: Session) -> int:
     return db.query(Location).filter(Location.status == 1, Location.reported_by == None).count()
 
 
-def get_locations_awaiting_reports(db: Session, limit: int = 20, skip: int = 0) -> List[Location]:
-    return db.query(Location).filter(Location.status == 1, Location.reported_by == None)\
-        .order_by(desc(Location.created_at))\
+# the LocationOut columns and the organization name of the reporting user, see location_rows
+_LOCATION_ROW_COLUMNS = (
+    Location.id,
+    Location.created_at,
+    Location.updated_at,
+    Location.address,
+    Location.street_number,
+    Location.index,
+    Location.city,
+    Location.status,
+    Location.country,
+    Location.lat,
+    Location.lng,
+    Location.reports,
+    Location.reported_by,
+    Location.report_expires,
+    Organization.name.label('organization_name'),
+)
+
+
+def _with_reporting_organization(query: Any) -> Any:
+    # works for both the session queries and the select() statements of the async session
+    return query.outerjoin(User, Location.reported_by == User.id)\
+        .outerjoin(Organization, User.organization == Organization.id)
+
+
+def location_rows(db: Session, *columns: Any) -> Any:
+
+    """
+    Column projection of the locations for the read endpoints: the LocationOut columns and the organization name of
+    the reporting user, without building the ORM objects. The rows are serialized with Location.row_to_json.
+
+    :param columns: Extra columns of the rows, e.g. the distance to the user
+    :return: A query of the location rows
+    """
+
+    return _with_reporting_organization(db.query(*_LOCATION_ROW_COLUMNS, *columns))
+
+
+def get_location_row(db: Session, location_id: int) -> Optional[Any]:
+    return location_rows(db).filter(Location.id == location_id).first()
+
+
+async def get_location_row_async(db: AsyncSession, location_id: int) -> Optional[Any]:
+    result = await db.execute(
+        _with_reporting_organization(select(*_LOCATION_ROW_COLUMNS)).filter(Location.id == location_id)
+    )
+    return result.first()
+
+
+def get_locations_awaiting_reports(
+        db: Session,
+        limit: int = 20,
+        skip: int = 0,
+        cursor: Optional[Cursor] = None
+) -> List[Any]:
+    query = location_rows(db).filter(Location.status == 1, Location.reported_by == None)
+
+    return keyset_page(query, Location.created_at, Location.id, limit, cursor, skip)
+
+
+def distance_km(lat: float, lng: float) -> Any:
+
+    """
+    SQL expression of the haversine distance (km) between a location and the point, so the locations can be sorted
+    and paginated by distance in the database.
+    """
+
+    d_lat = func.radians(Location.lat - lat)
+    d_lng = func.radians(Location.lng - lng)
+
+    a = func.power(func.sin(d_lat / 2), 2) \
+        + math.cos(math.radians(lat)) * func.cos(func.radians(Location.lat)) * func.power(func.sin(d_lng / 2), 2)
+
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(a, 1.0)))
+
+
+def get_nearest_locations_awaiting_reports(
+        db: Session,
+        lat: float,
+        lng: float,
+        limit: int = 20,
+        skip: int = 0
+) -> List[Any]:
+    distance = distance_km(lat, lng).label('distance')
+
+    return location_rows(db, distance)\
+        .filter(Location.status == 1, Location.reported_by == None)\
+        .order_by(distance, Location.id)\
         .limit(limit)\
         .offset(skip * limit).all()
 
@@ -162,7 +341,19 @@ def remove_assignment(db: Session, location_id: int, user_id: int) -> Optional[L
 
 
 def get_user_assigned_locations(db: Session, user_id: int) -> List[Location]:
-    return db.query(Location).filter(Location.reported_by == user_id, Location.status == 1).all()
+    return db.query(Location).options(_reported_by_organization)\
+        .filter(Location.reported_by == user_id, Location.status == 1).all()
+
+
+def _reports_values(obj_in: LocationReports) -> Dict:
+    return {
+        "buildingCondition": obj_in.buildingCondition,
+        "electricity": obj_in.electricity,
+        "carEntrance": obj_in.carEntrance,
+        "water": obj_in.water,
+        "fuelStation": obj_in.fuelStation,
+        "hospital": obj_in.hospital,
+    }
 
 
 def submit_location_reports(db: Session, *, obj_in: LocationReports, user_id: int) -> Any:
@@ -186,14 +377,11 @@ def submit_location_reports(db: Session, *, obj_in: LocationReports, user_id: in
     if obj_in.index:
         location.index = obj_in.index
 
-    reports = {
-        "buildingCondition": obj_in.buildingCondition,
-        "electricity": obj_in.electricity,
-        "carEntrance": obj_in.carEntrance,
-        "water": obj_in.water,
-        "fuelStation": obj_in.fuelStation,
-        "hospital": obj_in.hospital,
-    }
+    location.dedup_key = location_dedup_key(
+        location.lat, location.lng, location.address, location.street_number, location.city
+    )
+
+    reports = _reports_values(obj_in)
 
     old_reports = location.reports
     new_reports = reports
@@ -208,14 +396,21 @@ def submit_location_reports(db: Session, *, obj_in: LocationReports, user_id: in
     location.reported_by = user_id
 
     # update
-    index_record = db.query(GeospatialIndex).filter(GeospatialIndex.location_id == obj_in.location_id).first()
-    index_record.status = 3
+    # the old status of the marker is read under a row lock, so the concurrent submissions don't move its cell stats
+    # twice: the second one waits for the first to commit and finds the marker already approved
+    index_record = db.query(GeospatialIndex)\
+        .filter(GeospatialIndex.location_id == obj_in.location_id)\
+        .with_for_update()\
+        .populate_existing()\
+        .first()
+    updated_index_record = update_index_status(db, index_record, status=3)
 
     user = db.query(User).get(user_id)
     user.last_activity = datetime.now()
 
     db.commit()
     db.refresh(location)
+    sync_index_caches([], [updated_index_record])
 
     changelog = create_changelog(db,
                                  location_id=location.id,
@@ -227,63 +422,264 @@ def submit_location_reports(db: Session, *, obj_in: LocationReports, user_id: in
     return location
 
 
-def get_activity_feed(db: Session, records: int = 10) -> List[Location]:
-    return db.query(Location).filter(Location.status == 3).order_by(desc(Location.created_at)).limit(records)
+def get_activity_feed(db: Session, records: int = 10) -> List[Any]:
+    return location_rows(db)\
+        .filter(Location.status == 3)\
+        .order_by(desc(Location.created_at))\
+        .limit(records).all()
+
 
+async def get_activity_feed_async(db: AsyncSession, records: int = 10) -> List[Any]:
+    result = await db.execute(
+        _with_reporting_organization(select(*_LOCATION_ROW_COLUMNS))
+        .filter(Location.status == 3)
+        .order_by(desc(Location.created_at))
+        .limit(records)
+    )
+    return result.all()
 
-def bulk_insert_locations(
-        db: Session,
-        locations: List[Dict]
-) -> Dict:
 
-    added_locations = []
-    exceptions = []
+class _ImportRow(NamedTuple):
+    location: Dict
+    reports: Dict
+    dedup_key: Optional[str]
+    # (id, reports) of the existing location the row is merged into
+    duplicate: Optional[Any] = None
 
-    reporting_user = db.query(User).filter(User.email == settings.FIRST_SUPERUSER).first()
 
-    for location in locations:
-        try:
-            db_obj = Location(
-                address=location.get('address'),
-                index=location.get('postcode'),
-                lat=location.get('lat'),
-                lng=location.get('lng'),
-                country=location.get('country'),
-                city=location.get('city'),
-                status=3,
-                reports=location.get('reports'),
-                street_number=location.get('street_number', None)
-            )
+class _ImportResult(NamedTuple):
+    created: List[int]
+    updated: List[int]
+    index_records: List[GeospatialIndex]
+    updated_index_records: List[GeospatialIndex]
 
-            db.add(db_obj)
-            db.commit()
-            db.refresh(db_obj)
 
-            index = create_index(
-                db,
-                location_id=db_obj.id,
-                lat=db_obj.lat,
-                lng=db_obj.lng,
-                status=db_obj.status
-            )
+def find_duplicate_locations(db: Session, dedup_keys: List[str]) -> Dict[str, Any]:
+
+    """
+    Looks the existing locations up by their dedup keys with a single query.
+
+    The dedup key can't be unique, request-info and the reviewers may still add near-duplicate locations. So a
+    transaction level advisory lock is taken per key first: a concurrent import of the same keys waits until this
+    transaction commits and then finds the locations it added. Every import locks the keys in the same order, so two of
+    them can't deadlock.
+
+    :param dedup_keys: Keys built with location_dedup_key
+    :return: Dedup key -> (id, reports) of the oldest location with the key
+    """
+
+    duplicates = {}
+    if not dedup_keys:
+        return duplicates
+
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(dedup_key)) FROM unnest(CAST(:dedup_keys AS text[])) AS dedup_key"),
+        {"dedup_keys": sorted(set(dedup_keys))}
+    )
+
+    existing_locations = db.query(Location.id, Location.dedup_key, Location.reports)\
+        .filter(Location.dedup_key.in_(set(dedup_keys)))\
+        .order_by(desc(Location.id))
+
+    for existing_location in existing_locations:
+        duplicates[existing_location.dedup_key] = existing_location
+
+    return duplicates
 
-            submit_location_reports(
-                db,
-                obj_in=LocationReports(location_id=db_obj.id, **location.get('reports')),
-                user_id=reporting_user.id
+
+def _prepare_import_rows(
+        db: Session,
+        locations: List[Dict],
+        deduplicate: bool = False
+) -> Tuple[List[_ImportRow], List[Dict]]:
+
+    """
+    Validates the reports of the imported locations and, if asked to, matches them with the existing locations.
+
+    :return: A tuple of the rows to import and the rows that can't be imported
+    """
+
+    rows = []
+    exceptions = []
+    for location in locations:
+        try:
+            reports = _reports_values(LocationReports(location_id=0, **location.get('reports')))
+            dedup_key = location_dedup_key(
+                location.get('lat'),
+                location.get('lng'),
+                location.get('address'),
+                location.get('street_number'),
+                location.get('city')
             )
-            added_locations.append(db_obj)
+            rows.append(_ImportRow(location, reports, dedup_key))
 
         except Exception as e:
-            print(e)
             exceptions.append({
                 "location": location,
-                "code": "DATABASE_ERROR",
+                "code": "VALIDATION_ERROR",
                 "detail": e
             })
 
+    if not deduplicate:
+        return rows, exceptions
+
+    duplicates = find_duplicate_locations(db, [row.dedup_key for row in rows if row.dedup_key])
+
+    # a location can only be upserted once per statement, so the last of the same rows of the batch wins
+    last_rows = {row.dedup_key: row for row in rows if row.dedup_key}
+    unique_rows = []
+    for row in rows:
+        if row.dedup_key and last_rows[row.dedup_key] is not row:
+            exceptions.append({
+                "location": row.location,
+                "code": "DUPLICATE_ROW",
+                "detail": "The same location is repeated further in the file"
+            })
+            continue
+        unique_rows.append(row._replace(duplicate=duplicates.get(row.dedup_key)))
+
+    return unique_rows, exceptions
+
+
+def _insert_reported_locations(
+        db: Session,
+        rows: List[_ImportRow],
+        user_id: int
+) -> _ImportResult:
+
+    """
+    Upserts reported locations together with their markers and changelogs, a statement per table. The rows matched
+    with an existing location update it, the rest are inserted. Does not commit.
+
+    :param rows: Validated rows of the import
+    :param user_id: Id of the user the reports are submitted by
+    :return: The ids of the created and updated locations and their markers
+    """
+
+    next_location_id = func.nextval(func.pg_get_serial_sequence('location', 'id'))
+
+    statement = insert(Location).values([
+        {
+            "id": row.duplicate.id if row.duplicate else next_location_id,
+            "address": row.location.get('address'),
+            "index": row.location.get('postcode'),
+            "lat": row.location.get('lat'),
+            "lng": row.location.get('lng'),
+            "country": row.location.get('country'),
+            "city": row.location.get('city'),
+            "street_number": row.location.get('street_number', None),
+            "status": 3,
+            "reports": row.reports,
+            "reported_by": user_id,
+            "report_expires": None,
+            "geohash": location_geohash(row.location.get('lat'), row.location.get('lng')),
+            "dedup_key": row.dedup_key
+        }
+        for row in rows
+    ])
+    # the coordinates of a matched location are kept, so its marker and the cell stats stay valid
+    statement = statement.on_conflict_do_update(
+        index_elements=[Location.id],
+        set_={
+            "updated_at": utcnow(),
+            **{
+                column: getattr(statement.excluded, column)
+                for column in ("address", "index", "country", "city", "street_number", "status", "reports",
+                               "reported_by", "report_expires")
+            }
+        }
+    )
+
+    # postgres returns the rows of a multi-row insert in the order of the values
+    location_ids = db.execute(statement.returning(Location.id)).scalars().all()
+
+    created = [(location_id, row) for location_id, row in zip(location_ids, rows) if not row.duplicate]
+    updated = [(location_id, row) for location_id, row in zip(location_ids, rows) if row.duplicate]
+
+    index_records = bulk_create_indexes(
+        db,
+        [(location_id, row.location.get('lat'), row.location.get('lng'), 3) for location_id, row in created]
+    )
+    updated_index_records = bulk_update_index_status(db, [location_id for location_id, _ in updated], status=3)
+
+    db.execute(
+        insert(ChangeLog).values([
+            {
+                "location_id": location_id,
+                "action_type": 1,
+                "old_flags": row.duplicate.reports if row.duplicate else row.location.get('reports'),
+                "new_flags": row.reports
+            }
+            for location_id, row in zip(location_ids, rows)
+        ])
+    )
+
+    return _ImportResult(
+        [location_id for location_id, _ in created],
+        [location_id for location_id, _ in updated],
+        index_records,
+        updated_index_records
+    )
+
+
+def bulk_insert_locations(
+        db: Session,
+        locations: List[Dict],
+        deduplicate: bool = False
+) -> Dict:
+
+    """
+    Adds reported locations in a single transaction. The whole batch is inserted with a statement per table, only if
+    it fails the rows are retried one by one, each in its own savepoint, to find and skip the failing ones.
+
+    :param locations: Serialized and geocoded locations of a bulk upload
+    :param deduplicate: Update the existing locations with the same geohash cell and address instead of adding new ones
+    :return: A dict of the added and updated location ids and the rows that could not be added
+    """
+
+    reporting_user = db.query(User).filter(User.email == settings.FIRST_SUPERUSER).first()
+
+    rows, exceptions = _prepare_import_rows(db, locations, deduplicate)
+
+    result = _ImportResult([], [], [], [])
+    if not rows:
+        return {
+            "added": result.created,
+            "updated": result.updated,
+            "unprocessed": exceptions
+        }
+
+    try:
+        result = _insert_reported_locations(db, rows, reporting_user.id)
+
+    except Exception:
+        db.rollback()
+        # the rollback released the dedup key locks, so the rows are matched again under new ones
+        rows, exceptions = _prepare_import_rows(db, locations, deduplicate)
+
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    row_result = _insert_reported_locations(db, [row], reporting_user.id)
+                for values, row_values in zip(result, row_result):
+                    values.extend(row_values)
+
+            except Exception as e:
+                exceptions.append({
+                    "location": row.location,
+                    "code": "DATABASE_ERROR",
+                    "detail": e
+                })
+
+    if result.created or result.updated:
+        reporting_user.last_activity = datetime.now()
+    db.commit()
+
+    sync_index_caches(result.index_records, result.updated_index_records)
+
     return {
-        "added": added_locations,
+        "added": result.created,
+        "updated": result.updated,
         "unprocessed": exceptions
     }
 
@@ -292,17 +688,182 @@ def delete_location(db: Session, location_id: int) -> Optional[Location]:
 
     location = get_location_by_id(db, location_id=location_id)
 
+    index_record = db.query(GeospatialIndex)\
+        .filter(GeospatialIndex.location_id == location_id)\
+        .with_for_update()\
+        .populate_existing()\
+        .first()
+    removed_index_records = [discard_index(db, index_record)] if index_record else []
+
     db.delete(location)
     db.commit()
+    sync_index_caches([], removed_index_records=removed_index_records)
+
     return get_location_by_id(db, location_id=location_id)
 
 
 def drop_locations(db: Session):
     try:
         db.query(Location).delete()
+        clear_cell_stats(db)
         db.commit()
         return None
 
     except Exception as e:
         print(e)
         return
+
+
+# staging table of copy_insert_locations, dropped with the transaction
+_IMPORT_STAGING_TABLE = """
+    CREATE TEMP TABLE location_import (
+        location_id integer,
+        existing boolean,
+        address text,
+        street_number text,
+        city text,
+        country text,
+        postcode integer,
+        lat double precision,
+        lng double precision,
+        geohash text,
+        dedup_key text,
+        reports jsonb,
+        old_reports jsonb
+    ) ON COMMIT DROP
+"""
+
+_IMPORT_COPY = """
+    COPY location_import (
+        location_id, existing, address, street_number, city, country, postcode, lat, lng, geohash, dedup_key, reports,
+        old_reports
+    )
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+# the rows matched with an existing location come with its id and update it, the rest get a new id and are inserted
+_IMPORT_MERGE = (
+    """
+    UPDATE location_import SET location_id = nextval(pg_get_serial_sequence('location', 'id'))
+    WHERE location_id IS NULL
+    """,
+    """
+    INSERT INTO location (
+        id, created_at, updated_at, address, street_number, city, country, index, lat, lng, status, reports,
+        reported_by, report_expires, geohash, dedup_key
+    )
+    SELECT
+        location_id, TIMEZONE('utc', CURRENT_TIMESTAMP), TIMEZONE('utc', CURRENT_TIMESTAMP), address, street_number,
+        city, country, postcode, lat, lng, 3, reports, :user_id, NULL, geohash, dedup_key
+    FROM location_import
+    ON CONFLICT (id) DO UPDATE SET
+        updated_at = EXCLUDED.updated_at,
+        address = EXCLUDED.address,
+        street_number = EXCLUDED.street_number,
+        city = EXCLUDED.city,
+        country = EXCLUDED.country,
+        index = EXCLUDED.index,
+        status = EXCLUDED.status,
+        reports = EXCLUDED.reports,
+        reported_by = EXCLUDED.reported_by,
+        report_expires = EXCLUDED.report_expires
+    """,
+    """
+    INSERT INTO changelog (created_at, location_id, action_type, old_flags, new_flags)
+    SELECT
+        TIMEZONE('utc', CURRENT_TIMESTAMP), location_id, 1,
+        CASE WHEN existing THEN old_reports ELSE reports END, reports
+    FROM location_import
+    """,
+)
+
+_IMPORT_MERGE_INDEXES = """
+    INSERT INTO geospatialindex (location_id, geohash, lat, lng, status)
+    SELECT location_id, geohash, lat, lng, 3
+    FROM location_import
+    WHERE NOT existing
+    RETURNING id, location_id, geohash, lat, lng, status
+"""
+
+
+def copy_insert_locations(
+        db: Session,
+        locations: List[Dict],
+        deduplicate: bool = False
+) -> Dict:
+
+    """
+    Same as bulk_insert_locations, for the big imports. The rows are streamed into a staging table with COPY and merged
+    into the locations, markers and changelogs with a statement per table. If any row breaks the COPY or the merge, the
+    batch falls back to bulk_insert_locations to find and skip the failing rows.
+
+    :param locations: Serialized locations with their coordinates
+    :param deduplicate: Update the existing locations with the same geohash cell and address instead of adding new ones
+    :return: A dict of the added and updated location ids and the rows that could not be added
+    """
+
+    reporting_user = db.query(User).filter(User.email == settings.FIRST_SUPERUSER).first()
+
+    rows, exceptions = _prepare_import_rows(db, locations, deduplicate)
+
+    if not rows:
+        return {
+            "added": [],
+            "updated": [],
+            "unprocessed": exceptions
+        }
+
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow((
+                row.duplicate.id if row.duplicate else None,
+                bool(row.duplicate),
+                row.location.get('address'),
+                row.location.get('street_number'),
+                row.location.get('city'),
+                row.location.get('country'),
+                row.location.get('postcode'),
+                row.location.get('lat'),
+                row.location.get('lng'),
+                location_geohash(row.location.get('lat'), row.location.get('lng')),
+                row.dedup_key,
+                json.dumps(row.reports),
+                json.dumps(row.duplicate.reports) if row.duplicate else None
+            ))
+        buffer.seek(0)
+
+        db.execute(text(_IMPORT_STAGING_TABLE))
+        db.connection().connection.cursor().copy_expert(_IMPORT_COPY, buffer)
+        for statement in _IMPORT_MERGE:
+            db.execute(text(statement), {"user_id": reporting_user.id})
+        index_records = [
+            GeospatialIndex(**record)
+            for record in db.execute(text(_IMPORT_MERGE_INDEXES)).mappings().all()
+        ]
+        add_many_to_cell_stats(db, [
+            (record.geohash, record.lat, record.lng, record.status) for record in index_records
+        ])
+        updated_locations = [row.duplicate.id for row in rows if row.duplicate]
+        updated_index_records = bulk_update_index_status(db, updated_locations, status=3)
+
+        reporting_user.last_activity = datetime.now()
+        db.commit()
+
+    except Exception:
+        db.rollback()
+        bulk_results = bulk_insert_locations(db, [row.location for row in rows], deduplicate)
+        return {
+            "added": bulk_results.get("added"),
+            "updated": bulk_results.get("updated"),
+            "unprocessed": exceptions + bulk_results.get("unprocessed")
+        }
+
+    sync_index_caches(index_records, updated_index_records)
+
+    return {
+        "added": [record.location_id for record in index_records],
+        "updated": updated_locations,
+        "unprocessed": exceptions
+    }
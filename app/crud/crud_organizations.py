@@ -1,11 +1,12 @@
 from typing import Optional, List
 
-from sqlalchemy import desc, func
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.models.organization import Organization
 from app.models.user import User
 from app.schemas.organization import OrganizationBase, OrganizationUserInvite
+from app.utils.pagination import Cursor, keyset_page
 
 
 def create(db: Session, *, obj_in: OrganizationBase) -> Organization:
@@ -34,10 +35,13 @@ def get_by_substr(db: Session, name: str) -> List[Organization]:
     return db.query(Organization).filter(func.lower(Organization.name).startswith(name)).all()
 
 
-def get_organizations_list(db: Session, limit: int = 20, skip: int = 0) -> List[Organization]:
-    return db.query(Organization).order_by(desc(Organization.created_at))\
-        .limit(limit)\
-        .offset(skip * limit).all()
+def get_organizations_list(
+        db: Session,
+        limit: int = 20,
+        skip: int = 0,
+        cursor: Optional[Cursor] = None
+) -> List[Organization]:
+    return keyset_page(db.query(Organization), Organization.created_at, Organization.id, limit, cursor, skip)
 
 
 def edit_organization(db: Session, organization_id: int, obj_in: OrganizationBase) -> Optional[Organization]:
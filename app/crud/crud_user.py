@@ -1,7 +1,8 @@
 from typing import Optional
 from datetime import datetime, timedelta
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 
 from app.core.security import get_password_hash, verify_password, create_access_token
 from app.models.user import User
@@ -19,6 +20,11 @@ def get(db: Session, *, user_id: int) -> Optional[User]:
     return db.query(User).get(user_id)
 
 
+async def get_async(db: AsyncSession, *, user_id: int) -> Optional[User]:
+    # relationships can't be lazy loaded with an async session, so the organization is loaded upfront
+    return await db.get(User, user_id, options=[joinedload(User.organization_model)])
+
+
 def create(
         db: Session,
         *,
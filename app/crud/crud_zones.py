@@ -1,24 +1,31 @@
-from typing import Optional, List
+from typing import Optional, List, Any
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from shapely import wkt
 
 from app.models.zone import Zone
-from app.utils.geocoding import check_intersection
+from app.utils.zone_cache import zone_cache, simplify
 
 
-def add_restricted_zone(db: Session, zone_type: int, zone_name: str, bbox: str):
+def add_restricted_zone(db: Session, zone_type: int, zone_name: str, geom: Any):
 
     try:
+        min_lng, min_lat, max_lng, max_lat = geom.bounds
         db_obj = Zone(
             zone_type=zone_type,
-            bounding_box=bbox,
-            verbose_name=zone_name
+            verbose_name=zone_name,
+            geometry=geom.wkb,
+            simplified_geometry=simplify(geom).wkb,
+            min_lat=min_lat,
+            max_lat=max_lat,
+            min_lng=min_lng,
+            max_lng=max_lng
         )
 
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        zone_cache.clear()
         return db_obj
 
     except Exception as e:
@@ -26,20 +33,24 @@ def add_restricted_zone(db: Session, zone_type: int, zone_name: str, bbox: str):
         return None
 
 
-def check_new_point_intersections(db: Session, lng: float, lat: float) -> bool:
+def get_zones_version(db: Session) -> tuple:
 
-    try:
-        restricted_zones = db.query(Zone).all()
+    """
+    Zones are only ever added or removed and their ids are never reused, so the amount of zones together with the
+    biggest id changes with every modification and works as a version of the zones set.
+    """
+
+    return tuple(db.query(func.count(Zone.id), func.max(Zone.id)).one())
 
-        print(len(restricted_zones))
 
-        for zone in restricted_zones:
-            zone_geom = wkt.loads(zone.bounding_box)
-            intersection = check_intersection(zone_geom, (lng, lat))
-            if intersection:
-                return True
+def check_new_point_intersections(db: Session, lng: float, lat: float) -> bool:
+
+    try:
+        version = get_zones_version(db)
+        if not zone_cache.is_current(version):
+            zone_cache.build(db.query(Zone.geometry, Zone.simplified_geometry).all(), version)
 
-        return False
+        return zone_cache.intersects(lng, lat)
 
     except Exception as e:
         print('Zone checking exception: {}'.format(e))
@@ -61,4 +72,5 @@ def allow_zone(db: Session, zone_id: int) -> Optional[Zone]:
 
     db.delete(zone_to_delete)
     db.commit()
+    zone_cache.clear()
     return zone_to_delete
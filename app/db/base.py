@@ -7,6 +7,9 @@ from app.models.user import User
 from app.models.sessionhistory import SessionHistory
 from app.models.organization import Organization
 from app.models.geospatial_index import GeospatialIndex
+from app.models.geohash_cell_stats import GeohashCellStats
 from app.models.zone import Zone
+from app.models.geocoding_cache import ReverseGeocode, ForwardGeocode
+from app.models.import_job import ImportJob
 from app.models.guest_user import GuestUser
 from app.models.oauth import OauthScope, OauthRole, association_table
@@ -9,12 +9,17 @@ from slowapi.util import get_remote_address
 
 from app.core.config import settings
 from app.core.logger_config import LogConfig
+from app.core.responses import UTCJSONResponse
+from app.utils.pagination import NEXT_CURSOR_HEADER
 from app.api.v1.api import api_router
+from app.db.session import SessionLocal
+from app.utils.spatial_index import spatial_index
+from app.utils.import_jobs import resume_import_jobs
 
 dictConfig(LogConfig().dict())
 
 limiter = Limiter(key_func=get_remote_address)
-app = FastAPI()
+app = FastAPI(default_response_class=UTCJSONResponse)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -27,6 +32,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+
+@app.on_event("startup")
+def load_spatial_index() -> None:
+    if not settings.SPATIAL_INDEX_ENABLED:
+        return
+
+    db = SessionLocal()
+    try:
+        spatial_index.load(db)
+    finally:
+        db.close()
+
+    spatial_index.start_refresh(SessionLocal)
+
+
+@app.on_event("shutdown")
+def stop_spatial_index_refresh() -> None:
+    spatial_index.stop_refresh()
+
+
+@app.on_event("startup")
+def resume_queued_import_jobs() -> None:
+    resume_import_jobs()
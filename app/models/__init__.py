@@ -6,3 +6,6 @@ from .reportoptions import ReportOption
 from .changelog import ChangeLog
 from .organization import Organization
 from .geospatial_index import GeospatialIndex
+from .geohash_cell_stats import GeohashCellStats
+from .geocoding_cache import ReverseGeocode, ForwardGeocode
+from .import_job import ImportJob
@@ -1,6 +1,6 @@
 from app.db.base_class import Base
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -8,6 +8,10 @@ from app.db.utc_convertation import utcnow
 
 
 class ChangeLog(Base):
+    __table_args__ = (
+        # the keyset pagination of the changelogs of a location, see utils.pagination
+        Index('ix_changelog_location_id_created_at_id', 'location_id', 'created_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.db.base_class import Base
+from app.db.utc_convertation import utcnow
+
+
+class ReverseGeocode(Base):
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=utcnow())
+
+    # geohash of the requested coordinates, see geocoding.REVERSE_CACHE_PRECISION
+    key = Column(String, unique=True, index=True, nullable=False)
+    lat = Column(Float)
+    lng = Column(Float)
+
+    # raw address dict of the provider
+    address = Column(JSONB)
+
+
+class ForwardGeocode(Base):
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=utcnow())
+
+    # normalized address query, see geocoding.normalize_address
+    key = Column(String, unique=True, index=True, nullable=False)
+    lat = Column(Float, nullable=False)
+    lng = Column(Float, nullable=False)
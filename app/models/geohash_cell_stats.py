@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Integer, String, Float, Index
+
+from app.db.base_class import Base
+
+# Location status -> the column of GeohashCellStats which holds the amount of markers with such status
+status_columns = {
+    1: "awaiting_review",
+    2: "awaiting_approval",
+    3: "approved"
+}
+
+
+class GeohashCellStats(Base):
+    __tablename__ = "geohash_cell_stats"
+    __table_args__ = (
+        # unique for the upserts
+        Index(
+            'ix_geohash_cell_stats_geohash', 'geohash', unique=True,
+            postgresql_ops={'geohash': 'varchar_pattern_ops'}
+        ),
+        # the cluster lookups: the cells of a precision under the viewport cells (LIKE 'cell%'), the pattern ops
+        # serve the prefix match whatever the collation of the database
+        Index(
+            'ix_geohash_cell_stats_precision_geohash', 'precision', 'geohash',
+            postgresql_ops={'geohash': 'varchar_pattern_ops'}
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    # a geohash prefix of GeospatialIndex records, from precision 1 up to the clustering precision limit
+    geohash = Column(String, nullable=False)
+    precision = Column(Integer, nullable=False)
+
+    count = Column(Integer, nullable=False, default=0)
+
+    # sums are stored instead of the centroid itself, so the cell can be updated without reading it
+    lat_sum = Column(Float, nullable=False, default=0)
+    lng_sum = Column(Float, nullable=False, default=0)
+
+    # envelope of the markers that were added to the cell, it is not shrunk when a marker is removed
+    min_lat = Column(Float)
+    max_lat = Column(Float)
+    min_lng = Column(Float)
+    max_lng = Column(Float)
+
+    awaiting_review = Column(Integer, nullable=False, default=0)
+    awaiting_approval = Column(Integer, nullable=False, default=0)
+    approved = Column(Integer, nullable=False, default=0)
@@ -1,13 +1,18 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Float
+from sqlalchemy import Column, ForeignKey, Integer, String, Float, Index
 
 from app.db.base_class import Base
 
 
 class GeospatialIndex(Base):
+    __table_args__ = (
+        # the pattern ops serve the cell prefix lookups (LIKE 'cell%') whatever the collation of the database
+        Index('ix_geospatialindex_geohash', 'geohash', postgresql_ops={'geohash': 'varchar_pattern_ops'}),
+    )
+
     id = Column(Integer, primary_key=True)
 
-    geohash = Column(String, index=True)
-    location_id = Column(Integer, ForeignKey('location.id', ondelete="CASCADE"))
+    geohash = Column(String)
+    location_id = Column(Integer, ForeignKey('location.id', ondelete="CASCADE"), index=True)
 
     lat = Column(Float)
     lng = Column(Float)
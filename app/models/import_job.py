@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.db.base_class import Base
+from app.db.utc_convertation import utcnow
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class ImportJob(Base):
+    __tablename__ = "import_job"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=utcnow())
+    updated_at = Column(DateTime, default=utcnow(), onupdate=utcnow())
+
+    # queued -> running -> done / failed, the worker claims a job by moving it from queued to running
+    status = Column(String, default=JOB_QUEUED, nullable=False, index=True)
+    # the upload_locations stage the job is at: serializing, geocoding, inserting
+    stage = Column(String)
+
+    doctype = Column(String, nullable=False)
+    filename = Column(String)
+    filepath = Column(String, nullable=False)
+    # update the matching locations instead of adding duplicates, see crud_location.find_duplicate_locations
+    deduplicate = Column(Boolean, default=False, nullable=False)
+
+    # amount of rows that made it through every stage, e.g. {"rows": 100, "serialized": 98, "geocoded": 95}
+    counts = Column(JSONB, default=dict, nullable=False)
+    # the rows that failed on any stage, with the failure code and detail
+    unprocessed = Column(JSONB, default=list, nullable=False)
+    error = Column(String)
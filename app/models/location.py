@@ -1,9 +1,11 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Interval
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Interval, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 
 from sqlalchemy.orm import relationship
 
+from typing import Any, Dict
+
 import geopy.distance
 
 from app.db.base_class import Base
@@ -18,6 +20,19 @@ status_list = {
 
 
 class Location(Base):
+    __table_args__ = (
+        # the pattern ops serve both the exact lookups and the cell prefix (LIKE 'cell%') ones, whatever the collation
+        Index('ix_location_geohash', 'geohash', postgresql_ops={'geohash': 'varchar_pattern_ops'}),
+        # the keyset pagination of the pending queue (/location-requests), see utils.pagination, and /pending-count
+        Index(
+            'ix_location_pending_created_at_id', 'created_at', 'id',
+            postgresql_where=text('status = 1 AND reported_by IS NULL')
+        ),
+        # the activity feed (/recent-reports)
+        Index('ix_location_approved_created_at', 'created_at', postgresql_where=text('status = 3')),
+        # the locations assigned to a user (/assigned-locations)
+        Index('ix_location_reported_by_status', 'reported_by', 'status'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -39,6 +54,12 @@ class Location(Base):
     lng = Column(Float)
     reports = Column(JSONB) # Should we create a separate table for this??
 
+    # full precision (12) geohash of lat / lng, the locations are looked up by their coordinates with it
+    geohash = Column(String)
+
+    # geohash cell and normalized address of the location, see crud_location.location_dedup_key
+    dedup_key = Column(String, index=True)
+
     reported_by_model = relationship('User', foreign_keys='Location.reported_by')
 
     def calculate_distance(self, user_lat, user_lng):
@@ -47,7 +68,10 @@ class Location(Base):
 
         return geopy.distance.geodesic(geolocation_coords, location_coords).km
 
-    def to_json(self, user_lat=None, user_lng=None):
+    def to_json(self, user_lat=None, user_lng=None, distance=None):
+        if distance is None and user_lat and user_lng:
+            distance = self.calculate_distance(user_lat, user_lng)
+
         return {
             "id": self.id,
             "created_at": self.created_at,
@@ -61,11 +85,40 @@ class Location(Base):
               "lat": self.lat, "lng": self.lng
             },
             "street_number": self.street_number,
-            "distance": self.calculate_distance(user_lat, user_lng) if user_lat and user_lng else None,
+            "distance": distance,
             "reported_by": self.reported_by,
             "organization_name": self.reported_by_model.organization_model.name if self.reported_by else None,
             "report_expires": self.report_expires,
             "reports": self.reports
         }
 
+    @staticmethod
+    def row_to_json(row: Any, user_lat=None, user_lng=None) -> Dict:
+        """
+        Same as to_json, for a row of the location lists column projection (see crud_location.location_rows). The
+        values are in the LocationOut output format once dumped by UTCJSONResponse, so the lists skip the schema.
+        """
+
+        distance = getattr(row, "distance", None)
+        if distance is None and user_lat and user_lng:
+            distance = geopy.distance.geodesic((user_lat, user_lng), (row.lat, row.lng)).km
 
+        return {
+            "id": row.id,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "address": row.address,
+            "organization_name": row.organization_name,
+            "street_number": row.street_number,
+            "index": str(row.index) if row.index is not None else None,
+            "city": row.city,
+            "status": row.status,
+            "country": row.country,
+            "position": {
+                "lat": row.lat, "lng": row.lng
+            },
+            "reports": row.reports,
+            "distance": distance,
+            "reported_by": row.reported_by,
+            "report_expires": row.report_expires
+        }
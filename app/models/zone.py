@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, LargeBinary, Float
+from shapely import wkb
+
 from app.db.utc_convertation import utcnow
 
 from app.db.base_class import Base
@@ -10,5 +12,17 @@ class Zone(Base):
     created_at = Column(DateTime, default=utcnow())
 
     zone_type = Column(Integer, nullable=False)
-    bounding_box = Column(String)
     verbose_name = Column(String)
+
+    # WKB of the full resolution boundary and of its topology preserving simplification
+    geometry = Column(LargeBinary)
+    simplified_geometry = Column(LargeBinary)
+
+    min_lat = Column(Float)
+    max_lat = Column(Float)
+    min_lng = Column(Float)
+    max_lng = Column(Float)
+
+    @property
+    def bounding_box(self) -> str:
+        return wkb.loads(self.geometry).wkt if self.geometry else None
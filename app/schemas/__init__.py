@@ -1,11 +1,12 @@
-from .location import LocationCreate, LocationBase,  LocationReports, LocationOut, LocationSearch
+from .location import LocationCreate, LocationBase,  LocationReports, LocationOut, LocationSearch, MapBounds
 from .token import Token, TokenBase
 from .user import UserCreate, UserBase, UserOut, UserPasswordUpdate, UserRepresentation, UserInvite, UserPasswordRenewal
 from .session import UserSession
 from .organization import OrganizationBase, OrganizationOut, OrganizationUserInvite
 from .changelog import ChangelogOut
 from .roles import UserRole
-from .zone import ZoneBase
+from .zone import ZoneBase, ZoneOut, ZoneGeometryOut
 from .guest_user import LocationRequestOtp
-from .geo_index import GeospatialRecord
+from .geo_index import GeospatialRecord, MarkerCluster, NearbyMarker
+from .import_job import ImportJobOut
 from .oauth import *
@@ -33,3 +33,16 @@ class GeospatialRecord(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class MarkerCluster(BaseModel):
+
+    geohash: str
+    count: int
+    position: Dict
+    statuses: Dict[int, int]
+
+
+class NearbyMarker(GeospatialRecord):
+
+    distance: float
@@ -0,0 +1,28 @@
+from typing import Optional, Dict, List
+from datetime import datetime
+
+from pydantic import BaseModel, validator
+
+from app.schemas.validators import convert_to_utc
+
+
+class ImportJobOut(BaseModel):
+
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    status: str
+    stage: Optional[str]
+    doctype: str
+    filename: Optional[str]
+    deduplicate: bool
+
+    counts: Dict[str, int]
+    unprocessed: List[Dict]
+    error: Optional[str]
+
+    _utc_datetime = validator('created_at', 'updated_at', allow_reuse=True)(convert_to_utc)
+
+    class Config:
+        orm_mode = True
@@ -24,10 +24,19 @@ class LocationCreate(LocationBase):
     lng: float
 
 
+class MapBounds(BaseModel):
+    north: float
+    east: float
+    south: float
+    west: float
+
+
 class LocationSearch(BaseModel):
     lat: float
     lng: float
     zoom: Optional[int]
+    bounds: Optional[MapBounds] = None
+    cluster: bool = False
 
 
 class LocationOut(BaseModel):
@@ -43,7 +52,7 @@ class LocationOut(BaseModel):
     country: Optional[str] = None
     position: Dict
     reports: Optional[Dict] = None
-    distance: Optional[int] = None
+    distance: Optional[float] = None
     reported_by: Optional[int] = None
     report_expires: Optional[datetime] = None
 
@@ -1,6 +1,9 @@
+from typing import Optional
+import datetime
 
+from pydantic import BaseModel, validator
 
-from pydantic import BaseModel
+from app.schemas.validators import convert_to_utc
 
 
 class ZoneBase(BaseModel):
@@ -8,7 +11,21 @@ class ZoneBase(BaseModel):
     value: str
 
 
-class ZoneOut(ZoneBase):
+class ZoneOut(BaseModel):
     id: int
-    bounding_box: str
-    
+    created_at: datetime.datetime
+    zone_type: int
+    verbose_name: Optional[str]
+    min_lat: Optional[float]
+    max_lat: Optional[float]
+    min_lng: Optional[float]
+    max_lng: Optional[float]
+
+    _utc_created_at = validator('created_at', allow_reuse=True)(convert_to_utc)
+
+    class Config:
+        orm_mode = True
+
+
+class ZoneGeometryOut(ZoneOut):
+    bounding_box: Optional[str]
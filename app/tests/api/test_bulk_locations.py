@@ -0,0 +1,114 @@
+import asyncio
+import csv
+import time
+from typing import Dict, List
+
+import pytest
+from openpyxl import Workbook
+
+from app.core.config import settings
+from app.utils import bulk_locations
+from app.utils.bulk_locations import EXCEL_COLUMNS, REPORT_FIELDS, iter_chunks, read_csv_records, \
+    read_excel_rows, serialize_records
+
+
+def write_csv(filepath: str, rows: int) -> None:
+    with open(filepath, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["address", "street_number", "city", "lat", "lng", *REPORT_FIELDS])
+        for number in range(rows):
+            writer.writerow(["Вулиця Імпортована", number, "Вінниця", 49.23 + number * 0.001, 28.46, *["good"] * 6])
+
+
+def test_read_excel_rows_padding(tmp_path) -> None:
+
+    filepath = str(tmp_path / "locations.xlsx")
+    workbook = Workbook()
+    workbook.active.append(["Вулиця Тестова", "1", "Вінниця"])
+    workbook.active.append(["Вулиця Тестова", "2"])
+    workbook.save(filepath)
+
+    rows = list(read_excel_rows(filepath))
+
+    assert len(rows) == 2
+    assert all(len(row) == EXCEL_COLUMNS for row in rows)
+    assert rows[0][:3] == ("Вулиця Тестова", "1", "Вінниця")
+    assert rows[1][2:] == (None,) * (EXCEL_COLUMNS - 2)
+
+
+def test_iter_chunks_closes_rows() -> None:
+
+    closed = []
+
+    def rows():
+        try:
+            yield from ((number,) for number in range(5))
+        finally:
+            closed.append(True)
+
+    assert list(iter_chunks(rows(), 2)) == [[(0,), (1,)], [(2,), (3,)], [(4,)]]
+    assert closed == [True]
+
+    # an import stopped in the middle of the file still closes it
+    chunks = iter_chunks(rows(), 2)
+    assert next(chunks) == [(0,), (1,)]
+    chunks.close()
+    assert closed == [True, True]
+
+
+def test_upload_chunk_counts(tmp_path, monkeypatch) -> None:
+
+    filepath = str(tmp_path / "locations.csv")
+    write_csv(filepath, 5)
+    with open(filepath, "a", newline="", encoding="utf-8") as file:
+        # the report flags are missing, so the row fails the serialization
+        csv.writer(file).writerow(["Вулиця Неповна", 1, "Вінниця", 49.2, 28.4])
+
+    inserted_chunks = []
+
+    def insert_locations(db, locations: List[Dict], deduplicate: bool = False) -> Dict:
+        inserted_chunks.append(len(locations))
+        return {"added": locations, "updated": [], "unprocessed": []}
+
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setitem(bulk_locations.IMPORT_DOCTYPES, "csv", (read_csv_records, serialize_records, insert_locations))
+
+    reports = []
+    unprocessed = asyncio.run(
+        bulk_locations.upload_locations(filepath, "csv", progress=lambda stage, counts: reports.append(counts))
+    )
+
+    assert inserted_chunks == [2, 2, 1]
+    assert [location["code"] for location in unprocessed] == ["SERIALIZATION_ERROR"]
+    assert reports[-1] == {"rows": 6, "serialized": 5, "geocoded": 5, "inserted": 5, "updated": 0}
+
+
+def test_upload_waits_for_pending_insert(tmp_path, monkeypatch) -> None:
+
+    filepath = str(tmp_path / "locations.csv")
+    write_csv(filepath, 4)
+
+    inserted = []
+
+    def insert_locations(db, locations: List[Dict], deduplicate: bool = False) -> Dict:
+        time.sleep(0.2)
+        inserted.extend(locations)
+        return {"added": locations, "updated": [], "unprocessed": []}
+
+    serialized_chunks = []
+
+    def serialize(records) -> Dict:
+        # the second chunk fails while the first one is being inserted
+        if serialized_chunks:
+            raise ValueError("Broken chunk")
+        serialized_chunks.append(records)
+        return serialize_records(records)
+
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setitem(bulk_locations.IMPORT_DOCTYPES, "csv", (read_csv_records, serialize, insert_locations))
+
+    with pytest.raises(ValueError):
+        asyncio.run(bulk_locations.upload_locations(filepath, "csv"))
+
+    # the sessions are closed only after the insertion of the first chunk is done
+    assert len(inserted) == 2
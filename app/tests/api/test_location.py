@@ -1,14 +1,35 @@
 from typing import Dict
+from datetime import datetime, timedelta
+import asyncio
+import json
+import threading
 
+import pytest
 from fastapi.testclient import TestClient
 
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
 
+from app import schemas
 from app.models.location import Location
+from app.models.geospatial_index import GeospatialIndex
+from app.models.import_job import ImportJob
 from app.crud import crud_geospatial as geo_crud
 from app.crud import crud_location as location_crud
+from app.crud import crud_changelogs as changelogs_crud
+from app.crud import crud_import_jobs as import_crud
 from app.core.config import settings
+from app.core.responses import UTCJSONResponse
 from app.utils.populate_db import populate_reports
+from app.utils.vector_tiles import point_to_tile, tile_bounds, tile_cache, MEDIA_TYPE
+from app.utils.spatial_index import SpatialIndex
+from app.utils.rate_limiter import TokenBucket
+from app.utils import geocoding, import_jobs
+from app.utils.pagination import encode_cursor
+from app.tests.utils.utils import count_queries
+from app.tests.utils.tiles import decode_points_tile
+from app.tests.utils.location import create_reported_locations, delete_reported_locations
 
 
 def test_request_location_info(
@@ -27,10 +48,55 @@ def test_request_location_info(
     geospatial_record = geo_crud.search_index_by_location_id(test_db, location_id=location.id)
     assert geospatial_record
     assert geospatial_record.geohash
+
+    cell_stats = geo_crud.get_cell_stats(test_db, geohash=geospatial_record.geohash[:5])
+    assert cell_stats
+    assert cell_stats.count >= cell_stats.awaiting_review > 0
     #
     # location_crud.delete_location(test_db, location_id=location.id)
 
 
+def test_reverse_geocoding_cache(
+        client: TestClient,
+        test_db: Session,
+        sample_location_coordinates: Dict[str, float]
+) -> None:
+
+    address = geocoding.reverse_cached(
+        test_db,
+        sample_location_coordinates["lat"],
+        sample_location_coordinates["lng"]
+    )
+    assert address
+
+    hits = geocoding.cache_stats["reverse"]["hits"]
+    cached_address = geocoding.reverse_cached(
+        test_db,
+        sample_location_coordinates["lat"],
+        sample_location_coordinates["lng"]
+    )
+    assert cached_address == address
+    assert geocoding.cache_stats["reverse"]["hits"] == hits + 1
+
+
+
+def test_geocoding_rate_limit_timeout(monkeypatch) -> None:
+
+    bucket = TokenBucket(rate=10)
+    assert bucket.acquire(timeout=0)
+    # the next token is 0.1s away, the caller that can't wait that long doesn't wait at all
+    assert not bucket.acquire(timeout=0.05)
+    assert bucket.acquire(timeout=0.5)
+
+    monkeypatch.setitem(geocoding.rate_limiters, "nominatim", TokenBucket(rate=0.01))
+    geocoding.rate_limiters["nominatim"].acquire()
+
+    called = []
+    with pytest.raises(geocoding.RateLimitTimeout):
+        geocoding._call_provider("nominatim", lambda: called.append(True), wait_timeout=1)
+    assert not called
+
+
 def test_get_location_by_coords(
         client: TestClient,
         test_db: Session
@@ -45,6 +111,23 @@ def test_get_location_by_coords(
     # location_crud.delete_location(test_db, location_id=sample_location["id"])
 
 
+def test_get_location_by_coords_tolerance(
+        test_db: Session,
+        sample_location_coordinates: Dict[str, float]
+) -> None:
+
+    lat, lng = sample_location_coordinates["lat"], sample_location_coordinates["lng"]
+
+    location = location_crud.get_location_by_coordinates(test_db, lat, lng, tolerance_meters=0)
+    assert location
+    assert location.geohash == location_crud.location_geohash(lat, lng)
+
+    # ~2 meters to the north
+    assert not location_crud.get_location_by_coordinates(test_db, lat + 0.00002, lng, tolerance_meters=0)
+    nearby_location = location_crud.get_location_by_coordinates(test_db, lat + 0.00002, lng, tolerance_meters=5)
+    assert nearby_location.id == location.id
+
+
 def test_pending_location_count(
         client: TestClient,
         test_db: Session,
@@ -76,6 +159,262 @@ def test_get_pending_locations(
     assert len(pending_locations) > 0
 
 
+def test_get_pending_locations_sorted_by_distance(
+        client: TestClient,
+        test_db: Session,
+        superuser_token_headers: Dict[str, str],
+        sample_location_coordinates: Dict[str, float]
+) -> None:
+
+    params = {
+        "sort": "distance",
+        "user_lat": sample_location_coordinates["lat"] + 0.1,
+        "user_lng": sample_location_coordinates["lng"] + 0.1
+    }
+    r = client.get(
+        f"{settings.API_V1_STR}/locations/location-requests",
+        params=params,
+        headers=superuser_token_headers
+    )
+    assert 200 <= r.status_code < 300
+
+    pending_locations = r.json()
+    assert pending_locations
+    distances = [location["distance"] for location in pending_locations]
+    assert distances == sorted(distances)
+
+    r = client.get(
+        f"{settings.API_V1_STR}/locations/location-requests",
+        params={"sort": "distance"},
+        headers=superuser_token_headers
+    )
+    assert r.status_code == 400
+
+
+def test_search_locations_in_viewport(
+        client: TestClient,
+        test_db: Session,
+        sample_location_coordinates: Dict[str, float]
+) -> None:
+
+    payload = {
+        **sample_location_coordinates,
+        "zoom": 14,
+        "bounds": {
+            "north": sample_location_coordinates["lat"] + 0.01,
+            "east": sample_location_coordinates["lng"] + 0.01,
+            "south": sample_location_coordinates["lat"] - 0.01,
+            "west": sample_location_coordinates["lng"] - 0.01
+        }
+    }
+
+    r = client.post(f"{settings.API_V1_STR}/locations/cord_search", json=payload)
+    assert 200 <= r.status_code < 300
+
+    markers = r.json()
+    assert markers
+    for marker in markers:
+        assert payload["bounds"]["south"] <= marker["lat"] <= payload["bounds"]["north"]
+        assert payload["bounds"]["west"] <= marker["lng"] <= payload["bounds"]["east"]
+
+
+def test_search_location_clusters(
+        client: TestClient,
+        test_db: Session,
+        sample_location_coordinates: Dict[str, float]
+) -> None:
+
+    payload = {
+        **sample_location_coordinates,
+        "zoom": 6,
+        "cluster": True
+    }
+
+    r = client.post(f"{settings.API_V1_STR}/locations/cord_search", json=payload)
+    assert 200 <= r.status_code < 300
+
+    clusters = r.json()
+    assert clusters
+    for cluster in clusters:
+        assert cluster["count"] > 0
+        assert cluster["count"] == sum(cluster["statuses"].values())
+        assert cluster["position"]
+
+
+def test_get_nearby_locations(
+        client: TestClient,
+        test_db: Session,
+        sample_location_coordinates: Dict[str, float]
+) -> None:
+
+    r = client.get(
+        f"{settings.API_V1_STR}/locations/nearby",
+        params={**sample_location_coordinates, "radius_km": 1, "k": 5}
+    )
+    assert 200 <= r.status_code < 300
+
+    markers = r.json()
+    assert markers
+    assert len(markers) <= 5
+    assert markers[0]["distance"] < 0.01
+    distances = [marker["distance"] for marker in markers]
+    assert distances == sorted(distances)
+
+
+def test_spatial_index_load_keeps_concurrent_writes(
+        test_db: Session,
+        location: Location
+) -> None:
+
+    memory_index = SpatialIndex()
+    location_id = location.id
+    index_record = geo_crud.search_index_by_location_id(test_db, location_id=location_id)
+    status = index_record.status % 3 + 1
+    new_marker = GeospatialIndex(
+        id=-1, location_id=-1, geohash=index_record.geohash, lat=index_record.lat, lng=index_record.lng, status=1
+    )
+
+    # the writes committed by the other requests while the load reads the table
+    def write_during_read(conn, cursor, statement, parameters, context, executemany):
+        if "FROM geospatialindex" in statement:
+            memory_index.update_status(location_id, status)
+            memory_index.add(new_marker)
+
+    event.listen(test_db.get_bind(), "before_cursor_execute", write_during_read)
+    try:
+        memory_index.load(test_db)
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", write_during_read)
+
+    # the replayed writes are idempotent, adding the marker again doesn't duplicate it
+    memory_index.add_many([new_marker])
+
+    markers = {marker.location_id: marker for marker in memory_index.search([index_record.geohash])}
+    assert markers[location_id].status == status
+    assert [marker.location_id for marker in memory_index.search([index_record.geohash])].count(-1) == 1
+
+
+def test_index_caches_wait_for_commit(
+        test_db: Session,
+        location: Location
+) -> None:
+
+    index_record = geo_crud.search_index_by_location_id(test_db, location_id=location.id)
+    x, y = point_to_tile(index_record.lat, index_record.lng, 12)
+    tile_cache.set(12, x, y, b"tile")
+
+    # a rolled back status change leaves the cached tile alone
+    geo_crud.update_index_status(test_db, index_record, index_record.status % 3 + 1)
+    test_db.rollback()
+    assert tile_cache.get(12, x, y) == b"tile"
+
+    updated_index_record = geo_crud.update_index_status(test_db, index_record, index_record.status)
+    test_db.commit()
+    geo_crud.sync_index_caches([], [updated_index_record])
+    assert tile_cache.get(12, x, y) is None
+
+
+
+def test_concurrent_location_reports(
+        test_db: Session,
+        superuser_id: int
+) -> None:
+
+    location = location_crud.create_location_review_request(
+        test_db,
+        address={"road": "Вулиця Одночасна", "house_number": "2", "city": "Вінниця"},
+        lat=49.2433,
+        lng=28.4844
+    )
+    geohash = geo_crud.search_index_by_location_id(test_db, location_id=location.id).geohash[:6]
+    cell_stats = geo_crud.get_cell_stats(test_db, geohash=geohash)
+    awaiting_review, approved = cell_stats.awaiting_review, cell_stats.approved
+
+    first_submission, second_submission = Session(bind=test_db.get_bind()), Session(bind=test_db.get_bind())
+
+    errors = []
+
+    def submit(db):
+        try:
+            location_crud.submit_location_reports(
+                db,
+                obj_in=schemas.LocationReports(location_id=location.id, **populate_reports()),
+                user_id=superuser_id
+            )
+        except Exception as e:
+            errors.append(e)
+
+    # the first submission holds the marker until it commits, the second one finds it approved already
+    first_index_record = first_submission.query(GeospatialIndex)\
+        .filter(GeospatialIndex.location_id == location.id)\
+        .with_for_update()\
+        .first()
+    thread = threading.Thread(target=submit, args=(second_submission,))
+    thread.start()
+    thread.join(0.5)
+    assert thread.is_alive()
+
+    geo_crud.update_index_status(first_submission, first_index_record, status=3)
+    first_submission.commit()
+    thread.join()
+    assert not errors
+
+    test_db.expire_all()
+    cell_stats = geo_crud.get_cell_stats(test_db, geohash=geohash)
+    assert (cell_stats.awaiting_review, cell_stats.approved) == (awaiting_review - 1, approved + 1)
+
+    first_submission.close()
+    second_submission.close()
+    location_crud.delete_location(test_db, location.id)
+
+
+def test_get_locations_tile(
+        client: TestClient,
+        test_db: Session,
+        superuser_id: int
+) -> None:
+
+    location = location_crud.create_location_review_request(
+        test_db,
+        address={"road": "Вулиця Плиткова", "house_number": "1", "city": "Вінниця"},
+        lat=49.2411,
+        lng=28.4822
+    )
+    x, y = point_to_tile(location.lat, location.lng, 12)
+    south, west, north, east = tile_bounds(12, x, y)
+
+    def tile_feature():
+        r = client.get(f"{settings.API_V1_STR}/locations/tiles/12/{x}/{y}.mvt")
+        assert 200 <= r.status_code < 300
+        assert r.headers["content-type"] == MEDIA_TYPE
+
+        layers = decode_points_tile(r.content)
+        assert [(layer["name"], layer["version"], layer["extent"]) for layer in layers] == [("locations", 2, 4096)]
+        return next(feature for feature in layers[0]["features"] if feature["id"] == location.id), r.content
+
+    feature, tile = tile_feature()
+    assert feature["type"] == 1
+    assert feature["properties"] == {"location_id": location.id, "status": 1}
+    # the tile coordinates grow to the east and to the south, a unit is ~2e-5 degrees at zoom 12
+    assert abs(west + feature["x"] / 4096 * (east - west) - location.lng) < 1e-4
+    assert abs(north - feature["y"] / 4096 * (north - south) - location.lat) < 1e-4
+    assert tile_cache.get(12, x, y) == tile
+
+    # the reports change the status of the marker, the cached tile is dropped
+    location_crud.submit_location_reports(
+        test_db,
+        obj_in=schemas.LocationReports(location_id=location.id, **populate_reports()),
+        user_id=superuser_id
+    )
+    feature, _ = tile_feature()
+    assert feature["properties"] == {"location_id": location.id, "status": 3}
+
+    location_crud.delete_location(test_db, location.id)
+
+    r = client.get(f"{settings.API_V1_STR}/locations/tiles/1/5/5.mvt")
+    assert r.status_code == 400
+
+
 def test_assign_location(
         client: TestClient,
         test_db: Session,
@@ -190,6 +529,29 @@ def test_get_location_info(
     assert requested_location["status"] == 3
 
 
+def test_async_location_reads(
+        test_db: Session,
+        async_test_db_factory: sessionmaker,
+        location: Location
+) -> None:
+
+    async def read():
+        async with async_test_db_factory() as db:
+            return (
+                await location_crud.get_location_row_async(db, location.id),
+                await location_crud.get_activity_feed_async(db, 10),
+                await geo_crud.search_indexes_in_range_async(db, location.lat, location.lng, 12)
+            )
+
+    async_location, activity_feed, markers = asyncio.run(read())
+
+    assert Location.row_to_json(async_location) == \
+        Location.row_to_json(location_crud.get_location_row(test_db, location.id))
+    assert [feed_location.id for feed_location in activity_feed] == \
+        [feed_location.id for feed_location in location_crud.get_activity_feed(test_db, 10)]
+    assert location.id in [marker.location_id for marker in markers]
+
+
 def test_get_location_changelogs(
         client: TestClient,
         test_db: Session,
@@ -205,6 +567,88 @@ def test_get_location_changelogs(
         assert log["new_flags"]
 
 
+def test_get_location_changelogs_by_cursor(
+        client: TestClient,
+        test_db: Session,
+        location: Location
+) -> None:
+
+    r = client.get(f'{settings.API_V1_STR}/locations/changelogs?location_id={location.id}')
+    changelog_ids = [log["id"] for log in r.json()]
+    assert "X-Next-Cursor" not in r.headers
+
+    paged_ids = []
+    params = {"location_id": location.id, "limit": 1}
+    while True:
+        r = client.get(f'{settings.API_V1_STR}/locations/changelogs', params=params)
+        assert 200 <= r.status_code < 300
+        paged_ids.extend(log["id"] for log in r.json())
+
+        if "X-Next-Cursor" not in r.headers:
+            break
+        params["cursor"] = r.headers["X-Next-Cursor"]
+
+    assert paged_ids == changelog_ids
+
+
+def test_get_pending_locations_by_cursor(
+        client: TestClient,
+        test_db: Session,
+        superuser_token_headers: Dict[str, str]
+) -> None:
+
+    # the earlier tests assign the sample requests, so the pages need pending locations of their own
+    locations = [
+        location_crud.create_location_review_request(
+            test_db,
+            address={"road": "Вулиця Сторінкова", "house_number": str(number), "city": "Вінниця"},
+            lat=49.2366 + number * 0.001,
+            lng=28.4744
+        )
+        for number in range(3)
+    ]
+
+    r = client.get(
+        f"{settings.API_V1_STR}/locations/location-requests",
+        params={"limit": 1000},
+        headers=superuser_token_headers
+    )
+    location_ids = [location["id"] for location in r.json()]
+    assert location_ids
+
+    paged_ids = []
+    params = {"limit": 2}
+    while True:
+        r = client.get(
+            f"{settings.API_V1_STR}/locations/location-requests",
+            params=params,
+            headers=superuser_token_headers
+        )
+        assert 200 <= r.status_code < 300
+        paged_ids.extend(location["id"] for location in r.json())
+
+        if "X-Next-Cursor" not in r.headers:
+            break
+        params["cursor"] = r.headers["X-Next-Cursor"]
+
+    assert paged_ids == location_ids
+
+    r = client.get(
+        f"{settings.API_V1_STR}/locations/location-requests",
+        params={
+            "sort": "distance",
+            "user_lat": 49.24,
+            "user_lng": 28.48,
+            "cursor": encode_cursor(datetime.utcnow(), location_ids[0])
+        },
+        headers=superuser_token_headers
+    )
+    assert r.status_code == 400
+
+    for location in locations:
+        location_crud.delete_location(test_db, location.id)
+
+
 # def test_remove_location(
 #         client: TestClient,
 #         db: Session,
@@ -259,5 +703,370 @@ def test_request_location_without_valid_address(
     # location_crud.delete_location(test_db, updated_location['id'])
 
 
+def test_bulk_add_job_progress(
+        client: TestClient,
+        test_db: Session
+) -> None:
+
+    r = client.post(
+        f"{settings.API_V1_STR}/locations/bulk-add?sheet_type=1",
+        files={"file": ("locations.txt", b"address,city", "text/plain")}
+    )
+    assert r.status_code == 400
+
+    job = import_crud.create_import_job(test_db, filename="locations.xlsx", filepath="locations.xlsx", doctype="excel")
+    assert import_crud.claim_import_job(test_db, job.id)
+    # a claimed job can't be claimed by another worker
+    assert not import_crud.claim_import_job(test_db, job.id)
+
+    import_crud.update_import_job_progress(test_db, job.id, "geocoding", {"rows": 3, "serialized": 2})
+
+    r = client.get(f"{settings.API_V1_STR}/locations/bulk-add/{job.id}")
+    assert 200 <= r.status_code < 300
+    requested_job = r.json()
+    assert requested_job["status"] == "running"
+    assert requested_job["stage"] == "geocoding"
+    assert requested_job["counts"] == {"rows": 3, "serialized": 2}
+
+    import_crud.finish_import_job(test_db, job.id, [{"location": ["Вулиця Тестова"], "code": "GEOCODING_ERROR"}])
+
+    requested_job = client.get(f"{settings.API_V1_STR}/locations/bulk-add/{job.id}").json()
+    assert requested_job["status"] == "done"
+    assert requested_job["unprocessed"][0]["code"] == "GEOCODING_ERROR"
+
+    r = client.get(f"{settings.API_V1_STR}/locations/bulk-add/{job.id + 1000}")
+    assert r.status_code == 404
+
+
+
+def test_resume_import_jobs_fails_stale_jobs(
+        test_db: Session,
+        tmp_path,
+        monkeypatch
+) -> None:
+
+    jobs = []
+    for _ in range(3):
+        filepath = tmp_path / "{}.xlsx".format(len(jobs))
+        filepath.write_bytes(b"")
+        jobs.append(
+            import_crud.create_import_job(test_db, filename="locations.xlsx", filepath=str(filepath), doctype="excel")
+        )
+    # resume_import_jobs closes the session and detaches the jobs, their ids are read before
+    stale_job_id, running_job_id, queued_job_id = [job.id for job in jobs]
+    assert import_crud.claim_import_job(test_db, stale_job_id)
+    assert import_crud.claim_import_job(test_db, running_job_id)
+    test_db.query(ImportJob)\
+        .filter(ImportJob.id == stale_job_id)\
+        .update({ImportJob.updated_at: datetime.utcnow() - timedelta(days=1)}, synchronize_session=False)
+    test_db.commit()
+
+    submitted = []
+    monkeypatch.setattr(import_jobs, "SessionLocal", lambda: test_db)
+    monkeypatch.setattr(import_jobs, "submit_import_job", submitted.append)
+    import_jobs.resume_import_jobs()
+
+    assert import_crud.get_import_job(test_db, stale_job_id).status == "failed"
+    assert not (tmp_path / "0.xlsx").exists()
+    # the job that reported progress recently is still running in another process
+    assert import_crud.get_import_job(test_db, running_job_id).status == "running"
+    assert (tmp_path / "1.xlsx").exists()
+    assert queued_job_id in submitted
+
+    test_db.query(ImportJob)\
+        .filter(ImportJob.id.in_([stale_job_id, running_job_id, queued_job_id]))\
+        .delete(synchronize_session=False)
+    test_db.commit()
+
+
+def test_bulk_insert_locations(
+        test_db: Session,
+        superuser_id: int
+) -> None:
+
+    locations = [
+        {
+            "address": "Вулиця Тестова",
+            "street_number": str(number),
+            "city": "Вінниця",
+            "country": "Україна",
+            "postcode": None,
+            "lat": 49.2331 + number * 0.0001,
+            "lng": 28.4682,
+            "reports": populate_reports()
+        }
+        for number in range(3)
+    ]
+    invalid_location = {**locations[0], "reports": {"water": {"flag": "unknown"}}}
+
+    result = location_crud.bulk_insert_locations(test_db, locations + [invalid_location])
+
+    assert len(result["added"]) == 3
+    assert len(result["unprocessed"]) == 1
+    assert result["unprocessed"][0]["code"] == "VALIDATION_ERROR"
+
+    for location_id in result["added"]:
+        location = location_crud.get_location_by_id(test_db, location_id)
+        assert location.status == 3
+        assert location.reported_by == superuser_id
+        assert location.reports
+
+        geospatial_record = geo_crud.search_index_by_location_id(test_db, location_id=location_id)
+        assert geospatial_record.status == 3
+        assert len(changelogs_crud.get_changelogs(test_db, location_id)) == 1
+
+    cell_stats = geo_crud.get_cell_stats(test_db, geohash=geospatial_record.geohash[:6])
+    assert cell_stats.count >= cell_stats.approved >= 3
+
+
+def test_copy_insert_locations(
+        test_db: Session
+) -> None:
 
+    locations = [
+        {
+            "address": "Вулиця Копійована",
+            "street_number": str(number),
+            "city": "Вінниця",
+            "country": "Україна",
+            "postcode": "21000",
+            "lat": 49.2345 + number * 0.0001,
+            "lng": 28.4711,
+            "reports": populate_reports()
+        }
+        for number in range(3)
+    ]
+
+    result = location_crud.copy_insert_locations(test_db, locations)
+    assert len(result["added"]) == 3
+    assert not result["unprocessed"]
+
+    for location_id in result["added"]:
+        location = location_crud.get_location_by_id(test_db, location_id)
+        assert location.status == 3
+        assert location.index == 21000
+        assert geo_crud.search_index_by_location_id(test_db, location_id=location_id).status == 3
+        assert len(changelogs_crud.get_changelogs(test_db, location_id)) == 1
+
+    # a row the staging table can't take fails the COPY, the rest of the batch still gets in
+    invalid_location = {**locations[0], "postcode": "not a postcode"}
+    result = location_crud.copy_insert_locations(test_db, [invalid_location] + locations[1:])
+    assert len(result["added"]) == 2
+    assert result["unprocessed"][0]["code"] == "DATABASE_ERROR"
+
+
+def test_bulk_update_index_status(
+        test_db: Session
+) -> None:
+
+    locations = [
+        location_crud.create_location_review_request(
+            test_db,
+            address={"road": "Вулиця Схвалена", "house_number": str(number), "city": "Вінниця"},
+            lat=49.2322 + number * 0.0001,
+            lng=28.4677
+        )
+        for number in range(2)
+    ]
+    geohash = geo_crud.search_index_by_location_id(test_db, location_id=locations[0].id).geohash[:6]
+    cell_stats = geo_crud.get_cell_stats(test_db, geohash=geohash)
+    awaiting_review, approved = cell_stats.awaiting_review, cell_stats.approved
+
+    with count_queries(test_db.get_bind()) as queries:
+        index_records = geo_crud.bulk_update_index_status(test_db, [location.id for location in locations], status=3)
+    test_db.commit()
+
+    assert {index_record.status for index_record in index_records} == {3}
+    # the deltas of every cell of both markers go in a single statement
+    assert len([query for query in queries if query.startswith("UPDATE geohash_cell_stats")]) == 1
+
+    test_db.refresh(cell_stats)
+    assert cell_stats.awaiting_review == awaiting_review - 2
+    assert cell_stats.approved == approved + 2
+
+    for location in locations:
+        location_crud.delete_location(test_db, location.id)
+
+
+def test_deduplicating_import(
+        test_db: Session
+) -> None:
+
+    locations = [
+        {
+            "address": "Вулиця Повторна",
+            "street_number": str(number),
+            "city": "Вінниця",
+            "country": "Україна",
+            "postcode": "21000",
+            "lat": 49.2361 + number * 0.001,
+            "lng": 28.4733,
+            "reports": populate_reports()
+        }
+        for number in range(2)
+    ]
+
+    result = location_crud.bulk_insert_locations(test_db, locations, deduplicate=True)
+    assert len(result["added"]) == 2
+    assert not result["updated"]
+    locations_count = test_db.query(Location).count()
+
+    # the same file imported again, with the address spelled differently, updates the locations it added
+    reimported = [{**location, "address": location["address"].upper()} for location in locations]
+    result = location_crud.copy_insert_locations(test_db, reimported, deduplicate=True)
+    assert not result["added"]
+    assert len(result["updated"]) == 2
+    assert test_db.query(Location).count() == locations_count
+
+    # a duplicate row within the file is reported, the last one is imported
+    result = location_crud.bulk_insert_locations(test_db, [locations[0], locations[0]], deduplicate=True)
+    assert len(result["updated"]) == 1
+    assert result["unprocessed"][0]["code"] == "DUPLICATE_ROW"
+
+    for location_id in result["updated"]:
+        assert len(changelogs_crud.get_changelogs(test_db, location_id)) == 3
+        assert geo_crud.search_index_by_location_id(test_db, location_id=location_id).status == 3
+
+    # without deduplication the rows are always added
+    result = location_crud.bulk_insert_locations(test_db, locations)
+    assert len(result["added"]) == 2
+
+
+
+def test_concurrent_deduplicating_imports(
+        test_db: Session
+) -> None:
+
+    location = {
+        "address": "Вулиця Одночасна",
+        "street_number": "1",
+        "city": "Вінниця",
+        "country": "Україна",
+        "postcode": "21000",
+        "lat": 49.2344,
+        "lng": 28.4711,
+        "reports": populate_reports()
+    }
+    dedup_key = location_crud.location_dedup_key(
+        location["lat"], location["lng"], location["address"], location["street_number"], location["city"]
+    )
+
+    first_import, second_import = Session(bind=test_db.get_bind()), Session(bind=test_db.get_bind())
+    results = {}
+
+    def import_location():
+        results["second"] = location_crud.bulk_insert_locations(second_import, [location], deduplicate=True)
+
+    # the first import holds the lock of the key until it commits, the second one has to wait for its location
+    assert not location_crud.find_duplicate_locations(first_import, [dedup_key])
+    thread = threading.Thread(target=import_location)
+    thread.start()
+    thread.join(0.5)
+    assert thread.is_alive()
+
+    results["first"] = location_crud.bulk_insert_locations(first_import, [location], deduplicate=True)
+    thread.join()
+
+    assert len(results["first"]["added"]) == 1
+    assert results["second"]["updated"] == results["first"]["added"]
+    assert test_db.query(Location).filter(Location.dedup_key == dedup_key).count() == 1
+
+    first_import.close()
+    second_import.close()
+    location_crud.delete_location(test_db, results["first"]["added"][0])
+
+
+def test_recent_reports_query_count(
+        client: TestClient,
+        test_db: Session,
+        map_reads_engine: Engine
+) -> None:
+
+    locations = create_reported_locations(test_db, 5)
+
+    with count_queries(map_reads_engine) as queries:
+        r = client.get(f"{settings.API_V1_STR}/locations/recent-reports?records=5")
+    assert 200 <= r.status_code < 300
+
+    # the organization names of the five reporting users come with the rows of the single feed query
+    assert [location["id"] for location in r.json()] == [location.id for location in reversed(locations)]
+    assert all(location["organization_name"] for location in r.json())
+    assert len(queries) == 1
+
+    delete_reported_locations(test_db, locations)
+
+
+def test_location_rows_serialization(
+        test_db: Session
+) -> None:
+
+    # the list endpoints skip the LocationOut validation, so the rows should serialize to exactly what it outputs
+    rows = location_crud.get_activity_feed(test_db, 5)
+    assert rows
+
+    for row in rows:
+        location = location_crud.get_location_by_id(test_db, row.id)
+        assert json.loads(UTCJSONResponse(Location.row_to_json(row)).body) == \
+            json.loads(schemas.LocationOut(**location.to_json()).json())
+
+
+def test_location_requests_query_count(
+        client: TestClient,
+        test_db: Session,
+        superuser_token_headers: Dict[str, str],
+        sample_location_coordinates: Dict[str, float]
+) -> None:
+
+    locations = [
+        location_crud.create_location_review_request(
+            test_db,
+            address={"road": "Вулиця Запитана", "house_number": str(number), "city": "Вінниця"},
+            lat=49.2388 + number * 0.001,
+            lng=28.4766
+        )
+        for number in range(5)
+    ]
+
+    for sort_parameters in ("", "&sort=distance&user_lat={lat}&user_lng={lng}".format(**sample_location_coordinates)):
+        with count_queries(test_db.get_bind()) as queries:
+            r = client.get(
+                f"{settings.API_V1_STR}/locations/location-requests?page=1&limit=5" + sort_parameters,
+                headers=superuser_token_headers
+            )
+        assert 200 <= r.status_code < 300
+        assert len(r.json()) == 5
+        # the current user and the page of the locations
+        assert len(queries) == 2
+
+    for location in locations:
+        location_crud.delete_location(test_db, location.id)
+
+
+def test_assigned_locations_query_count(
+        client: TestClient,
+        test_db: Session,
+        superuser_token_headers: Dict[str, str],
+        superuser_id: int
+) -> None:
+
+    locations = [
+        location_crud.create_location_review_request(
+            test_db,
+            address={"road": "Вулиця Призначена", "house_number": str(number), "city": "Вінниця"},
+            lat=49.2377 + number * 0.001,
+            lng=28.4755
+        )
+        for number in range(3)
+    ]
+
+    for location in locations:
+        location_crud.assign_report(test_db, superuser_id, location.id)
+    with count_queries(test_db.get_bind()) as queries:
+        r = client.get(f"{settings.API_V1_STR}/locations/assigned-locations", headers=superuser_token_headers)
+    assert 200 <= r.status_code < 300
+    assert {location.id for location in locations} <= {location["id"] for location in r.json()}
+    # the current user and the assigned locations with the organization of their reporter
+    assert len(queries) == 2
 
+    for location in locations:
+        location_crud.delete_location(test_db, location.id)
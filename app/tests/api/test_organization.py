@@ -38,6 +38,36 @@ def test_get_all_organizations(
     assert 200 <= r.status_code < 300
 
 
+def test_get_all_organizations_by_cursor(
+        client: TestClient,
+        test_db: Session,
+        superuser_token_headers: Dict[str, str]
+) -> None:
+
+    organization_ids = [organization.id for organization in crud.get_organizations_list(test_db, limit=1000)]
+    assert len(organization_ids) > 1
+
+    paged_ids = []
+    params = {"limit": 1}
+    while True:
+        r = client.get(f'{settings.API_V1_STR}/organizations/all', params=params, headers=superuser_token_headers)
+        assert 200 <= r.status_code < 300
+        paged_ids.extend(organization["id"] for organization in r.json())
+
+        if "X-Next-Cursor" not in r.headers:
+            break
+        params["cursor"] = r.headers["X-Next-Cursor"]
+
+    assert paged_ids == organization_ids
+
+    r = client.get(
+        f'{settings.API_V1_STR}/organizations/all',
+        params={"cursor": "not a cursor"},
+        headers=superuser_token_headers
+    )
+    assert r.status_code == 400
+
+
 def test_get_organization_by_id(
         client: TestClient,
         test_db: Session,
@@ -105,6 +135,8 @@ def test_remove_organization_member(
     )
     assert 200 <= r.status_code < 300
 
+    # the user may still be in the identity map of the test session, with the organization before the request
+    test_db.expire_all()
     master_user = user_crud.get(test_db, user_id=superuser_id)
     assert master_user.organization is None
 
@@ -134,6 +166,7 @@ def test_invite_organization_members(
     organization = r.json()
     assert organization["participants"]
 
+    test_db.expire_all()
     master_user = user_crud.get(test_db, user_id=superuser_id)
     assert master_user.organization == master_organization_id
 
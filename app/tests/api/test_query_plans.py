@@ -0,0 +1,101 @@
+from typing import Dict
+
+from sqlalchemy.orm import Session
+
+from app.models.location import Location
+from app.crud import crud_geospatial as geo_crud
+from app.crud import crud_location as location_crud
+from app.crud import crud_changelogs as changelogs_crud
+from app.tests.utils.utils import query_plans, plan_indexes
+
+
+def test_pending_locations_use_partial_index(
+        test_db: Session
+) -> None:
+
+    for call in (
+            lambda: location_crud.get_locations_awaiting_reports(test_db, 20, 0),
+            lambda: location_crud.get_locations_awaiting_reports_count(test_db)
+    ):
+        plans = query_plans(test_db, call)
+        assert plans
+        assert all("ix_location_pending_created_at_id" in plan_indexes(plan) for plan in plans)
+
+
+def test_activity_feed_uses_partial_index(
+        test_db: Session
+) -> None:
+
+    plans = query_plans(test_db, lambda: location_crud.get_activity_feed(test_db, 10))
+
+    assert len(plans) == 1
+    assert "ix_location_approved_created_at" in plan_indexes(plans[0])
+
+
+def test_assigned_locations_use_composite_index(
+        test_db: Session,
+        superuser_id: int
+) -> None:
+
+    plans = query_plans(test_db, lambda: location_crud.get_user_assigned_locations(test_db, superuser_id))
+
+    assert len(plans) == 1
+    assert "ix_location_reported_by_status" in plan_indexes(plans[0])
+
+
+def test_changelogs_use_composite_index(
+        test_db: Session,
+        location: Location
+) -> None:
+
+    # the location expires with every plan rollback, its id is read before so the refresh isn't captured
+    location_id = location.id
+    plans = query_plans(test_db, lambda: changelogs_crud.get_changelogs(test_db, location_id))
+
+    assert len(plans) == 1
+    assert "ix_changelog_location_id_created_at_id" in plan_indexes(plans[0])
+
+
+def test_index_record_lookup_uses_location_id_index(
+        test_db: Session,
+        location: Location
+) -> None:
+
+    location_id = location.id
+    plans = query_plans(test_db, lambda: geo_crud.search_index_by_location_id(test_db, location_id=location_id))
+
+    assert len(plans) == 1
+    assert "ix_geospatialindex_location_id" in plan_indexes(plans[0])
+
+
+def test_marker_cell_lookups_use_geohash_index(
+        test_db: Session,
+        sample_location_coordinates: Dict[str, float]
+) -> None:
+
+    # the cells are matched with LIKE 'cell%', which a plain btree can't serve unless the collation is C
+    lat, lng = sample_location_coordinates["lat"], sample_location_coordinates["lng"]
+    for call in (
+            lambda: geo_crud.search_indexes_in_range(test_db, lat, lng, 14),
+            lambda: geo_crud.search_nearby_indexes(test_db, lat, lng, 1, 5)
+    ):
+        plans = query_plans(test_db, call)
+        assert len(plans) == 1
+        assert "ix_geospatialindex_geohash" in plan_indexes(plans[0])
+
+
+def test_cluster_cell_lookups_use_geohash_index(
+        test_db: Session,
+        sample_location_coordinates: Dict[str, float]
+) -> None:
+
+    # at zoom 10 the clusters are a level finer than the viewport cells, so they are matched by the prefix
+    plans = query_plans(
+        test_db,
+        lambda: geo_crud.cluster_indexes_in_range(
+            test_db, sample_location_coordinates["lat"], sample_location_coordinates["lng"], 10
+        )
+    )
+
+    assert len(plans) == 1
+    assert "ix_geohash_cell_stats_precision_geohash" in plan_indexes(plans[0])
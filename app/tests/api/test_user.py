@@ -1,8 +1,14 @@
 from typing import Dict
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import SecurityScopes
 from fastapi.testclient import TestClient
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 
+from app.api.dependencies import get_current_user_async
 from app.core.config import settings
 from app.crud import crud_user as crud
 from app.crud import crud_organizations as org_crud
@@ -214,6 +220,29 @@ def test_user_password_reset(
     # assert not db_user.password_renewal_token_expires
 
 
+
+def test_get_current_user_async(
+        async_test_db_factory: sessionmaker,
+        superuser_token_headers: Dict[str, str],
+        superuser_id: int
+) -> None:
+
+    token = superuser_token_headers["Authorization"].split(" ", 1)[1]
+
+    async def current_user(scopes):
+        async with async_test_db_factory() as db:
+            return await get_current_user_async(SecurityScopes(scopes), db, token)
+
+    user = asyncio.run(current_user(["users:me"]))
+    assert user.id == superuser_id
+    # loaded with the user, it can't be lazy loaded once the async session is closed
+    assert user.organization_model
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(current_user(["users:unknown"]))
+    assert e.value.status_code == 401
+
+
 def test_user_delete_me(
         client: TestClient,
         test_db: Session,
@@ -55,6 +55,9 @@ def test_get_all_restricted_zones(
     zones = r.json()
     assert isinstance(zones, list)
     assert len(zones) > 0
+    # the geometries are not sent with the list
+    assert "bounding_box" not in zones[0]
+    assert zones[0]["min_lat"] < zones[0]["max_lat"]
 
 
 def test_allow_zone(
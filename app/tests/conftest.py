@@ -5,14 +5,17 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from sqlalchemy_utils import drop_database, database_exists, create_database
 
 from app.main import app
 from app.models.location import Location
 from app.db.init_db import init_db
-from app.api.dependencies import get_db
+from app.api.dependencies import get_db, get_async_db
 from app.db.base import Base
 from app.db.session import SessionLocal
 from app.tests.utils.user import user_authentication_headers, get_superuser_token_headers, get_superuser_id
@@ -55,6 +58,29 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+TestingAsyncSessionLocal = None
+
+if settings.ASYNC_DATABASE_ENABLED:
+    # asyncpg connections are bound to their event loop, so they are not pooled between the tests
+    async_engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
+        poolclass=NullPool
+    )
+
+    TestingAsyncSessionLocal = sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+        bind=async_engine,
+        class_=AsyncSession
+    )
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
 
 @pytest.fixture(scope="module")
 def client() -> Generator:
@@ -67,6 +93,21 @@ def test_db() -> Generator:
     yield TestingSessionLocal()
 
 
+@pytest.fixture(scope="session")
+def async_test_db_factory() -> sessionmaker:
+    if TestingAsyncSessionLocal is None:
+        pytest.skip("The async database engine is disabled")
+    return TestingAsyncSessionLocal
+
+
+@pytest.fixture(scope="session")
+def map_reads_engine(test_db: Session) -> Engine:
+    # with the async engine enabled, the map reads of locations_async are served in front of the sync routes
+    if TestingAsyncSessionLocal is not None:
+        return async_engine.sync_engine
+    return test_db.get_bind()
+
+
 @pytest.fixture(scope="session")
 def db() -> Generator:
     yield SessionLocal()
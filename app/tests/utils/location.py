@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, List
 
 from sqlalchemy.orm import Session
 
@@ -6,7 +6,11 @@ from fastapi.testclient import TestClient
 
 from app.models import Location
 from app.crud import crud_location as crud
+from app.crud import crud_organizations, crud_user
 from app.core.config import settings
+from app.schemas.organization import OrganizationBase
+from app.schemas.user import UserCreate
+from app.tests.utils.utils import random_email, random_lower_string
 
 
 def get_location_by_coords(db, loc_coords: Dict) -> Location:
@@ -34,3 +38,44 @@ def create_sample_location_request(client: TestClient) -> Dict[str, str]:
     r = client.post(f"{settings.API_V1_STR}/locations/request-info", json=payload)
     return r.json()
 
+
+def create_reported_locations(db: Session, count: int) -> List[Location]:
+
+    """
+    Creates the approved locations, each one reported by a different user of a different organization, so the
+    reporting users and their organizations can't come from the identity map of a single lazy load.
+    """
+
+    locations = []
+    for number in range(count):
+        organization = crud_organizations.create(db, obj_in=OrganizationBase(name=random_lower_string()))
+        user = crud_user.create(
+            db,
+            obj_in=UserCreate(email=random_email(), password=random_lower_string(), organization=organization.id),
+            role="aid_worker"
+        )
+
+        location = crud.create_location_review_request(
+            db,
+            address={"road": "Вулиця Перевірена", "house_number": str(number), "city": "Вінниця"},
+            lat=49.2355 + number * 0.001,
+            lng=28.4733
+        )
+        location.reported_by = user.id
+        location.status = 3
+        db.commit()
+
+        locations.append(location)
+
+    return locations
+
+
+def delete_reported_locations(db: Session, locations: List[Location]) -> None:
+
+    for location in locations:
+        user_id = location.reported_by
+        organization_id = location.reported_by_model.organization
+
+        crud.delete_location(db, location.id)
+        crud_user.delete_user(db, user_id)
+        crud_organizations.delete_organization(db, organization_id)
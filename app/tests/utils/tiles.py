@@ -0,0 +1,110 @@
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+"""
+A minimal Mapbox Vector Tile decoder for the point tiles of app.utils.vector_tiles. It is written from the spec
+(https://github.com/mapbox/vector-tile-spec/tree/master/2.1), apart from the encoder, so the tests check the encoding
+instead of repeating it.
+"""
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def _fields(data: bytes) -> Iterator[Tuple[int, Any]]:
+    position = 0
+    while position < len(data):
+        key, position = _read_varint(data, position)
+        field, wire_type = key >> 3, key & 0x07
+
+        if wire_type == 0:
+            value, position = _read_varint(data, position)
+        elif wire_type == 2:
+            length, position = _read_varint(data, position)
+            value, position = data[position:position + length], position + length
+        else:
+            raise ValueError("Unexpected wire type {}".format(wire_type))
+
+        yield field, value
+
+
+def _packed(data: bytes) -> List[int]:
+    values = []
+    position = 0
+    while position < len(data):
+        value, position = _read_varint(data, position)
+        values.append(value)
+    return values
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def _decode_feature(data: bytes, keys: List[str], values: List[Any]) -> Dict:
+    feature = {"id": None, "tags": [], "type": None, "geometry": []}
+    for field, value in _fields(data):
+        if field == 1:
+            feature["id"] = value
+        elif field == 2:
+            feature["tags"] = _packed(value)
+        elif field == 3:
+            feature["type"] = value
+        elif field == 4:
+            feature["geometry"] = _packed(value)
+
+    command, x, y = feature["geometry"]
+    # a single MoveTo (command id 1, count 1) per point
+    assert command == (1 << 3) | 1
+
+    tags = feature["tags"]
+    return {
+        "id": feature["id"],
+        "type": feature["type"],
+        "properties": {keys[tags[i]]: values[tags[i + 1]] for i in range(0, len(tags), 2)},
+        "x": _unzigzag(x),
+        "y": _unzigzag(y)
+    }
+
+
+def decode_points_tile(tile: bytes) -> List[Dict]:
+    """
+    :param tile: Protobuf encoded tile of points
+    :return: The layers of the tile, as dicts of the name, version, extent and the features with their id, type,
+        properties and tile coordinates
+    """
+
+    layers = []
+    for field, layer_data in _fields(tile):
+        assert field == 3
+
+        layer = {"name": None, "version": None, "extent": None, "features": []}
+        features, keys, values = [], [], []
+        for layer_field, value in _fields(layer_data):
+            if layer_field == 1:
+                layer["name"] = value.decode()
+            elif layer_field == 2:
+                features.append(value)
+            elif layer_field == 3:
+                keys.append(value.decode())
+            elif layer_field == 4:
+                # the Value message, only the uint_value (5) is used by the markers
+                values.append(dict(_fields(value))[5])
+            elif layer_field == 5:
+                layer["extent"] = value
+            elif layer_field == 15:
+                layer["version"] = value
+
+        layer["features"] = [_decode_feature(feature, keys, values) for feature in features]
+        layers.append(layer)
+
+    return layers
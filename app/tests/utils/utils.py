@@ -1,5 +1,11 @@
 import random
 import string
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generator, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
 
 
 def random_lower_string() -> str:
@@ -9,3 +15,65 @@ def random_lower_string() -> str:
 def random_email() -> str:
     return f"{random_lower_string()}@{random_lower_string()}.com"
 
+
+@contextmanager
+def count_queries(engine: Engine) -> Generator[List[str], None, None]:
+    """
+    Collects the statements executed by the engine within the block.
+    """
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def query_plans(db: Session, call: Callable[[], Any]) -> List[Dict]:
+    """
+    Runs the call and returns the plans of the SELECT statements it executed. The test database is tiny, so the
+    planner would rather scan the tables, the plans are made with the sequential scans disabled to show if an index
+    can serve the query.
+    """
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    plans = []
+    try:
+        connection = db.connection()
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        for statement, parameters in statements:
+            plans.append(connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()[0])
+    finally:
+        db.rollback()
+
+    return plans
+
+
+def plan_indexes(plan: Dict) -> Set[str]:
+    """
+    :return: The names of the indexes used anywhere in the EXPLAIN (FORMAT JSON) plan
+    """
+
+    node = plan.get("Plan", plan)
+    indexes = {node["Index Name"]} if "Index Name" in node else set()
+    for child in node.get("Plans", []):
+        indexes |= plan_indexes(child)
+
+    return indexes
@@ -1,25 +1,68 @@
-from typing import List, Dict
+from typing import Any, Callable, Iterable, Iterator, List, Dict, Optional, Tuple
+import asyncio
+import csv
+import functools
+import itertools
+import json
 import logging
 
 from openpyxl import load_workbook
-from openpyxl.worksheet.worksheet import Worksheet
 
-from app.utils.geocoding import geocode_address
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.geocoding import normalize_address, geocode_addresses_cached
 from app.db.session import SessionLocal
 
 from app.core.config import settings
-from app.crud.crud_location import bulk_insert_locations
+from app.crud.crud_location import bulk_insert_locations, copy_insert_locations
 
 
 logger = logging.getLogger(settings.PROJECT_NAME)
 
+GEOCODING_PROGRESS_STEP = 100
+
+# amount of columns of the bulk upload sheet, from the address to the building condition description
+EXCEL_COLUMNS = 12
+
+# columns of the CSV files and properties of the GeoJSON features holding the report flags
+REPORT_FIELDS = ("buildingCondition", "electricity", "carEntrance", "water", "fuelStation", "hospital")
+
+# receives the stage the upload is at and the amount of rows that made it through every stage so far
+ProgressCallback = Callable[[str, Dict[str, int]], None]
+
 
-async def serialize_excel(
-    spreadsheet: Worksheet
+def read_excel_rows(filepath: str) -> Iterator[Tuple]:
+    # the read-only mode parses the sheet lazily instead of loading every cell into memory
+    workbook = load_workbook(filepath, read_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            # read-only rows stop at the last filled cell
+            yield tuple(row) + (None,) * (EXCEL_COLUMNS - len(row))
+    finally:
+        workbook.close()
+
+
+def iter_chunks(rows: Iterable[Tuple], size: int) -> Iterator[List[Tuple]]:
+    rows = iter(rows)
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, size))
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        # closes the workbook if the import stops before the end of the sheet
+        if hasattr(rows, "close"):
+            rows.close()
+
+
+def serialize_excel(
+    rows: Iterable[Tuple]
 ) -> Dict:
     locations = []
     unprocessed_locations = []
-    for row in spreadsheet.iter_rows(values_only=True):
+    for row in rows:
         if not row[0]:
             continue
         try:
@@ -71,27 +114,142 @@ async def serialize_excel(
     }
 
 
+def read_csv_records(filepath: str) -> Iterator[Dict]:
+    # utf-8-sig drops the byte order mark Excel puts in front of the exported CSV files
+    with open(filepath, newline="", encoding="utf-8-sig") as file:
+        yield from csv.DictReader(file)
+
+
+def _geojson_record(feature: Dict) -> Dict:
+    record = dict(feature.get("properties") or {})
+
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") == "Point":
+        record["lng"], record["lat"] = geometry["coordinates"][:2]
+
+    return record
+
+
+def _geojson_line(line: str) -> Any:
+    # GeoJSON text sequences (RFC 8142) prefix every feature with a record separator
+    return json.loads(line.strip("\x1e \r\n"))
+
+
+def read_geojson_records(filepath: str) -> Iterator[Dict]:
+    """
+    Reads the features of a GeoJSON file, a feature per line files (GeoJSON text sequences) are read line by line,
+    FeatureCollection documents have to be parsed at once.
+    """
+
+    with open(filepath, encoding="utf-8") as file:
+        first_line = file.readline()
+        try:
+            first_feature = _geojson_line(first_line)
+        except ValueError:
+            first_feature = None
+
+        if isinstance(first_feature, dict) and first_feature.get("type") == "Feature":
+            features = itertools.chain(
+                [first_feature],
+                (_geojson_line(line) for line in file if line.strip("\x1e \r\n"))
+            )
+        else:
+            file.seek(0)
+            features = json.load(file).get("features", [])
+
+        for feature in features:
+            yield _geojson_record(feature)
+
+
+def _coordinate(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+def serialize_records(
+    records: Iterable[Dict]
+) -> Dict:
+    locations = []
+    unprocessed_locations = []
+    for record in records:
+        if not record.get("address") and record.get("lat") in (None, ""):
+            continue
+        try:
+            location = {
+                "address": (record.get("address") or "").strip() or None,
+                "street_number": record.get("street_number") or None,
+                "city": record.get("city") or None,
+                "country": record.get("country") or None,
+                "postcode": record.get("postcode") or None,
+                "lat": _coordinate(record.get("lat")),
+                "lng": _coordinate(record.get("lng")),
+                "reports": {
+                    field: {
+                        "flag": record[field].lower(),
+                        "description": ""
+                    }
+                    for field in REPORT_FIELDS
+                }
+            }
+            location["reports"]["buildingCondition"]["description"] = record.get("description") or ""
+            locations.append(location)
+
+        except Exception as e:
+            unprocessed_locations.append({
+                "location": record,
+                "code": "SERIALIZATION_ERROR",
+                "detail": e
+            })
+
+    return {
+        "processed": locations,
+        "unprocessed": unprocessed_locations
+    }
+
+
 async def geocode_locations(
-    locations: List[Dict]
+    locations: List[Dict],
+    db: Session
 ) -> Dict:
 
-    geocoded_locations = []
-    unprocessed_locations = []
+    if not locations:
+        return {
+            "geocoded": [],
+            "unprocessed": []
+        }
+
+    # the same address often repeats in a sheet, so every unique address is geocoded once
+    addresses = {}
+    location_keys = []
     for location in locations:
         address_string = "{}, {}".format(location.get('address'), location.get('street_number'))
-        coordinates = geocode_address(
-            address=address_string,
-            city=location.get('city')
-        )
-        if not coordinates:
+        key = normalize_address(address_string, location.get('city'))
+        addresses.setdefault(key, (address_string, location.get('city')))
+        location_keys.append(key)
+
+    logger.debug("Unique addresses: {}".format(len(addresses)))
+
+    def report_progress(done: int, total: int) -> None:
+        if done % GEOCODING_PROGRESS_STEP == 0 or done == total:
+            logger.debug("Geocoded {} of {} addresses".format(done, total))
+
+    # geopy clients are blocking, so the pool runs outside of the event loop
+    coordinates = await run_in_threadpool(
+        functools.partial(geocode_addresses_cached, db, addresses, progress=report_progress)
+    )
+
+    geocoded_locations = []
+    unprocessed_locations = []
+    for location, key in zip(locations, location_keys):
+        if not coordinates.get(key):
             unprocessed_locations.append({
                 "location": location,
                 "code": "GEOCODING_ERROR",
                 "detail": "Address not found"
             })
             continue
-        location["lat"] = coordinates.latitude
-        location["lng"] = coordinates.longitude
+        location["lat"], location["lng"] = coordinates[key]
         geocoded_locations.append(location)
 
     return {
@@ -100,40 +258,111 @@ async def geocode_locations(
     }
 
 
+# doctype -> (rows reader, chunk serializer, chunk inserter). The spreadsheets are typed in by hand and go through the
+# savepoint backed inserts, the partners' dumps are bigger and go through COPY.
+IMPORT_DOCTYPES = {
+    "excel": (read_excel_rows, serialize_excel, bulk_insert_locations),
+    "csv": (read_csv_records, serialize_records, copy_insert_locations),
+    "geojson": (read_geojson_records, serialize_records, copy_insert_locations),
+}
+
+
 async def upload_locations(
         filepath: str,
-        doctype: str
+        doctype: str,
+        progress: Optional[ProgressCallback] = None,
+        deduplicate: bool = False
 ):
 
+    """
+    Imports the locations of a file as a streaming pipeline: the file is read row by row, and every chunk of
+    IMPORT_CHUNK_SIZE rows is serialized, geocoded and inserted before the next one is read. The insertion of a chunk
+    overlaps with the geocoding of the next one, so the memory stays flat no matter the size of the file and the
+    first locations are in the database while the rest of the file is still being processed.
+
+    :param str filepath: Path of the uploaded file
+    :param str doctype: Type of the file, one of IMPORT_DOCTYPES
+    :param progress: Optional callback receiving the stage and the cumulative row counts after every chunk
+    :param bool deduplicate: Update the already stored locations with the same geohash cell and address instead of
+        adding them again, so a file can be re-imported
+    :return: A list of the rows that could not be imported, with the failure code and detail
+    """
+
+    if doctype not in IMPORT_DOCTYPES:
+        return None
+
+    read_rows, serialize, insert_locations = IMPORT_DOCTYPES[doctype]
+
     unprocessed_locations = []
+    counts = {"rows": 0, "serialized": 0, "geocoded": 0, "inserted": 0, "updated": 0}
+
+    def report(stage: str) -> None:
+        if progress:
+            progress(stage, dict(counts))
+
+    # the geocoding and the insertion run at the same time in different threads, so each of them has a session
+    geocoding_db = SessionLocal()
+    inserting_db = SessionLocal()
 
-    if doctype == "excel":
-        workbook = load_workbook(filepath)
-        sheet = workbook.active
-        logger.debug("XLSX loaded, starting serialization.")
-
-        serialization_results = await serialize_excel(sheet)
-        unprocessed_locations = serialization_results.get('unprocessed')
-        serialized_locations = serialization_results.get('processed')
-        logger.debug("Processed locations: {}".format(len(serialized_locations)))
-        logger.debug("Unprocessed locations: {}".format(len(unprocessed_locations)))
-
-        logger.debug("Starting geocoding")
-        geocoding_results = await geocode_locations(serialized_locations)
-        geocoded_locations = geocoding_results.get('geocoded')
-        unprocessed_locations.append(loc for loc in geocoding_results.get('unprocessed'))
-        logger.debug("Geocoded locations: {}".format(len(geocoded_locations)))
-        logger.debug("Could not geocode: {}".format(len(geocoding_results.get('unprocessed'))))
-
-        logger.debug("Adding {} locations to database".format(len(geocoded_locations)))
-        db_locations = bulk_insert_locations(
-            db=SessionLocal(),
-            locations=geocoded_locations
+    async def insert_chunk(locations: List[Dict]) -> None:
+        db_locations = await run_in_threadpool(
+            insert_locations,
+            db=inserting_db,
+            locations=locations,
+            deduplicate=deduplicate
         )
-        added_locations = db_locations.get("added")
-        unprocessed_locations.append(loc for loc in db_locations.get('unprocessed'))
-        logger.debug("Added locations: {}".format(len(added_locations)))
-        logger.debug("Failed to add: {}".format(len(db_locations.get('unprocessed'))))
+        unprocessed_locations.extend(db_locations.get('unprocessed'))
+        counts["inserted"] += len(db_locations.get("added"))
+        counts["updated"] += len(db_locations.get("updated"))
+        report("inserting")
+
+    chunks = iter_chunks(read_rows(filepath), settings.IMPORT_CHUNK_SIZE)
+    pending_insert = None
+    try:
+        report("serializing")
+        while True:
+            # reading the file is blocking I/O, so the rows are pulled on the threadpool
+            rows = await run_in_threadpool(next, chunks, None)
+            if rows is None:
+                break
+
+            serialization_results = serialize(rows)
+            serialized_locations = serialization_results.get('processed')
+            unprocessed_locations.extend(serialization_results.get('unprocessed'))
+            counts["rows"] += len(rows)
+            counts["serialized"] += len(serialized_locations)
+            report("geocoding")
+
+            # the partners' files usually come with the coordinates, only the rest is geocoded
+            located_locations = []
+            unlocated_locations = []
+            for location in serialized_locations:
+                if location.get('lat') is not None and location.get('lng') is not None:
+                    located_locations.append(location)
+                else:
+                    unlocated_locations.append(location)
+
+            geocoding_results = await geocode_locations(unlocated_locations, geocoding_db)
+            geocoded_locations = located_locations + geocoding_results.get('geocoded')
+            unprocessed_locations.extend(geocoding_results.get('unprocessed'))
+            counts["geocoded"] += len(geocoded_locations)
+            logger.debug("Rows: {rows}, serialized: {serialized}, geocoded: {geocoded}".format(**counts))
+
+            if pending_insert:
+                await pending_insert
+            pending_insert = asyncio.ensure_future(insert_chunk(geocoded_locations))
+
+        if pending_insert:
+            await pending_insert
+        logger.debug("Added locations: {inserted}, updated locations: {updated}".format(**counts))
 
-        return unprocessed_locations
+    finally:
+        # a thread can't be interrupted, so if a chunk failed, the insertion of the previous one still has to finish
+        # before its session is closed
+        if pending_insert and not pending_insert.done():
+            await asyncio.wait([pending_insert])
+        chunks.close()
+        geocoding_db.close()
+        inserting_db.close()
 
+    return unprocessed_locations
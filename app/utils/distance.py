@@ -0,0 +1,31 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(
+        lat: float,
+        lng: float,
+        lats: np.ndarray,
+        lngs: np.ndarray
+) -> np.ndarray:
+    """
+    Calculates the great circle distances from one point to an array of points in a single vectorized pass.
+    It differs from the geodesic distance by less than 0.5%, which is more than enough to sort the locations by
+    distance, while being orders of magnitude faster than calling geopy for every single location.
+
+    :param float lat: Latitude of the origin point
+    :param float lng: Longitude of the origin point
+    :param lats: Array of the points latitudes
+    :param lngs: Array of the points longitudes
+    :return: Array of distances in kilometers
+    """
+
+    lat_rad = np.radians(lat)
+    lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    d_lat = lats_rad - lat_rad
+    d_lng = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat_rad) * np.cos(lats_rad) * np.sin(d_lng / 2) ** 2
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
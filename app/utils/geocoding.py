@@ -1,10 +1,22 @@
-from typing import Any, Optional, Dict
-
+from typing import Any, Optional, Dict, Tuple, Callable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from threading import Lock
+import logging
+import re
+import time
+
+from geopy.exc import GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited
 from geopy.geocoders import GoogleV3, Nominatim
 import osmnx as ox
+import pygeohash as pgh
 from shapely.geometry import Point
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.crud import crud_geocoding as crud
+from app.utils.rate_limiter import TokenBucket
 
 
 """
@@ -20,11 +32,76 @@ Please note, that when trying to query the info about less populated areas (vill
 info about that address than Google.
 
 Currently , we use Google for geocoding and OSM for reverse geocoding.
+
+Reverse geocoding results are cached in the database by the geohash of the coordinates (precision 9 is a ~5m x 5m
+cell, so the neighbouring houses do not share an address). Forward geocoding results are cached by the normalized
+address, both in the database and in a process level LRU. The hits and misses are counted per process.
+
+All the provider calls go through a per provider token bucket (Nominatim allows 1 request per second, Google is
+limited by the key's QPS quota) and are retried with an exponential backoff on timeouts and rate limiting errors. The
+reverse geocoding of the request handlers gives up instead of waiting longer than REVERSE_GEOCODING_WAIT_SECONDS.
+Batches are geocoded by a bounded thread pool, as geopy clients are blocking.
 """
 
+logger = logging.getLogger(settings.PROJECT_NAME)
+
 geocoder = Nominatim(user_agent="GetLoc")
 gmaps_geocoder = GoogleV3(api_key=settings.GMAPS_APIKEY)
 
+REVERSE_CACHE_PRECISION = 9
+
+FORWARD_CACHE_SIZE = 10000
+
+cache_stats = {
+    "reverse": {
+        "hits": 0,
+        "misses": 0
+    },
+    "forward": {
+        "hits": 0,
+        "misses": 0
+    }
+}
+# the stats are counted from the request threads and the geocoding pool
+_cache_stats_lock = Lock()
+
+_forward_cache: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+_forward_cache_lock = Lock()
+
+rate_limiters = {
+    "google": TokenBucket(rate=settings.GMAPS_QPS, capacity=settings.GMAPS_QPS),
+    "nominatim": TokenBucket(rate=settings.NOMINATIM_QPS)
+}
+
+RETRY_BACKOFF_SECONDS = 0.5
+RETRYABLE_ERRORS = (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited)
+
+
+class RateLimitTimeout(Exception):
+    pass
+
+
+def _call_provider(provider: str, method: Callable, *args, wait_timeout: Optional[float] = None, **kwargs) -> Any:
+
+    """
+    Calls the provider method respecting its rate limit, retrying the timeouts and rate limiting errors.
+
+    :param wait_timeout: Longest wait for the rate limit per attempt in seconds, None to wait as long as it takes
+    :raises RateLimitTimeout: If the call would wait for the rate limit longer than wait_timeout
+    """
+
+    for attempt in range(settings.GEOCODING_RETRIES):
+        if not rate_limiters[provider].acquire(timeout=wait_timeout):
+            raise RateLimitTimeout("The {} rate limit is exhausted".format(provider))
+        try:
+            return method(*args, **kwargs)
+
+        except RETRYABLE_ERRORS as e:
+            if attempt == settings.GEOCODING_RETRIES - 1:
+                raise
+            retry_after = getattr(e, 'retry_after', None)
+            time.sleep(retry_after or RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
 
 def geocode_address(
         address: str,
@@ -42,7 +119,7 @@ def geocode_address(
     """
 
     try:
-        coordinates = gmaps_geocoder.geocode('{}, {}'.format(address, city), region=region)
+        coordinates = _call_provider("google", gmaps_geocoder.geocode, '{}, {}'.format(address, city), region=region)
         return coordinates
 
     except Exception as e:
@@ -50,6 +127,127 @@ def geocode_address(
         return None
 
 
+def normalize_address(
+        address: str,
+        city: str,
+        region: str = 'ua'
+) -> str:
+
+    """
+    Builds the forward geocoding cache key, so the same address written with a different case, spacing or
+    punctuation is geocoded only once.
+
+    :param str address: Address of the location, usually a street name with a house number
+    :param str city: City of the address
+    :param str region: Short alias for the region name
+    :return: Normalized address string
+    """
+
+    query = '{}, {}, {}'.format(address or '', city or '', region or '').lower()
+    query = re.sub(r'[^\w\s,/-]', ' ', query)
+    query = re.sub(r'\s+', ' ', query)
+
+    return ','.join(part.strip() for part in query.split(',') if part.strip())
+
+
+def _count_cache_stats(kind: str, hits: int = 0, misses: int = 0) -> None:
+    with _cache_stats_lock:
+        cache_stats[kind]["hits"] += hits
+        cache_stats[kind]["misses"] += misses
+
+
+def _remember_forward(key: str, coordinates: Tuple[float, float]) -> None:
+    with _forward_cache_lock:
+        _forward_cache[key] = coordinates
+        _forward_cache.move_to_end(key)
+        while len(_forward_cache) > FORWARD_CACHE_SIZE:
+            _forward_cache.popitem(last=False)
+
+
+def geocode_many(
+        addresses: Dict[str, Tuple[str, str]],
+        region: str = 'ua',
+        progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Optional[Tuple[float, float]]]:
+
+    """
+    Geocodes the addresses with the provider concurrently, in a pool of GEOCODING_WORKERS threads. The provider rate
+    limit is shared by all the threads.
+
+    :param dict addresses: Key -> (address, city) of the addresses to geocode
+    :param str region: Short alias for the region name
+    :param progress: Optional callback receiving the amount of geocoded addresses and their total amount
+    :return: Key -> (lat, lng) or None if the address was not found
+    """
+
+    results = {}
+    if not addresses:
+        return results
+
+    with ThreadPoolExecutor(max_workers=settings.GEOCODING_WORKERS) as executor:
+        futures = {
+            executor.submit(geocode_address, address=address, city=city, region=region): key
+            for key, (address, city) in addresses.items()
+        }
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            location = future.result()
+            results[futures[future]] = (location.latitude, location.longitude) if location else None
+            if progress:
+                progress(done, len(futures))
+
+    return results
+
+
+def geocode_addresses_cached(
+        db: Session,
+        addresses: Dict[str, Tuple[str, str]],
+        region: str = 'ua',
+        progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Optional[Tuple[float, float]]]:
+
+    """
+    Geocodes a batch of addresses, looking them up in the process cache first, then in the database cache with a
+    single query, and calling the provider only for the remaining ones. New provider results are saved to both
+    caches, addresses that could not be geocoded are not cached.
+
+    :param Session db: Database session
+    :param dict addresses: Normalized address key -> (address, city) of the addresses to geocode
+    :param str region: Short alias for the region name
+    :param progress: Optional callback receiving the amount of provider geocoded addresses and their total amount
+    :return: Normalized address key -> (lat, lng) or None if the address was not found
+    """
+
+    results = {}
+
+    with _forward_cache_lock:
+        for key in addresses:
+            if key in _forward_cache:
+                _forward_cache.move_to_end(key)
+                results[key] = _forward_cache[key]
+
+    stored = crud.get_forward_geocodes(db, [key for key in addresses if key not in results])
+    for key, coordinates in stored.items():
+        _remember_forward(key, coordinates)
+    results.update(stored)
+
+    _count_cache_stats("forward", hits=len(results), misses=len(addresses) - len(results))
+
+    geocoded = geocode_many(
+        {key: address for key, address in addresses.items() if key not in results},
+        region=region,
+        progress=progress
+    )
+    results.update(geocoded)
+
+    found = {key: coordinates for key, coordinates in geocoded.items() if coordinates}
+    for key, coordinates in found.items():
+        _remember_forward(key, coordinates)
+    crud.save_forward_geocodes(db, found)
+
+    return results
+
+
 def reverse(
         lat: float,
         lng: float
@@ -79,14 +277,56 @@ def reverse(
     """
 
     try:
-        address = geocoder.reverse('{}, {}'.format(lat, lng))
+        # called from the request handlers, so a burst of cache misses doesn't hold the threadpool on the rate limit
+        address = _call_provider(
+            "nominatim",
+            geocoder.reverse,
+            '{}, {}'.format(lat, lng),
+            wait_timeout=settings.REVERSE_GEOCODING_WAIT_SECONDS
+        )
         return address.raw["address"]
 
+    except RateLimitTimeout as e:
+        logger.warning(e)
+        return None
+
     except Exception as e:
         print(e)
         return None
 
 
+def reverse_cached(
+        db: Session,
+        lat: float,
+        lng: float
+) -> Optional[Dict]:
+
+    """
+    Same as reverse, but looks the address up in the reverse geocoding cache first and saves the provider results
+    into it.
+
+    :param Session db: Database session
+    :param float lat: Latitude of an address
+    :param float lng: Longitude of an address
+    :return: Address object from the cache or the chosen provider
+    """
+
+    key = pgh.encode(lat, lng, REVERSE_CACHE_PRECISION)
+
+    cached = crud.get_reverse_geocode(db, key, ttl=timedelta(days=settings.REVERSE_GEOCODE_CACHE_TTL_DAYS))
+    if cached:
+        _count_cache_stats("reverse", hits=1)
+        return cached.address
+
+    _count_cache_stats("reverse", misses=1)
+
+    address = reverse(lat, lng)
+    if address:
+        crud.save_reverse_geocode(db, key, lat, lng, address)
+
+    return address
+
+
 def get_bounding_box_by_region_name(region_name: str):
 
     """
@@ -0,0 +1,224 @@
+import math
+from typing import List, Optional, Tuple
+
+import pygeohash as pgh
+
+
+"""
+Helpers for turning what the user sees on the map into a set of geohash prefixes.
+
+Every GeospatialIndex record stores the full precision (12) geohash of its location, so a viewport query is just a
+set of prefix matches. The shorter the prefix, the bigger the cell, so we pick the precision from the map zoom level
+and cover the visible area with as few cells as possible.
+
+You can check the link below to understand the precision levels, for instance 2 is ≤ 1,250km X 625km
+https://docs.quadrant.io/quadrant-geohash-algorithm
+"""
+
+MIN_PRECISION = 1
+MAX_PRECISION = 8
+
+# The biggest amount of cells we are ready to put into a single query. If a viewport needs more than that,
+# we fall back to a coarser precision.
+MAX_COVERING_CELLS = 32
+
+# (max zoom, geohash precision) pairs. Picked so that the center cell and its 8 neighbours always cover
+# a ~1024x768 px viewport of the Google Maps zoom level.
+ZOOM_PRECISION = (
+    (5, 1),
+    (8, 2),
+    (10, 3),
+    (13, 4),
+    (15, 5),
+    (18, 6),
+    (20, 7),
+)
+
+DEFAULT_ZOOM = 6
+
+# Above this zoom level the map receives the individual markers instead of the clusters.
+CLUSTER_MAX_ZOOM = 14
+
+# The finest precision the clusters are precomputed for (see GeohashCellStats).
+CLUSTER_MAX_PRECISION = 7
+
+
+def zoom_to_precision(zoom: Optional[int]) -> int:
+    """
+    Maps the Google Maps zoom level (0 - 21) to the geohash precision that is used to look up the markers.
+
+    :param int zoom: Map zoom level, the default one is used if not provided.
+    :return: Geohash precision between MIN_PRECISION and MAX_PRECISION.
+    """
+
+    if zoom is None:
+        zoom = DEFAULT_ZOOM
+
+    for max_zoom, precision in ZOOM_PRECISION:
+        if zoom <= max_zoom:
+            return precision
+
+    return MAX_PRECISION
+
+
+def is_clustered(zoom: Optional[int]) -> bool:
+    """
+    Tells if the markers should be aggregated into clusters on this zoom level.
+
+    :param int zoom: Map zoom level, the default one is used if not provided.
+    :return: True if the zoom level is below the clustering threshold
+    """
+
+    if zoom is None:
+        zoom = DEFAULT_ZOOM
+
+    return zoom <= CLUSTER_MAX_ZOOM
+
+
+def cluster_precision(zoom: Optional[int]) -> int:
+    """
+    Returns the precision of the geohash cells the markers are grouped by. It is one level finer than the search
+    precision, so the visible area is split into several clusters instead of a single one.
+
+    :param int zoom: Map zoom level, the default one is used if not provided.
+    :return: Geohash precision between MIN_PRECISION and CLUSTER_MAX_PRECISION.
+    """
+
+    return min(zoom_to_precision(zoom) + 1, CLUSTER_MAX_PRECISION)
+
+
+def radius_precision(lat: float, radius_km: float) -> int:
+    """
+    Returns the finest precision for which the cell containing a point and its 8 neighbours cover the whole circle
+    around it, meaning that the cell is at least radius_km high and wide.
+
+    :param float lat: Latitude of the circle center, the cells get narrower towards the poles
+    :param float radius_km: Radius of the circle in kilometers
+    :return: Geohash precision between MIN_PRECISION and MAX_PRECISION.
+    """
+
+    km_per_lat_degree = 111.32
+    km_per_lng_degree = km_per_lat_degree * max(math.cos(math.radians(lat)), 0.01)
+
+    for precision in range(MAX_PRECISION, MIN_PRECISION, -1):
+        lat_step, lng_step = cell_size(precision)
+        if lat_step * km_per_lat_degree >= radius_km and lng_step * km_per_lng_degree >= radius_km:
+            return precision
+
+    return MIN_PRECISION
+
+
+def cell_prefixes(geohash: str) -> List[str]:
+    """
+    Returns all the prefixes of a geohash the clusters are precomputed for, from the coarsest to the finest one.
+
+    :param str geohash: Full precision geohash of a marker
+    :return: A list of geohash prefixes
+    """
+
+    return [geohash[:precision] for precision in range(MIN_PRECISION, CLUSTER_MAX_PRECISION + 1)]
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """
+    Returns the size of a geohash cell in degrees. Geohash interleaves the bits starting with the longitude,
+    so on odd precision levels the longitude gets one bit more than the latitude.
+
+    :param int precision: Geohash precision
+    :return: A tuple of (lat degrees, lng degrees)
+    """
+
+    bits = precision * 5
+    lng_bits = math.ceil(bits / 2)
+    lat_bits = bits // 2
+
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def _clamp(lat: float, lng: float) -> Tuple[float, float]:
+    return min(max(lat, -90.0), 90.0), min(max(lng, -180.0), 180.0)
+
+
+def _covering_cells_count(south: float, west: float, north: float, east: float, precision: int) -> int:
+    lat_step, lng_step = cell_size(precision)
+    return (math.floor((north - south) / lat_step) + 2) * (math.floor((east - west) / lng_step) + 2)
+
+
+def covering_cells(south: float, west: float, north: float, east: float, precision: int) -> List[str]:
+    """
+    Returns the geohash cells of the given precision that cover the bounding box.
+
+    :param float south: Southern latitude of the bounding box
+    :param float west: Western longitude of the bounding box
+    :param float north: Northern latitude of the bounding box
+    :param float east: Eastern longitude of the bounding box
+    :param int precision: Geohash precision of the resulting cells
+    :return: A sorted list of unique geohash strings
+    """
+
+    south, west = _clamp(south, west)
+    north, east = _clamp(north, east)
+    lat_step, lng_step = cell_size(precision)
+
+    cells = set()
+
+    lat = south
+    while True:
+        lng = west
+        while True:
+            cells.add(pgh.encode(lat, lng, precision))
+            if lng >= east:
+                break
+            lng = min(lng + lng_step, east)
+
+        if lat >= north:
+            break
+        lat = min(lat + lat_step, north)
+
+    return sorted(cells)
+
+
+def neighbour_cells(lat: float, lng: float, precision: int) -> List[str]:
+    """
+    Returns the cell containing the point together with its 8 neighbours.
+
+    :param float lat: Latitude of the point
+    :param float lng: Longitude of the point
+    :param int precision: Geohash precision of the resulting cells
+    :return: A sorted list of unique geohash strings
+    """
+
+    lat_step, lng_step = cell_size(precision)
+
+    cells = set()
+    for d_lat in (-lat_step, 0, lat_step):
+        for d_lng in (-lng_step, 0, lng_step):
+            cells.add(pgh.encode(*_clamp(lat + d_lat, lng + d_lng), precision))
+
+    return sorted(cells)
+
+
+def viewport_cells(
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+        max_cells: int = MAX_COVERING_CELLS
+) -> List[str]:
+    """
+    Picks the finest precision for which the bounding box can be covered with no more than max_cells cells
+    and returns those cells.
+
+    :param float south: Southern latitude of the bounding box
+    :param float west: Western longitude of the bounding box
+    :param float north: Northern latitude of the bounding box
+    :param float east: Eastern longitude of the bounding box
+    :param int max_cells: Upper limit of cells to return
+    :return: A sorted list of unique geohash strings
+    """
+
+    for precision in range(MAX_PRECISION, MIN_PRECISION, -1):
+        if _covering_cells_count(south, west, north, east, precision) <= max_cells:
+            return covering_cells(south, west, north, east, precision)
+
+    return covering_cells(south, west, north, east, MIN_PRECISION)
@@ -0,0 +1,134 @@
+from typing import Dict, List, BinaryIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from uuid import uuid4
+import asyncio
+import logging
+import os
+import shutil
+
+from fastapi.encoders import jsonable_encoder
+
+from app.crud import crud_import_jobs as crud
+from app.db.session import SessionLocal
+from app.core.config import settings
+from app.utils.bulk_locations import upload_locations
+
+
+"""
+Background runner of the bulk location imports.
+
+The import_job table is the queue: the upload endpoint stores the file, creates a queued job and hands its id to the
+local pool of IMPORT_WORKERS threads. A worker claims the job (queued -> running) with a single conditional update,
+so a job submitted by several processes, e.g. after a restart, is still run only once. The stages of upload_locations
+report their progress straight to the job row, so any process can serve the job status.
+"""
+
+logger = logging.getLogger(settings.PROJECT_NAME)
+
+DATASETS_DIR = "app/datasets"
+
+_executor = ThreadPoolExecutor(max_workers=settings.IMPORT_WORKERS, thread_name_prefix="import-job")
+
+
+def store_upload(filename: str, file: BinaryIO) -> str:
+    """
+    Saves the uploaded file under a unique name, so the same file can be uploaded again while the previous job runs.
+
+    :param str filename: Name of the uploaded file
+    :param file: File object of the upload
+    :return: Path of the stored file
+    """
+
+    if not os.path.exists(DATASETS_DIR):
+        os.makedirs(DATASETS_DIR)
+
+    filepath = os.path.join(DATASETS_DIR, "{}_{}".format(uuid4().hex, os.path.basename(filename)))
+    with open(filepath, "wb") as file_object:
+        shutil.copyfileobj(file, file_object)
+
+    return filepath
+
+
+def _report(unprocessed_locations: List[Dict]) -> List[Dict]:
+    # the failed rows carry raw sheet values and exceptions, the report keeps them JSON friendly
+    return [
+        {
+            "location": jsonable_encoder(unprocessed.get("location")),
+            "code": unprocessed.get("code"),
+            "detail": str(unprocessed.get("detail"))
+        }
+        for unprocessed in unprocessed_locations
+    ]
+
+
+def _update_progress(job_id: int, stage: str, counts: Dict[str, int]) -> None:
+    # called from the upload stages and the geocoding pool, so every update gets its own short session
+    db = SessionLocal()
+    try:
+        crud.update_import_job_progress(db, job_id, stage, counts)
+    finally:
+        db.close()
+
+
+def run_import_job(job_id: int) -> None:
+    db = SessionLocal()
+    try:
+        if not crud.claim_import_job(db, job_id):
+            return
+
+        job = crud.get_import_job(db, job_id)
+        logger.info("Import job {} started, file {}".format(job_id, job.filename))
+
+        try:
+            unprocessed_locations = asyncio.run(
+                upload_locations(
+                    job.filepath,
+                    job.doctype,
+                    progress=lambda stage, counts: _update_progress(job_id, stage, counts),
+                    deduplicate=job.deduplicate
+                )
+            )
+            crud.finish_import_job(db, job_id, _report(unprocessed_locations or []))
+            logger.info("Import job {} finished".format(job_id))
+
+        except Exception as e:
+            logger.exception("Import job {} failed".format(job_id))
+            crud.fail_import_job(db, job_id, str(e))
+
+        finally:
+            if os.path.exists(job.filepath):
+                os.remove(job.filepath)
+
+    finally:
+        db.close()
+
+
+def submit_import_job(job_id: int) -> None:
+    _executor.submit(run_import_job, job_id)
+
+
+def resume_import_jobs() -> None:
+    """
+    Submits the jobs that were queued but not started, e.g. because the process that accepted them was restarted.
+
+    The running jobs that didn't report progress for IMPORT_JOB_STALE_MINUTES were interrupted the same way, they are
+    failed and their files removed.
+    """
+
+    db = SessionLocal()
+    try:
+        stale_jobs = crud.fail_stale_import_jobs(
+            db,
+            timedelta(minutes=settings.IMPORT_JOB_STALE_MINUTES),
+            "The import was interrupted, upload the file again"
+        )
+        for job in stale_jobs:
+            logger.warning("Import job {} was interrupted and is failed".format(job.id))
+            if os.path.exists(job.filepath):
+                os.remove(job.filepath)
+
+        for job in crud.get_queued_import_jobs(db):
+            submit_import_job(job.id)
+    finally:
+        db.close()
@@ -0,0 +1,83 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import desc, tuple_
+
+
+"""
+Keyset (cursor) pagination of the newest first lists.
+
+The lists are ordered by (created_at, id), newest first, and the next page starts right after the last record of
+the previous one: WHERE (created_at, id) < (:created_at, :id). Unlike an offset, the cost of a page doesn't depend
+on its depth, and the records inserted while a client pages through the list don't shift the pages.
+
+The clients get the cursor of the next page in the NEXT_CURSOR_HEADER response header and pass it back as is. The
+cursor is opaque to them, it's the base64 encoded position of the last record.
+"""
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(created_at: datetime, record_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), record_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    :param str cursor: Cursor received from a client
+    :return: A tuple of (created_at, id) of the last record of the previous page
+    :raises ValueError: If the cursor is malformed
+    """
+
+    try:
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(record_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_page(
+        query: Any,
+        created_at_column: Any,
+        id_column: Any,
+        limit: Optional[int],
+        cursor: Optional[Cursor] = None,
+        skip: int = 0
+) -> List[Any]:
+
+    """
+    Returns a newest first page of the query.
+
+    :param query: Query of the records to paginate
+    :param created_at_column: Creation time column of the records
+    :param id_column: Primary key column of the records, breaks the ties between the same creation times
+    :param limit: Page size, None for all the records after the cursor
+    :param cursor: Position of the last record of the previous page, the first page if not provided
+    :param skip: Amount of pages to skip, the legacy offset pagination of the clients without a cursor
+    :return: A list of the records of the page
+    """
+
+    if cursor:
+        query = query.filter(tuple_(created_at_column, id_column) < tuple_(*cursor))
+
+    query = query.order_by(desc(created_at_column), desc(id_column)).limit(limit)
+
+    if skip and not cursor:
+        query = query.offset(skip * limit)
+
+    return query.all()
+
+
+def next_cursor(records: List[Any], limit: Optional[int]) -> Optional[str]:
+    """
+    :return: The cursor of the page after the records, None if they are the last page
+    """
+
+    if limit is None or not records or len(records) < limit:
+        return None
+
+    return encode_cursor(records[-1].created_at, records[-1].id)
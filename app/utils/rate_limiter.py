@@ -0,0 +1,42 @@
+import time
+from threading import Lock
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket. Every call to acquire takes a token, waiting for one to be refilled if the bucket is
+    empty, so the callers are spread over time to no more than rate calls per second (with bursts of capacity calls).
+
+    A waiting caller reserves the next token upfront, the tokens go below zero, so the callers are served in their
+    order and each of them knows how long it would wait before it starts to.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        :param timeout: Longest wait for a token in seconds, None to wait as long as it takes
+        :return: True once the token is taken, False right away if it can't be taken within the timeout
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return False
+
+            self._tokens -= 1
+
+        if wait:
+            time.sleep(wait)
+
+        return True
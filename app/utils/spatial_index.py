@@ -0,0 +1,305 @@
+import logging
+import time
+from threading import Event, RLock, Thread
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import GeospatialIndex
+from app.utils.distance import haversine_km
+
+
+"""
+In-process copy of the GeospatialIndex table for the map queries.
+
+The markers are kept in numpy arrays sorted by their geohash, so a geohash cell is a contiguous slice of the arrays
+found with a binary search, and the bounding box / radius filtering is a vectorized pass over that slice.
+
+The index is optional (SPATIAL_INDEX_ENABLED), loaded on startup and kept in sync by the crud write paths of the
+process. As every worker has its own copy, a background thread also reloads it every SPATIAL_INDEX_REFRESH_SECONDS to
+pick up the changes made by the other workers.
+"""
+
+logger = logging.getLogger(settings.PROJECT_NAME)
+
+
+class Marker(NamedTuple):
+    """
+    A GeospatialIndex record served from memory. It has the same attributes as the model, so the same serializers
+    work for both.
+    """
+
+    id: int
+    location_id: int
+    lat: float
+    lng: float
+    status: int
+    distance: Optional[float] = None
+
+    def to_json(self) -> Dict:
+        # the GeospatialRecord (NearbyMarker with the distance) output, built without the schema for the big lists
+        marker = {
+            "id": self.id,
+            "location_id": self.location_id,
+            "lat": self.lat,
+            "lng": self.lng,
+            "position": {"lat": self.lat, "lng": self.lng},
+            "status": self.status
+        }
+        if self.distance is not None:
+            marker["distance"] = self.distance
+
+        return marker
+
+
+# sorts after every geohash character, so [prefix, prefix + _PREFIX_END) is the range of the geohashes of a cell
+_PREFIX_END = "~"
+
+
+class SpatialIndex:
+
+    def __init__(self):
+        self._lock = RLock()
+        self._loaded_at: Optional[float] = None
+        # the writes made while a load reads the table, None when there is no load in progress, see load
+        self._pending_writes: Optional[List[Tuple[Callable, Tuple]]] = None
+        self._stop_refresh = Event()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.geohashes = np.empty(0, dtype="<U12")
+        self.ids = np.empty(0, dtype=np.int64)
+        self.location_ids = np.empty(0, dtype=np.int64)
+        self.lats = np.empty(0, dtype=np.float64)
+        self.lngs = np.empty(0, dtype=np.float64)
+        self.statuses = np.empty(0, dtype=np.int16)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def load(self, db: Session) -> None:
+        """
+        (Re)loads the index from the table. The table is read outside of the lock, so the searches are served from the
+        previous snapshot meanwhile. The writes made during the read are recorded and replayed on the new snapshot,
+        they are idempotent, so it doesn't matter whether the read has already seen them. A load started while another
+        one is in progress is skipped.
+        """
+
+        with self._lock:
+            if self._pending_writes is not None:
+                return
+            self._pending_writes = []
+
+        try:
+            self._load(db)
+        finally:
+            with self._lock:
+                self._pending_writes = None
+
+    def _load(self, db: Session) -> None:
+        records = db.query(
+            GeospatialIndex.id,
+            GeospatialIndex.location_id,
+            GeospatialIndex.geohash,
+            GeospatialIndex.lat,
+            GeospatialIndex.lng,
+            GeospatialIndex.status
+        ).filter(GeospatialIndex.geohash != None).all()
+
+        geohashes = np.array([record.geohash for record in records], dtype="<U12")
+        # the database collation may order the strings differently, so the sorting is done on our side
+        order = np.argsort(geohashes, kind="stable")
+
+        with self._lock:
+            self.geohashes = geohashes[order]
+            self.ids = np.array([record.id for record in records], dtype=np.int64)[order]
+            self.location_ids = np.array([record.location_id for record in records], dtype=np.int64)[order]
+            self.lats = np.array([record.lat for record in records], dtype=np.float64)[order]
+            self.lngs = np.array([record.lng for record in records], dtype=np.float64)[order]
+            self.statuses = np.array([record.status or 0 for record in records], dtype=np.int16)[order]
+            self._loaded_at = time.monotonic()
+
+            for write, args in self._pending_writes:
+                write(*args)
+
+    def start_refresh(self, session_factory: Callable[[], Session]) -> None:
+        """
+        Starts a daemon thread reloading the index every SPATIAL_INDEX_REFRESH_SECONDS, so the requests never wait for
+        a reload.
+
+        :param session_factory: Creates the database session of a reload
+        """
+
+        def refresh() -> None:
+            while not self._stop_refresh.wait(settings.SPATIAL_INDEX_REFRESH_SECONDS):
+                db = session_factory()
+                try:
+                    self.load(db)
+                except Exception as e:
+                    logger.error("Spatial index refresh failed: {}".format(e))
+                finally:
+                    db.close()
+
+        self._stop_refresh.clear()
+        Thread(target=refresh, name="spatial-index-refresh", daemon=True).start()
+
+    def stop_refresh(self) -> None:
+        self._stop_refresh.set()
+
+    def _write(self, write: Callable, *args: Any) -> None:
+        with self._lock:
+            if self._pending_writes is not None:
+                self._pending_writes.append((write, args))
+            if self.is_loaded:
+                write(*args)
+
+    def add(self, record: GeospatialIndex) -> None:
+        self._write(self._add, record)
+
+    def _add(self, record: GeospatialIndex) -> None:
+        if np.any(self.ids == record.id):
+            return
+
+        position = np.searchsorted(self.geohashes, record.geohash)
+        self.geohashes = np.insert(self.geohashes, position, record.geohash)
+        self.ids = np.insert(self.ids, position, record.id)
+        self.location_ids = np.insert(self.location_ids, position, record.location_id)
+        self.lats = np.insert(self.lats, position, record.lat)
+        self.lngs = np.insert(self.lngs, position, record.lng)
+        self.statuses = np.insert(self.statuses, position, record.status or 0)
+
+    def add_many(self, records: List[GeospatialIndex]) -> None:
+        if records:
+            self._write(self._add_many, records)
+
+    def _add_many(self, records: List[GeospatialIndex]) -> None:
+        # the records already in the index, e.g. read by the load they are replayed on, are skipped
+        known = np.isin([record.id for record in records], self.ids)
+        records = [record for record, is_known in zip(records, known) if not is_known]
+        if not records:
+            return
+
+        geohashes = np.concatenate((self.geohashes, np.array([record.geohash for record in records], dtype="<U12")))
+        order = np.argsort(geohashes, kind="stable")
+
+        self.geohashes = geohashes[order]
+        self.ids = np.concatenate((self.ids, [record.id for record in records]))[order]
+        self.location_ids = np.concatenate((self.location_ids, [record.location_id for record in records]))[order]
+        self.lats = np.concatenate((self.lats, [record.lat for record in records]))[order]
+        self.lngs = np.concatenate((self.lngs, [record.lng for record in records]))[order]
+        self.statuses = np.concatenate(
+            (self.statuses, np.array([record.status or 0 for record in records], dtype=np.int16))
+        )[order]
+
+    def update_status(self, location_id: int, status: int) -> None:
+        self._write(self._update_status, location_id, status)
+
+    def _update_status(self, location_id: int, status: int) -> None:
+        self.statuses[self.location_ids == location_id] = status
+
+    def remove(self, location_id: int) -> None:
+        self._write(self._remove, location_id)
+
+    def _remove(self, location_id: int) -> None:
+        keep = self.location_ids != location_id
+        self.geohashes = self.geohashes[keep]
+        self.ids = self.ids[keep]
+        self.location_ids = self.location_ids[keep]
+        self.lats = self.lats[keep]
+        self.lngs = self.lngs[keep]
+        self.statuses = self.statuses[keep]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def _cells_positions(self, cells: List[str]) -> np.ndarray:
+        slices = []
+        for cell in cells:
+            start = np.searchsorted(self.geohashes, cell, side="left")
+            end = np.searchsorted(self.geohashes, cell + _PREFIX_END, side="left")
+            if end > start:
+                slices.append(np.arange(start, end))
+
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+
+        return np.unique(np.concatenate(slices))
+
+    def _records(self, positions: np.ndarray, distances: Optional[np.ndarray] = None) -> List[Marker]:
+        columns = [
+            self.ids[positions].tolist(),
+            self.location_ids[positions].tolist(),
+            self.lats[positions].tolist(),
+            self.lngs[positions].tolist(),
+            self.statuses[positions].tolist()
+        ]
+        if distances is not None:
+            columns.append(distances.tolist())
+
+        return [Marker(*values) for values in zip(*columns)]
+
+    def search(
+            self,
+            cells: List[str],
+            south: Optional[float] = None,
+            west: Optional[float] = None,
+            north: Optional[float] = None,
+            east: Optional[float] = None
+    ) -> List[Marker]:
+        """
+        Returns the markers inside the geohash cells, optionally trimmed to a bounding box.
+
+        :param cells: Geohash prefixes to look the markers up in
+        :return: A list of markers
+        """
+
+        with self._lock:
+            positions = self._cells_positions(cells)
+
+            if south is not None:
+                lats = self.lats[positions]
+                lngs = self.lngs[positions]
+                mask = (lats >= south) & (lats <= north) & (lngs >= west) & (lngs <= east)
+                positions = positions[mask]
+
+            return self._records(positions)
+
+    def search_radius(
+            self,
+            cells: List[str],
+            lat: float,
+            lng: float,
+            radius_km: float,
+            status: Optional[int] = None
+    ) -> List[Marker]:
+        """
+        Returns the markers of the geohash cells within the radius, sorted by the distance.
+
+        :param cells: Geohash prefixes covering the circle
+        :param status: Optional status the markers should have
+        :return: A list of markers with their distance (km) to the center
+        """
+
+        with self._lock:
+            positions = self._cells_positions(cells)
+            if status is not None:
+                positions = positions[self.statuses[positions] == status]
+            distances = haversine_km(lat, lng, self.lats[positions], self.lngs[positions])
+
+            within = distances <= radius_km
+            positions = positions[within]
+            distances = distances[within]
+
+            order = np.argsort(distances, kind="stable")
+
+            return self._records(positions[order], distances[order])
+
+
+spatial_index = SpatialIndex()
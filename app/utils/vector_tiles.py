@@ -0,0 +1,231 @@
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+"""
+Mapbox Vector Tiles (https://github.com/mapbox/vector-tile-spec/tree/master/2.1) encoding of the map markers.
+
+The markers are plain points with a couple of integer properties, so instead of pulling a protobuf toolchain we
+write the few protobuf messages the spec needs by hand.
+
+Tiles use the same x/y/z scheme as Google Maps and OSM (Web Mercator, y growing to the south).
+"""
+
+TILE_EXTENT = 4096
+
+# Markers that are slightly outside of the tile are still added to it, so the icons on the tile edges are not cut.
+TILE_BUFFER = 64
+
+MAX_TILE_ZOOM = 21
+
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+_WIRE_VARINT = 0
+_WIRE_LENGTH_DELIMITED = 2
+
+_GEOM_TYPE_POINT = 1
+_COMMAND_MOVE_TO = 1
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def _project(lat: float, lng: float, z: int) -> Tuple[float, float]:
+    """
+    Projects the coordinates to the world tile coordinates of the zoom level (fractional tile x and y).
+    """
+
+    n = 2 ** z
+    lat = min(max(lat, -85.0511), 85.0511)
+    lat_rad = math.radians(lat)
+
+    return (lng + 180.0) / 360.0 * n, (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+
+
+def point_to_tile(lat: float, lng: float, z: int) -> Tuple[int, int]:
+    """
+    Returns the x and y of the tile containing the point on the given zoom level.
+
+    :param float lat: Latitude of the point
+    :param float lng: Longitude of the point
+    :param int z: Zoom level
+    :return: A tuple of (x, y)
+    """
+
+    n = 2 ** z
+    tile_x, tile_y = _project(lat, lng, z)
+
+    return min(int(tile_x), n - 1), min(int(tile_y), n - 1)
+
+
+def tile_bounds(z: int, x: int, y: int, buffer: int = 0) -> Tuple[float, float, float, float]:
+    """
+    Returns the bounding box of a tile, optionally extended by the buffer (in tile extent units).
+
+    :param int z: Zoom level
+    :param int x: Tile x
+    :param int y: Tile y
+    :param int buffer: Amount of tile extent units to extend the tile with on every side
+    :return: A tuple of (south, west, north, east)
+    """
+
+    n = 2 ** z
+    margin = buffer / TILE_EXTENT
+
+    def lat(tile_y: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    def lng(tile_x: float) -> float:
+        return tile_x / n * 360.0 - 180.0
+
+    return lat(y + 1 + margin), lng(x - margin), lat(y - margin), lng(x + 1 + margin)
+
+
+def _varint(value: int) -> bytes:
+    result = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            result.append(bits | 0x80)
+        else:
+            result.append(bits)
+            return bytes(result)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _length_delimited(field: int, payload: bytes) -> bytes:
+    return _key(field, _WIRE_LENGTH_DELIMITED) + _varint(len(payload)) + payload
+
+
+def _uint_field(field: int, value: int) -> bytes:
+    return _key(field, _WIRE_VARINT) + _varint(value)
+
+
+def _packed(field: int, values: Iterable[int]) -> bytes:
+    return _length_delimited(field, b"".join(_varint(value) for value in values))
+
+
+def encode_points_tile(
+        layer_name: str,
+        points: Iterable[Tuple[int, float, float, Dict[str, int]]],
+        z: int,
+        x: int,
+        y: int
+) -> bytes:
+    """
+    Encodes the points into a single layer vector tile.
+
+    :param str layer_name: Name of the tile layer
+    :param points: An iterable of (feature id, lat, lng, properties) tuples, the properties must be unsigned ints
+    :param int z: Zoom level
+    :param int x: Tile x
+    :param int y: Tile y
+    :return: Protobuf encoded tile
+    """
+
+    keys: List[str] = []
+    values: List[int] = []
+    key_index: Dict[str, int] = {}
+    value_index: Dict[int, int] = {}
+
+    features = []
+    for feature_id, lat, lng, properties in points:
+        world_x, world_y = _project(lat, lng, z)
+        point_x = int(round((world_x - x) * TILE_EXTENT))
+        point_y = int(round((world_y - y) * TILE_EXTENT))
+
+        tags = []
+        for key, value in properties.items():
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            if value not in value_index:
+                value_index[value] = len(values)
+                values.append(value)
+            tags.extend((key_index[key], value_index[value]))
+
+        feature = _uint_field(1, feature_id) \
+            + _packed(2, tags) \
+            + _uint_field(3, _GEOM_TYPE_POINT) \
+            + _packed(4, ((1 << 3) | _COMMAND_MOVE_TO, _zigzag(point_x), _zigzag(point_y)))
+        features.append(_length_delimited(2, feature))
+
+    layer = _uint_field(15, 2) \
+        + _length_delimited(1, layer_name.encode()) \
+        + b"".join(features) \
+        + b"".join(_length_delimited(3, key.encode()) for key in keys) \
+        + b"".join(_length_delimited(4, _uint_field(5, value)) for value in values) \
+        + _uint_field(5, TILE_EXTENT)
+
+    return _length_delimited(3, layer)
+
+
+class TileCache:
+    """
+    In-process LRU cache of the encoded tiles. The tiles of a point are invalidated when the point changes, but as
+    every worker has its own cache, the entries also expire after ttl seconds so the other workers catch up.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._tiles: "OrderedDict[Tuple[int, int, int], Tuple[float, bytes]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, z: int, x: int, y: int) -> Optional[bytes]:
+        with self._lock:
+            entry = self._tiles.get((z, x, y))
+            if not entry:
+                return None
+
+            created_at, tile = entry
+            if time.monotonic() - created_at > self.ttl:
+                del self._tiles[(z, x, y)]
+                return None
+
+            self._tiles.move_to_end((z, x, y))
+            return tile
+
+    def set(self, z: int, x: int, y: int, tile: bytes) -> None:
+        with self._lock:
+            self._tiles[(z, x, y)] = (time.monotonic(), tile)
+            self._tiles.move_to_end((z, x, y))
+            while len(self._tiles) > self.max_size:
+                self._tiles.popitem(last=False)
+
+    def invalidate_point(self, lat: float, lng: float) -> None:
+        """
+        Drops every cached tile containing the point, including the neighbouring tiles whose buffer covers it.
+        """
+
+        with self._lock:
+            if not self._tiles:
+                return
+
+            for z in range(MAX_TILE_ZOOM + 1):
+                world_x, world_y = _project(lat, lng, z)
+                margin = TILE_BUFFER / TILE_EXTENT
+                for tile_x in {int(world_x - margin), int(world_x), int(world_x + margin)}:
+                    for tile_y in {int(world_y - margin), int(world_y), int(world_y + margin)}:
+                        self._tiles.pop((z, tile_x, tile_y), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tiles.clear()
+
+
+tile_cache = TileCache(max_size=settings.TILE_CACHE_SIZE, ttl=settings.TILE_CACHE_TTL)
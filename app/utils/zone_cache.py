@@ -0,0 +1,110 @@
+import warnings
+from threading import Lock
+from typing import Any, List, Optional, Tuple
+
+from shapely import wkb
+from shapely.errors import ShapelyDeprecationWarning
+from shapely.geometry import Point
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+
+"""
+Process level cache of the restricted zones geometries.
+
+Zones are full OSM boundaries, so checking a point against them is expensive. Each zone is stored with a topology
+preserving simplification (see SIMPLIFY_TOLERANCE), which differs from the full boundary by no more than the
+tolerance. A point check is then done in stages:
+
+1. the STRtree of the zones envelopes finds the few zones whose bounding box contains the point;
+2. if the point is deep inside the simplified shape (further than the tolerance from its edge), it is inside the zone,
+   if it is further than the tolerance outside of it, it is outside of the zone;
+3. only the points near the edges are checked against the full resolution geometry.
+
+The cache is rebuilt whenever the version of the zones in the database changes.
+"""
+
+# ~100 meters, in degrees
+SIMPLIFY_TOLERANCE = 0.001
+
+
+def simplify(geom: Any) -> Any:
+    return geom.simplify(SIMPLIFY_TOLERANCE, preserve_topology=True)
+
+
+class _CachedZone:
+
+    def __init__(self, geometry: bytes, simplified_geometry: bytes):
+        self._geometry = geometry
+        self._full = None
+
+        simplified = wkb.loads(simplified_geometry) if simplified_geometry else wkb.loads(geometry)
+        self.envelope = wkb.loads(geometry).envelope
+        self.inner = prep(simplified.buffer(-SIMPLIFY_TOLERANCE))
+        self.outer = prep(simplified.buffer(SIMPLIFY_TOLERANCE))
+
+    @property
+    def full(self) -> Any:
+        # the full resolution geometry is only needed for the points near the edges, so it is prepared lazily
+        if self._full is None:
+            self._full = prep(wkb.loads(self._geometry))
+        return self._full
+
+    def intersects(self, point: Point) -> bool:
+        if self.inner.contains(point):
+            return True
+
+        if not self.outer.intersects(point):
+            return False
+
+        return self.full.intersects(point)
+
+
+class RestrictedZoneCache:
+
+    def __init__(self):
+        self._lock = Lock()
+        self.version: Optional[Any] = None
+        self._zones: List[_CachedZone] = []
+        self._tree: Optional[STRtree] = None
+
+    def is_current(self, version: Any) -> bool:
+        return self.version is not None and self.version == version
+
+    def build(self, geometries: List[Tuple[bytes, bytes]], version: Any) -> None:
+        """
+        :param geometries: A list of (full geometry WKB, simplified geometry WKB) tuples of the zones
+        :param version: Version of the zones set the geometries belong to
+        """
+
+        zones = [_CachedZone(geometry, simplified_geometry) for geometry, simplified_geometry in geometries if geometry]
+
+        tree = None
+        if zones:
+            # Shapely 1.8 warns about the items argument being removed in 2.0, we are pinned to 1.8
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", ShapelyDeprecationWarning)
+                tree = STRtree([zone.envelope for zone in zones], range(len(zones)))
+
+        with self._lock:
+            self._zones = zones
+            self._tree = tree
+            self.version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version = None
+            self._zones = []
+            self._tree = None
+
+    def intersects(self, lng: float, lat: float) -> bool:
+        point = Point(lng, lat)
+
+        with self._lock:
+            if self._tree is None:
+                return False
+
+            return any(self._zones[index].intersects(point) for index in self._tree.query_items(point))
+
+
+zone_cache = RestrictedZoneCache()
@@ -0,0 +1,89 @@
+import argparse
+import logging
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Tuple
+
+import requests
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+"""
+Measures the concurrent requests throughput of the endpoints that do blocking I/O (database, bcrypt, geocoding).
+
+Run it against a running instance with a single uvicorn worker, so the numbers show how well one worker handles
+concurrent requests, e.g.:
+
+    uvicorn app.main:app --workers 1
+    python -m benchmarks.endpoints_concurrency --url http://localhost:8000 --concurrency 32 --requests 256
+
+/locations/request-info creates a location per request, so only run it against a disposable database.
+"""
+
+
+def login_token(session: requests.Session, args: argparse.Namespace) -> int:
+    response = session.post(
+        "{}/api/v1/auth/login/token".format(args.url),
+        data={"username": args.username, "password": args.password}
+    )
+    return response.status_code
+
+
+def request_info(session: requests.Session, args: argparse.Namespace) -> int:
+    # random coordinates, so every request creates a new location instead of hitting the "already sent" check
+    response = session.post(
+        "{}/api/v1/locations/request-info".format(args.url),
+        json={"lat": random.uniform(46.0, 50.0), "lng": random.uniform(24.0, 38.0)}
+    )
+    return response.status_code
+
+
+def run(name: str, call: Callable[[requests.Session, argparse.Namespace], int], args: argparse.Namespace) -> None:
+    def worker(_: int) -> Tuple[int, float]:
+        with requests.Session() as session:
+            started_at = time.perf_counter()
+            status_code = call(session, args)
+            return status_code, time.perf_counter() - started_at
+
+    # the workers return their results instead of updating shared counters, so nothing is lost between the threads
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(worker, range(args.requests)))
+    elapsed = time.perf_counter() - started_at
+
+    latencies = sorted(latency for _, latency in results)
+    errors = sum(1 for status_code, _ in results if status_code >= 400)
+    logger.info(
+        "{}: {} requests in {:.2f}s, {:.1f} req/s, p50 {:.0f}ms, p95 {:.0f}ms, errors {}".format(
+            name,
+            args.requests,
+            elapsed,
+            args.requests / elapsed,
+            statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            errors
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent requests throughput of the blocking endpoints")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--username", default="admin@admin.com")
+    parser.add_argument("--password", default="asd112233")
+    parser.add_argument("--skip-request-info", action="store_true")
+    args = parser.parse_args()
+
+    run("/auth/login/token", login_token, args)
+    if not args.skip_request_info:
+        run("/locations/request-info", request_info, args)
+
+
+if __name__ == "__main__":
+    main()